@@ -0,0 +1,125 @@
+"""
+Copyright 2017 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Unicycler
+
+This script times semi-global long read alignment (semi_global_align_long_reads) with increasing
+numbers of workers, from 1 to 32, using both threads (the default) and worker processes. It makes
+random references and error-prone reads from them and outputs a table of the alignment times and
+the speedup over a single thread. It also checks that both give the same alignments.
+
+The speedups can't be more than the number of CPUs, so this is best run on a machine with many.
+
+This file is part of Unicycler. Unicycler is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Unicycler is distributed in
+the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Unicycler. If
+not, see <http://www.gnu.org/licenses/>.
+"""
+
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+import unicycler.log
+import unicycler.misc
+from unicycler.alignment import AlignmentScoringScheme
+from unicycler.read_ref import load_references, load_long_reads
+from unicycler.unicycler_align import semi_global_align_long_reads
+
+col_widths = [8, 12, 15, 16, 17]
+
+
+def main():
+    unicycler.log.logger = unicycler.log.Log(log_filename=None, stdout_verbosity_level=0)
+    random.seed(0)
+    temp_dir = 'TEMP_' + str(os.getpid())
+    os.makedirs(temp_dir)
+    ref_fasta = os.path.join(temp_dir, 'refs.fasta')
+    reads_fastq = os.path.join(temp_dir, 'reads.fastq')
+    make_refs_and_reads(ref_fasta, reads_fastq, ref_count=5, ref_length=50000, read_count=320)
+
+    print()
+    print('CPUs: ' + str(multiprocessing.cpu_count()))
+    print()
+    header_row = ['Workers', 'Threads (s)', 'Processes (s)', 'Thread speedup', 'Process speedup']
+    unicycler.misc.print_table([header_row], col_separation=3, header_format='underline', indent=0,
+                               alignments='RRRRR', fixed_col_widths=col_widths, verbosity=0)
+    try:
+        single_thread_time = None
+        for workers in [1, 2, 4, 8, 16, 32]:
+            thread_time, thread_alignments = align_reads(ref_fasta, reads_fastq, workers, False)
+            process_time, process_alignments = align_reads(ref_fasta, reads_fastq, workers, True)
+            assert thread_alignments == process_alignments
+            if single_thread_time is None:
+                single_thread_time = thread_time
+            table_row = [str(workers), '%.2f' % thread_time, '%.2f' % process_time,
+                         '%.1fx' % (single_thread_time / thread_time),
+                         '%.1fx' % (single_thread_time / process_time)]
+            unicycler.misc.print_table([table_row], col_separation=3, header_format='normal',
+                                       indent=0, alignments='RRRRR', fixed_col_widths=col_widths,
+                                       verbosity=0, left_align_header=False,
+                                       bottom_align_header=False)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def make_refs_and_reads(ref_fasta, reads_fastq, ref_count, ref_length, read_count):
+    """
+    Makes random references and reads (2 to 10 kbp, from either strand) with about 10% errors.
+    """
+    refs = [unicycler.misc.get_random_sequence(ref_length) for _ in range(ref_count)]
+    with open(ref_fasta, 'wt') as fasta:
+        for i, ref in enumerate(refs):
+            fasta.write('>' + str(i + 1) + '\n' + ref + '\n')
+    with open(reads_fastq, 'wt') as fastq:
+        for i in range(read_count):
+            ref = random.choice(refs)
+            read_length = random.randint(2000, 10000)
+            start = random.randint(0, ref_length - read_length)
+            read = add_errors(ref[start:start + read_length])
+            if random.random() < 0.5:
+                read = unicycler.misc.reverse_complement(read)
+            fastq.write('@read_' + str(i) + '\n' + read + '\n+\n' + 'A' * len(read) + '\n')
+
+
+def add_errors(seq):
+    bases = []
+    for base in seq:
+        r = random.random()
+        if r < 0.04:
+            bases.append(random.choice('ACGT'))
+        elif r < 0.07:
+            pass
+        elif r < 0.10:
+            bases.append(base + random.choice('ACGT'))
+        else:
+            bases.append(base)
+    return ''.join(bases)
+
+
+def align_reads(ref_fasta, reads_fastq, workers, use_processes):
+    """
+    Aligns the reads and returns the time taken along with the alignments.
+    """
+    refs = load_references(ref_fasta, section_header=None, show_progress=False)
+    read_dict, read_names, _ = load_long_reads(reads_fastq, silent=True)
+    scoring_scheme = AlignmentScoringScheme('3,-6,-5,-2')
+    start_time = time.time()
+    semi_global_align_long_reads(refs, ref_fasta, read_dict, read_names, reads_fastq, workers,
+                                 scoring_scheme, [None], False, 100, None, None, 0, 0, None, 0,
+                                 display_low_score=False, use_processes=use_processes)
+    align_time = time.time() - start_time
+    alignments = {name: sorted((x.ref.name, x.rev_comp, x.read_start_pos, x.read_end_pos,
+                                x.ref_start_pos, x.ref_end_pos, x.raw_score)
+                               for x in read_dict[name].alignments) for name in read_names}
+    return align_time, alignments
+
+
+if __name__ == '__main__':
+    main()
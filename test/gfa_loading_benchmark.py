@@ -0,0 +1,183 @@
+"""
+Copyright 2017 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Unicycler
+
+This script compares the single-pass GFA loader (AssemblyGraph.load_from_gfa) against the older
+loader, which read the file once each for segments, links and paths and then a fourth time to get
+the overlap. It makes random SPAdes-like GFA files of increasing size and outputs a table of load
+times (for both plain and gzipped files). It also checks that both loaders give the same graph.
+
+This file is part of Unicycler. Unicycler is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Unicycler is distributed in
+the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Unicycler. If
+not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import gzip
+import random
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+import unicycler.assembly_graph
+import unicycler.misc
+import unicycler.log
+from unicycler.assembly_graph import AssemblyGraph, signed_string_to_int, \
+    build_rc_links_if_necessary, build_reverse_links
+from unicycler.assembly_graph_segment import Segment
+
+col_widths = [10, 12, 16, 16, 16, 8]
+
+
+def main():
+    random.seed(0)
+    unicycler.log.logger = unicycler.log.Log(log_filename=None, stdout_verbosity_level=0)
+    temp_dir = 'TEST_TEMP_' + str(os.getpid())
+    os.makedirs(temp_dir)
+
+    print()
+    header_row = ['Segments', 'File size', 'Multi-pass (s)', 'One-pass (s)', 'One-pass gz (s)',
+                  'Speedup']
+    unicycler.misc.print_table([header_row], col_separation=3, header_format='underline', indent=0,
+                               alignments='RRRRRR', fixed_col_widths=col_widths, verbosity=0)
+    try:
+        for segment_count in [1000, 10000, 100000]:
+            gfa_filename = os.path.join(temp_dir, 'graph.gfa')
+            make_random_gfa(gfa_filename, segment_count, 55)
+            benchmark_one_graph(gfa_filename, segment_count)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def make_random_gfa(filename, segment_count, overlap):
+    """
+    Makes a GFA which looks like a SPAdes graph: segments with depth tags, links with a fixed
+    overlap (only in one direction, like SPAdes) and some multi-segment paths.
+    """
+    with open(filename, 'wt') as gfa:
+        for i in range(1, segment_count + 1):
+            length = random.randint(overlap + 1, 2000)
+            depth = random.uniform(5.0, 50.0)
+            gfa.write('S\t{}\t{}\tDP:f:{:.4f}\n'.format(
+                i, unicycler.misc.get_random_sequence(length), depth))
+        for i in range(1, segment_count + 1):
+            for _ in range(random.randint(0, 2)):
+                end = random.randint(1, segment_count)
+                gfa.write('L\t{}\t{}\t{}\t{}\t{}M\n'.format(i, random.choice('+-'), end,
+                                                           random.choice('+-'), overlap))
+        for i in range(segment_count // 10):
+            path = [str(random.randint(1, segment_count)) + random.choice('+-')
+                    for _ in range(random.randint(2, 10))]
+            gfa.write('P\tNODE_{}\t{}\t*\n'.format(i + 1, ','.join(path)))
+
+
+def benchmark_one_graph(gfa_filename, segment_count):
+    gz_filename = gfa_filename + '.gz'
+    with open(gfa_filename, 'rb') as f_in, gzip.open(gz_filename, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+
+    start_time = time.time()
+    old_graph = MultiPassAssemblyGraph(gfa_filename, None)
+    multi_pass_time = time.time() - start_time
+
+    start_time = time.time()
+    new_graph = AssemblyGraph(gfa_filename, None)
+    one_pass_time = time.time() - start_time
+
+    start_time = time.time()
+    gz_graph = AssemblyGraph(gz_filename, None)
+    one_pass_gz_time = time.time() - start_time
+
+    for graph in [new_graph, gz_graph]:
+        assert graph.overlap == old_graph.overlap
+        assert graph.forward_links == old_graph.forward_links
+        assert graph.reverse_links == old_graph.reverse_links
+        assert graph.paths == old_graph.paths
+        assert sorted(graph.segments) == sorted(old_graph.segments)
+        for num, segment in graph.segments.items():
+            old_segment = old_graph.segments[num]
+            assert segment.depth == old_segment.depth
+            assert segment.forward_sequence == old_segment.forward_sequence
+            assert segment.reverse_sequence == old_segment.reverse_sequence
+
+    file_size = unicycler.misc.int_to_str(os.path.getsize(gfa_filename))
+    table_row = [unicycler.misc.int_to_str(segment_count), file_size,
+                 '%.3f' % multi_pass_time, '%.3f' % one_pass_time, '%.3f' % one_pass_gz_time,
+                 '%.2fx' % (multi_pass_time / one_pass_time)]
+    unicycler.misc.print_table([table_row], col_separation=3, header_format='normal', indent=0,
+                               alignments='RRRRRR', fixed_col_widths=col_widths, verbosity=0,
+                               left_align_header=False, bottom_align_header=False)
+
+
+class MultiPassAssemblyGraph(AssemblyGraph):
+    """
+    An AssemblyGraph which uses the old loading approach: separate passes over the file for the
+    segments, links, paths and overlap.
+    """
+    def load_from_gfa(self, filename):
+        with open(filename, 'rt') as gfa_file:
+            for line in gfa_file:
+                if line.startswith('S'):
+                    line_parts = line.strip().split('\t')
+                    num = int(line_parts[1])
+                    depth = 1.0
+                    for part in line_parts:
+                        if part.lower().startswith('dp:'):
+                            depth = float(part[5:])
+                        if part.lower().startswith('ml:'):
+                            self.manual_multiplicity[num] = int(part[5:])
+                    sequence = line_parts[2]
+                    self.segments[num] = Segment(num, depth, sequence, True)
+                if line.startswith('i'):
+                    line_parts = line.strip().split('\t')
+                    try:
+                        self.insert_size_mean = float(line_parts[1])
+                        self.insert_size_deviation = float(line_parts[2])
+                    except ValueError:
+                        pass
+        with open(filename, 'rt') as gfa_file:
+            for line in gfa_file:
+                if line.startswith('L'):
+                    line_parts = line.strip().split('\t')
+                    start = signed_string_to_int(line_parts[1] + line_parts[2])
+                    end = signed_string_to_int(line_parts[3] + line_parts[4])
+                    if start not in self.forward_links:
+                        self.forward_links[start] = [end]
+                    else:
+                        self.forward_links[start].append(end)
+            self.forward_links = build_rc_links_if_necessary(self.forward_links)
+            self.reverse_links = build_reverse_links(self.forward_links)
+        self.sort_link_order()
+        with open(filename, 'rt') as gfa_file:
+            for line in gfa_file:
+                if line.startswith('P'):
+                    line_parts = line.strip().split('\t')
+                    path_name = line_parts[1]
+                    segments = [signed_string_to_int(x) for x in line_parts[2].split(',')]
+                    if len(segments) > 1:
+                        self.paths[path_name] = segments
+        return get_overlap_from_gfa_link(filename)
+
+
+def get_overlap_from_gfa_link(filename):
+    """
+    Looks for the first link line and gets the overlap. Assumes that all overlaps in the graph are
+    the same.
+    """
+    with open(filename, 'rt') as gfa_file:
+        for line in gfa_file:
+            if line.startswith('L'):
+                line_parts = line.strip().split('\t')
+                if len(line_parts) > 5:
+                    cigar = line_parts[5]
+                    return int(cigar[:-1])
+    return 0
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Copyright 2017 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Unicycler
+
+This script stress tests the SPAdes graph cleaning (AssemblyGraph.clean, as used to score each
+k-mer's graph) and remove_small_components on big synthetic graphs, up to 100,000 segments. The
+graphs are made to look like complex metagenome assemblies: lots of components of very different
+sizes, tangled regions, low-depth noise, homopolymer loops and high-copy repeats with many links.
+It outputs a table of the time taken for each graph size, which should grow about linearly.
+
+This file is part of Unicycler. Unicycler is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Unicycler is distributed in
+the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Unicycler. If
+not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import random
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+import unicycler.log
+import unicycler.misc
+from unicycler.assembly_graph import AssemblyGraph
+
+col_widths = [10, 10, 12, 12, 16, 14]
+
+
+def main():
+    unicycler.log.logger = unicycler.log.Log(log_filename=None, stdout_verbosity_level=0)
+    random.seed(0)
+    temp_dir = 'TEMP_' + str(os.getpid())
+    os.makedirs(temp_dir)
+    print()
+    header_row = ['Segments', 'Links', 'Cleaned to', 'Clean (s)', 'Small comps (s)',
+                  'ms per 1k segs']
+    unicycler.misc.print_table([header_row], col_separation=3, header_format='underline', indent=0,
+                               alignments='RRRRRR', fixed_col_widths=col_widths, verbosity=0)
+    try:
+        for segment_count in [10000, 30000, 100000]:
+            gfa_filename = os.path.join(temp_dir, 'graph.gfa')
+            make_random_gfa(gfa_filename, segment_count)
+            benchmark_one_graph(gfa_filename)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def make_random_gfa(gfa_filename, segment_count):
+    """
+    Makes the graph one component at a time. Component sizes have a long-tailed distribution (most
+    are small, a few are very big). A fifth of components are tangles with random links between
+    any of their segments, the rest only have local links. Some components have a high-copy
+    repeat segment which many other segments lead into and out of.
+    """
+    seqs, depths, links = [], [], set()
+    while len(seqs) < segment_count:
+        size = min(segment_count - len(seqs), int(random.paretovariate(1.0) * 5))
+        first, last = len(seqs) + 1, len(seqs) + size
+        component_depth = random.uniform(5.0, 500.0)
+        tangle = random.random() < 0.2
+        for _ in range(size):
+            r = random.random()
+            if r < 0.02:
+                seqs.append(random.choice('ACGT') * random.randint(1, 30))
+            elif r < 0.5:
+                seqs.append(random_seq(random.randint(1, 80)))
+            else:
+                seqs.append(random_seq(random.randint(100, 3000)))
+            if random.random() < 0.2:  # noise
+                depths.append(component_depth * random.uniform(0.02, 2.0))
+            else:
+                depths.append(component_depth * random.uniform(0.8, 1.2))
+        for i in range(first, last + 1):
+            for _ in range(random.randint(0, 3 if tangle else 2)):
+                if tangle:
+                    j = random.randint(first, last)
+                else:
+                    j = random.randint(max(first, i - 3), min(last, i + 3))
+                links.add((i, random.choice('+-'), j, random.choice('+-')))
+        if size > 100 and random.random() < 0.5:
+            repeat = random.randint(first, last)
+            depths[repeat - 1] *= 20.0
+            for i in random.sample(range(first, last + 1), size // 10):
+                if random.random() < 0.5:
+                    links.add((i, '+', repeat, '+'))
+                else:
+                    links.add((repeat, '+', i, '+'))
+    with open(gfa_filename, 'wt') as gfa:
+        for i, (seq, depth) in enumerate(zip(seqs, depths)):
+            gfa.write('S\t' + str(i + 1) + '\t' + seq + '\tDP:f:' + str(depth) + '\n')
+        for start, start_strand, end, end_strand in sorted(links):
+            gfa.write('L\t' + str(start) + '\t' + start_strand + '\t' + str(end) + '\t' +
+                      end_strand + '\t0M\n')
+
+
+def random_seq(length):
+    return ''.join(random.choice('ACGT') for _ in range(length))
+
+
+def benchmark_one_graph(gfa_filename):
+    graph = AssemblyGraph(gfa_filename, 0)
+    segment_count = len(graph.segments)
+    link_count = graph.get_total_link_count()
+
+    start_time = time.time()
+    graph.clean(0.25, False)
+    clean_time = time.time() - start_time
+    cleaned_count = len(graph.segments)
+
+    start_time = time.time()
+    graph.remove_small_components(1000)
+    small_components_time = time.time() - start_time
+
+    total_time = clean_time + small_components_time
+    table_row = [unicycler.misc.int_to_str(segment_count), unicycler.misc.int_to_str(link_count),
+                 unicycler.misc.int_to_str(cleaned_count), '%.3f' % clean_time,
+                 '%.3f' % small_components_time,
+                 '%.1f' % (1000.0 * total_time / (segment_count / 1000.0))]
+    unicycler.misc.print_table([table_row], col_separation=3, header_format='normal', indent=0,
+                               alignments='RRRRRR', fixed_col_widths=col_widths, verbosity=0,
+                               left_align_header=False, bottom_align_header=False)
+
+
+if __name__ == '__main__':
+    main()
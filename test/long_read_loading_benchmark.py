@@ -0,0 +1,137 @@
+"""
+Copyright 2017 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Unicycler
+
+This script compares the single-pass long read loader (read_ref.load_long_reads) against the older
+two-pass loader, which counted the reads before parsing them and built FASTA sequences by repeated
+string concatenation. It makes random gzipped FASTQ and FASTA files of increasing size and outputs
+a table of load times. It also checks that both loaders give the same reads.
+
+This file is part of Unicycler. Unicycler is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Unicycler is distributed in
+the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Unicycler. If
+not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import gzip
+import random
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+import unicycler.read_ref
+import unicycler.misc
+import unicycler.log
+import test.fake_reads
+
+col_widths = [8, 10, 14, 14, 14, 8]
+
+
+def main():
+    random.seed(0)
+    unicycler.log.logger = unicycler.log.Log(log_filename=None, stdout_verbosity_level=0)
+    temp_dir = 'TEST_TEMP_' + str(os.getpid())
+    os.makedirs(temp_dir)
+
+    print()
+    header_row = ['Format', 'Read count', 'Total bases', 'Two-pass (s)', 'One-pass (s)', 'Speedup']
+    unicycler.misc.print_table([header_row], col_separation=3, header_format='underline', indent=0,
+                               alignments='LRRRRR', fixed_col_widths=col_widths, verbosity=0)
+    try:
+        for read_count in [100, 1000, 5000]:
+            reads = make_random_reads(read_count)
+            for file_format in ['FASTQ', 'FASTA']:
+                filename = os.path.join(temp_dir, 'reads.' + file_format.lower() + '.gz')
+                save_reads(reads, filename, file_format)
+                benchmark_one_file(filename, file_format, reads)
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def make_random_reads(read_count):
+    reads = []
+    for i in range(read_count):
+        length = random.randint(1000, 50000)
+        reads.append(('read_' + str(i), unicycler.misc.get_random_sequence(length),
+                      test.fake_reads.make_fake_qual_string(length)))
+    return reads
+
+
+def save_reads(reads, filename, file_format):
+    with gzip.open(filename, 'wt') as f:
+        for name, seq, qual in reads:
+            if file_format == 'FASTQ':
+                f.write('@' + name + '\n' + seq + '\n+\n' + qual + '\n')
+            else:
+                f.write('>' + name + '\n' + unicycler.misc.add_line_breaks_to_sequence(seq, 70))
+
+
+def benchmark_one_file(filename, file_format, reads):
+    start_time = time.time()
+    old_read_dict, old_read_names = load_long_reads_two_pass(filename, file_format)
+    two_pass_time = time.time() - start_time
+
+    start_time = time.time()
+    new_read_dict, new_read_names, _ = unicycler.read_ref.load_long_reads(filename, silent=True)
+    one_pass_time = time.time() - start_time
+
+    assert old_read_names == new_read_names
+    for name in new_read_names:
+        assert old_read_dict[name] == (new_read_dict[name].sequence, new_read_dict[name].qualities)
+
+    total_bases = sum(len(x[1]) for x in reads)
+    table_row = [file_format, str(len(reads)), str(total_bases), '%.3f' % two_pass_time,
+                 '%.3f' % one_pass_time, '%.2fx' % (two_pass_time / one_pass_time)]
+    unicycler.misc.print_table([table_row], col_separation=3, header_format='normal', indent=0,
+                               alignments='LRRRRR', fixed_col_widths=col_widths, verbosity=0,
+                               left_align_header=False, bottom_align_header=False)
+
+
+def load_long_reads_two_pass(filename, file_format):
+    """
+    The old approach: count the reads in one pass, then parse them in a second pass.
+    """
+    reads = {}
+    read_names = []
+    with gzip.open(filename, 'rt') as f:
+        if file_format == 'FASTQ':
+            num_reads = sum(1 for _ in f) // 4
+        else:
+            num_reads = sum(1 for line in f if line.startswith('>'))
+    assert num_reads > 0
+    with gzip.open(filename, 'rt') as f:
+        if file_format == 'FASTQ':
+            for line in f:
+                line = line.strip()
+                if not line.startswith('@'):
+                    continue
+                name = line[1:].split()[0]
+                sequence = next(f).strip()
+                next(f)
+                qualities = next(f).strip()
+                reads[name] = (sequence.upper(), qualities)
+                read_names.append(name)
+        else:
+            name, sequence = '', ''
+            for line in f:
+                line = line.strip()
+                if line.startswith('>'):
+                    if name:
+                        reads[name] = (sequence.upper(), '+' * len(sequence))
+                        read_names.append(name)
+                    name, sequence = line[1:].split()[0], ''
+                else:
+                    sequence += line
+            if name:
+                reads[name] = (sequence.upper(), '+' * len(sequence))
+                read_names.append(name)
+    return reads, read_names
+
+
+if __name__ == '__main__':
+    main()
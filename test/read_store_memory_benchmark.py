@@ -0,0 +1,102 @@
+"""
+Copyright 2017 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Unicycler
+
+This script compares the memory used by long reads held in a ReadStore (two-bit packed sequences
+and a shared quality buffer) against the older approach of one pair of Python strings per read.
+It makes random read sets of increasing size and outputs a table of peak memory usage (measured
+with tracemalloc) and the time taken to unpack every sequence.
+
+This file is part of Unicycler. Unicycler is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Unicycler is distributed in
+the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Unicycler. If
+not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.getcwd())
+import unicycler.read_ref
+import unicycler.misc
+import test.fake_reads
+
+col_widths = [10, 12, 14, 14, 10, 12]
+
+
+class StringRead(object):
+    """
+    The old read representation: full Python strings for the sequence and qualities.
+    """
+    def __init__(self, name, sequence, qualities):
+        self.name = name
+        self.sequence = sequence.upper()
+        self.qualities = qualities if qualities else '+' * len(self.sequence)
+        self.alignments = []
+
+
+def main():
+    random.seed(0)
+    print()
+    header_row = ['Qualities', 'Total bases', 'Strings (MB)', 'Store (MB)', 'Reduction',
+                  'Unpack (s)']
+    unicycler.misc.print_table([header_row], col_separation=3, header_format='underline', indent=0,
+                               alignments='LRRRRR', fixed_col_widths=col_widths, verbosity=0)
+    for read_count in [100, 1000, 2000]:
+        reads = make_random_reads(read_count)
+        for with_qualities in [True, False]:
+            benchmark_one_read_set(reads, with_qualities)
+
+
+def make_random_reads(read_count):
+    reads = []
+    for i in range(read_count):
+        length = random.randint(1000, 50000)
+        reads.append(('read_' + str(i), unicycler.misc.get_random_sequence(length),
+                      test.fake_reads.make_fake_qual_string(length)))
+    return reads
+
+
+def measure_peak_memory(reads, with_qualities, read_class):
+    tracemalloc.start()
+    read_store = unicycler.read_ref.ReadStore()
+    read_dict = {}
+    for name, seq, qual in reads:
+        # Make fresh copies, as would happen when parsing the strings from a file.
+        seq = seq.lower()
+        qual = qual.encode().decode() if with_qualities else None
+        if read_class is StringRead:
+            read_dict[name] = StringRead(name, seq, qual)
+        else:
+            read_dict[name] = unicycler.read_ref.Read(name, seq, qual, read_store)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, read_dict
+
+
+def benchmark_one_read_set(reads, with_qualities):
+    string_memory, _ = measure_peak_memory(reads, with_qualities, StringRead)
+    store_memory, read_dict = measure_peak_memory(reads, with_qualities, unicycler.read_ref.Read)
+
+    start_time = time.time()
+    for name, seq, qual in reads:
+        assert read_dict[name].sequence == seq
+    unpack_time = time.time() - start_time
+
+    total_bases = sum(len(x[1]) for x in reads)
+    table_row = ['yes' if with_qualities else 'no', str(total_bases),
+                 '%.1f' % (string_memory / 1e6), '%.1f' % (store_memory / 1e6),
+                 '%.2fx' % (string_memory / store_memory), '%.3f' % unpack_time]
+    unicycler.misc.print_table([table_row], col_separation=3, header_format='normal', indent=0,
+                               alignments='LRRRRR', fixed_col_widths=col_widths, verbosity=0,
+                               left_align_header=False, bottom_align_header=False)
+
+
+if __name__ == '__main__':
+    main()
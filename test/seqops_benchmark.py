@@ -0,0 +1,87 @@
+"""
+Copyright 2017 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Unicycler
+
+This script times the functions in unicycler.seqops on random sequences from 1 kb to 10 Mb. For
+reverse complementing, it also times the old per-base approach (a dict lookup for each base) and
+checks that both give the same result.
+
+This file is part of Unicycler. Unicycler is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Unicycler is distributed in
+the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Unicycler. If
+not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+import unicycler.misc
+import unicycler.seqops
+
+col_widths = [10, 12, 12, 12, 9, 12, 12, 12, 12]
+
+
+def main():
+    random.seed(0)
+    print()
+    header_row = ['Length', 'Old RC (s)', 'RC str (s)', 'RC bytes (s)', 'Speedup', 'Pack (s)',
+                  'Unpack (s)', 'GC (s)', 'K-mers (s)']
+    unicycler.misc.print_table([header_row], col_separation=3, header_format='underline', indent=0,
+                               alignments='RRRRRRRRR', fixed_col_widths=col_widths, verbosity=0)
+    for length in [1000, 10000, 100000, 1000000, 10000000]:
+        benchmark_one_length(length)
+
+
+def old_reverse_complement(seq):
+    return ''.join([unicycler.misc.complement_base(x) for x in seq][::-1])
+
+
+def time_function(function, *args):
+    """
+    Returns the result of the function and the time it took. Short sequences are repeated so the
+    time is measurable.
+    """
+    repeats = max(1, 1000000 // max(1, len(args[0])))
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        result = function(*args)
+    return result, (time.perf_counter() - start_time) / repeats
+
+
+def benchmark_one_length(length):
+    seq = unicycler.misc.get_random_sequence(length)
+    seq_bytes = seq.encode()
+
+    old_rc, old_time = time_function(old_reverse_complement, seq)
+    str_rc, str_time = time_function(unicycler.seqops.reverse_complement, seq)
+    bytes_rc, bytes_time = time_function(unicycler.seqops.reverse_complement, seq_bytes)
+    assert old_rc == str_rc == bytes_rc.decode()
+
+    packed, pack_time = time_function(unicycler.seqops.pack_two_bit, seq_bytes)
+    unpacked, unpack_time = time_function(unicycler.seqops.unpack_two_bit, packed)
+    assert unpacked[:length] == seq_bytes
+
+    gc, gc_time = time_function(unicycler.seqops.gc_count, seq_bytes)
+    assert gc == seq.count('G') + seq.count('C')
+
+    start_time = time.perf_counter()
+    kmer_count = sum(1 for _ in unicycler.seqops.get_kmer_hashes(seq_bytes, 21))
+    kmer_time = time.perf_counter() - start_time
+    assert kmer_count == length - 20
+
+    table_row = [unicycler.misc.int_to_str(length), '%.6f' % old_time, '%.6f' % str_time,
+                 '%.6f' % bytes_time, '%.0fx' % (old_time / str_time), '%.6f' % pack_time,
+                 '%.6f' % unpack_time, '%.6f' % gc_time, '%.4f' % kmer_time]
+    unicycler.misc.print_table([table_row], col_separation=3, header_format='normal', indent=0,
+                               alignments='RRRRRRRRR', fixed_col_widths=col_widths, verbosity=0,
+                               left_align_header=False, bottom_align_header=False)
+
+
+if __name__ == '__main__':
+    main()
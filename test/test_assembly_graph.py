@@ -12,12 +12,45 @@ not, see <http://www.gnu.org/licenses/>.
 """
 
 import unittest
+import copy
+import gzip
 import os
+import random
+import shutil
+import tempfile
 import unicycler.assembly_graph
+import unicycler.assembly_graph_segment
 import unicycler.misc
 import unicycler.log
 
 
+def write_random_chain_gfa(gfa_filename, segment_count):
+    """
+    Makes a graph of chains (about ten segments long on average) whose ends are randomly joined,
+    plus some paths which follow the chains.
+    """
+    chains, chain = [], []
+    for i in range(1, segment_count + 1):
+        chain.append(i)
+        if random.random() < 0.1 or i == segment_count:
+            chains.append(chain)
+            chain = []
+    with open(gfa_filename, 'wt') as gfa:
+        for i in range(1, segment_count + 1):
+            gfa.write('S\t{}\t{}\tDP:f:{:.4f}\n'.format(
+                i, unicycler.misc.get_random_sequence(random.randint(1, 100)),
+                random.uniform(5.0, 50.0)))
+        for chain in chains:
+            for a, b in zip(chain, chain[1:]):
+                gfa.write('L\t{}\t+\t{}\t+\t0M\n'.format(a, b))
+        branch_links = set((random.choice(chains)[-1], random.choice(chains)[0])
+                           for _ in range(len(chains) * 2))
+        for a, b in sorted(branch_links):
+            gfa.write('L\t{}\t+\t{}\t+\t0M\n'.format(a, b))
+        for i, chain in enumerate(chains[:len(chains) // 2]):
+            gfa.write('P\tNODE_{}\t{}\t*\n'.format(i + 1, ','.join(str(x) + '+' for x in chain)))
+
+
 class TestAssemblyGraphFunctions1(unittest.TestCase):
     """
     Tests various AssemblyGraph functions on a graph loaded from a SPAdes FASTG file.
@@ -197,6 +230,128 @@ class TestAssemblyGraphFunctions1(unittest.TestCase):
         self.assertEqual(link_count_1, link_count_2)
         os.remove(temp_gfa)
 
+    def test_load_gzipped_gfa(self):
+        test_gfa = os.path.join(os.path.dirname(__file__), 'test_assembly_graph.gfa')
+        temp_gfa = os.path.join(os.path.dirname(__file__), 'temp.gfa.gz')
+        with open(test_gfa, 'rb') as f_in, gzip.open(temp_gfa, 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out)
+        graph2 = unicycler.assembly_graph.AssemblyGraph(temp_gfa, None)
+        os.remove(temp_gfa)
+        self.assertEqual(graph2.overlap, 25)
+        self.assertEqual(sorted(self.graph.segments), sorted(graph2.segments))
+        self.assertEqual(self.graph.forward_links, graph2.forward_links)
+        self.assertEqual(self.graph.reverse_links, graph2.reverse_links)
+        self.assertEqual(self.graph.paths, graph2.paths)
+        for num, segment in self.graph.segments.items():
+            self.assertEqual(segment.depth, graph2.segments[num].depth)
+            self.assertEqual(segment.forward_sequence, graph2.segments[num].forward_sequence)
+
+    def test_load_gfa_tags(self):
+        temp_gfa = os.path.join(os.path.dirname(__file__), 'temp.gfa')
+        with open(temp_gfa, 'wt') as gfa:
+            gfa.write('S\t1\tACGTACGTAC\tLN:i:10\tdp:f:12.5\n')
+            gfa.write('L\t1\t+\t2\t-\t3M\n')
+            gfa.write('S\t2\tTTTGCAGCAT\tML:i:2\tDP:f:7.0\n')
+            gfa.write('S\t3\tGGGGGGGGGG\n')
+            gfa.write('P\tNODE_1\t1+,2-\t*\n')
+            gfa.write('P\tNODE_2\t3+\t*\n')
+        graph2 = unicycler.assembly_graph.AssemblyGraph(temp_gfa, None)
+        os.remove(temp_gfa)
+        self.assertEqual(graph2.overlap, 3)
+        self.assertEqual(graph2.segments[1].depth, 12.5)
+        self.assertEqual(graph2.segments[2].depth, 7.0)
+        self.assertEqual(graph2.segments[3].depth, 1.0)
+        self.assertEqual(graph2.manual_multiplicity, {2: 2})
+        self.assertEqual(graph2.forward_links, {1: [-2], 2: [-1]})
+        self.assertEqual(graph2.paths, {'NODE_1': [1, -2]})
+
+    def test_component_tracker(self):
+        self.assertIsNone(self.graph.component_tracker)
+        components = self.graph.get_connected_components()
+        self.assertEqual(components, self.graph.find_connected_components())
+        tracker = self.graph.component_tracker
+        self.assertIsNotNone(tracker)
+        self.assertEqual(self.graph.get_component(components[0][0]), set(components[0]))
+
+        # The tracker is kept up to date as the graph changes, and must always agree with a fresh
+        # search.
+        random.seed(0)
+        for _ in range(100):
+            seg_nums = sorted(self.graph.segments)
+            r = random.random()
+            if r < 0.2:
+                self.graph.remove_segments([random.choice(seg_nums)])
+            elif r < 0.6:
+                seg_num = random.choice(seg_nums)
+                downstream = self.graph.get_downstream_seg_nums(seg_num)
+                if downstream:
+                    self.graph.remove_link(seg_num, random.choice(downstream))
+            else:
+                self.graph.add_link(random.choice(seg_nums) * random.choice([1, -1]),
+                                    random.choice(seg_nums) * random.choice([1, -1]))
+            self.assertEqual(self.graph.get_connected_components(),
+                             self.graph.find_connected_components())
+        self.assertIs(self.graph.component_tracker, tracker)
+
+    def test_component_tracker_new_unlinked_segment(self):
+        self.graph.get_connected_components()
+        new_seg_num = self.graph.get_next_available_seg_number()
+        self.graph.segments[new_seg_num] = \
+            unicycler.assembly_graph_segment.Segment(new_seg_num, 1.0, 'ACGT', True)
+        self.assertIn([new_seg_num], self.graph.get_connected_components())
+        self.assertEqual(self.graph.get_component(new_seg_num), {new_seg_num})
+
+    def test_snapshot(self):
+        # A snapshot must look just like a deep copy taken at the same time, no matter how the
+        # graph changes afterwards.
+        deep_copy = copy.deepcopy(self.graph)
+        snapshot = self.graph.take_snapshot()
+        random.seed(0)
+        for _ in range(100):
+            seg_nums = sorted(self.graph.segments)
+            seg_num = random.choice(seg_nums)
+            r = random.random()
+            if r < 0.1:
+                self.graph.remove_segments([seg_num])
+            elif r < 0.4:
+                downstream = self.graph.get_downstream_seg_nums(seg_num)
+                if downstream:
+                    self.graph.remove_link(seg_num, random.choice(downstream))
+            elif r < 0.7:
+                self.graph.add_link(seg_num, random.choice(seg_nums) * random.choice([1, -1]))
+            elif r < 0.8:
+                self.graph.segments[seg_num].trim_from_end(1)
+            else:
+                self.graph.segments[seg_num].depth *= 0.5
+        self.assertEqual(set(snapshot.segments), set(deep_copy.segments))
+        for seg_num, segment in deep_copy.segments.items():
+            snapshot_segment = snapshot.segments[seg_num]
+            self.assertEqual(snapshot_segment.depth, segment.depth)
+            self.assertEqual(snapshot_segment.forward_sequence, segment.forward_sequence)
+            self.assertEqual(snapshot_segment.reverse_sequence, segment.reverse_sequence)
+        self.assertEqual(dict(snapshot.forward_links), deep_copy.forward_links)
+        self.assertEqual(dict(snapshot.reverse_links), deep_copy.reverse_links)
+        for seg_num in deep_copy.segments:
+            for path in ([seg_num] + deep_copy.forward_links.get(seg_num, [])[:1],
+                         [-seg_num] + deep_copy.forward_links.get(-seg_num, [])[:1]):
+                self.assertEqual(snapshot.get_path_sequence(path),
+                                 deep_copy.get_path_sequence(path))
+                self.assertEqual(snapshot.get_path_bytes(path), deep_copy.get_path_bytes(path))
+
+        # Renumbering changes all of the graph's links, so the snapshot takes a full copy first.
+        snapshot_links = dict(snapshot.forward_links)
+        self.graph.renumber_segments()
+        self.assertEqual(self.graph.snapshots, [])
+        self.assertEqual(dict(snapshot.forward_links), snapshot_links)
+
+    def test_snapshot_release(self):
+        snapshot = self.graph.take_snapshot()
+        self.assertEqual(self.graph.snapshots, [snapshot])
+        snapshot.release()
+        self.assertEqual(self.graph.snapshots, [])
+        self.graph.add_link(1, 2)
+        self.assertEqual(snapshot.saved_forward_links, {})
+
     def test_get_all_gfa_link_lines(self):
         gfa_link_lines = self.graph.get_all_gfa_link_lines()
         self.assertEqual(gfa_link_lines.count('\n'), 452)
@@ -288,6 +443,69 @@ class TestAssemblyGraphFunctions1(unittest.TestCase):
         self.assertEqual(self.graph.get_n_segment_length(50), 3217)
 
 
+class TestSegment(unittest.TestCase):
+    """
+    Tests the Segment class, which stores only the forward strand.
+    """
+
+    def test_strands(self):
+        segment = unicycler.assembly_graph_segment.Segment(1, 1.0, 'ACCGTTT', True)
+        self.assertEqual(segment.forward_sequence, 'ACCGTTT')
+        self.assertEqual(segment.reverse_sequence, 'AAACGGT')
+        self.assertEqual(segment.get_length(), 7)
+        segment = unicycler.assembly_graph_segment.Segment(1, 1.0, 'ACCGTTT', False)
+        self.assertEqual(segment.forward_sequence, 'AAACGGT')
+        self.assertEqual(segment.reverse_sequence, 'ACCGTTT')
+
+    def test_edits(self):
+        # Each edit is checked both with and without a cached reverse strand.
+        for cache_reverse in [False, True]:
+            segment = unicycler.assembly_graph_segment.Segment(1, 1.0, 'ACCGTTT', True)
+            expected_forward = 'ACCGTTT'
+            for edit, arg, new_forward in [
+                    ('append_to_forward_sequence', 'GA', lambda f: f + 'GA'),
+                    ('append_to_reverse_sequence', 'CC', lambda f: 'GG' + f),
+                    ('prepend_to_forward_sequence', 'T', lambda f: 'T' + f),
+                    ('prepend_to_reverse_sequence', 'AAC', lambda f: f + 'GTT'),
+                    ('trim_from_end', 2, lambda f: f[:-2]),
+                    ('trim_from_start', 3, lambda f: f[3:])]:
+                if cache_reverse:
+                    segment.get_reverse_bytes()
+                getattr(segment, edit)(arg)
+                expected_forward = new_forward(expected_forward)
+                self.assertEqual(segment.forward_sequence, expected_forward)
+                self.assertEqual(segment.reverse_sequence,
+                                 unicycler.misc.reverse_complement(expected_forward))
+
+    def test_rotate(self):
+        segment = unicycler.assembly_graph_segment.Segment(1, 1.0, 'AACCGGTTT', True)
+        segment.rotate_sequence(2, False)
+        self.assertEqual(segment.forward_sequence, 'CCGGTTTAA')
+        self.assertEqual(segment.reverse_sequence, 'TTAAACCGG')
+        segment.rotate_sequence(2, True)
+        self.assertEqual(segment.forward_sequence, 'GGTTAAACC')
+        self.assertEqual(segment.reverse_sequence, 'GGTTTAACC')
+
+    def test_remove_sequence(self):
+        segment = unicycler.assembly_graph_segment.Segment(1, 1.0, 'AACCGGTTT', True)
+        segment.remove_sequence()
+        self.assertEqual(segment.forward_sequence, '')
+        self.assertEqual(segment.reverse_sequence, '')
+        self.assertEqual(segment.get_length(), 0)
+        self.assertFalse(segment.is_homopolymer())
+
+    def test_homopolymer(self):
+        self.assertTrue(unicycler.assembly_graph_segment.Segment(1, 1.0, 'AaAA',
+                                                                 True).is_homopolymer())
+        self.assertFalse(unicycler.assembly_graph_segment.Segment(1, 1.0, 'AACA',
+                                                                  True).is_homopolymer())
+
+    def test_no_instance_dict(self):
+        segment = unicycler.assembly_graph_segment.Segment(1, 1.0, 'ACGT', True)
+        with self.assertRaises(AttributeError):
+            segment.some_new_attribute = 1
+
+
 class TestAssemblyGraphFunctions2(unittest.TestCase):
     """
     Tests various AssemblyGraph functions on a graph loaded from a GFA file.
@@ -442,6 +660,13 @@ class TestAssemblyGraphFunctions2(unittest.TestCase):
         with self.assertRaises(unicycler.assembly_graph.BadPath):
             self.graph.get_path_sequence([14, 12])
 
+    def test_get_path_bytes(self):
+        p = [-6, -12, -13, -14, -15, -8, -11, -6, -12, -13, -14, -15, -10]
+        self.assertEqual(self.graph.get_path_bytes(p), self.graph.get_path_sequence(p).encode())
+        for seg_num in self.graph.segments:
+            self.assertEqual(self.graph.bytes_from_signed_seg_num(-seg_num).decode(),
+                             self.graph.seq_from_signed_seg_num(-seg_num))
+
     def test_bad_overlaps(self):
         self.graph.overlap = 4
         with self.assertRaises(unicycler.assembly_graph.BadOverlaps):
@@ -489,6 +714,37 @@ class TestAssemblyGraphFunctions2(unittest.TestCase):
                          'ATAGGAGTCTCGGGGATGATCAACTTTACA')
         self.assertEqual(self.graph.segments[7].forward_sequence, 'CAGATCTACTTTATATAG')
 
+    def test_merge_all_possible_same_as_restarting(self):
+        # Merging in one sweep must give the same graph as merging one simple path at a time and
+        # starting over after each.
+        random.seed(0)
+        temp_dir = tempfile.mkdtemp()
+        try:
+            for _ in range(20):
+                gfa_filename = os.path.join(temp_dir, 'graph.gfa')
+                write_random_chain_gfa(gfa_filename, random.randint(1, 200))
+                graph_1 = unicycler.assembly_graph.AssemblyGraph(gfa_filename, 0)
+                graph_2 = unicycler.assembly_graph.AssemblyGraph(gfa_filename, 0)
+                graph_1.merge_all_possible(None, 2)
+                while True:
+                    for num in sorted(graph_2.segments):
+                        path = graph_2.get_simple_path(num, None, 2)
+                        if len(path) > 1:
+                            graph_2.merge_simple_path(path)
+                            break
+                    else:
+                        break
+                graph_2.renumber_segments()
+                self.assertEqual(list(graph_1.forward_links.items()),
+                                 list(graph_2.forward_links.items()))
+                self.assertEqual(list(graph_1.paths.items()), list(graph_2.paths.items()))
+                self.assertEqual([(num, seg.forward_sequence, seg.depth)
+                                  for num, seg in graph_1.segments.items()],
+                                 [(num, seg.forward_sequence, seg.depth)
+                                  for num, seg in graph_2.segments.items()])
+        finally:
+            shutil.rmtree(temp_dir)
+
     def test_get_simple_path(self):
         self.assertEqual(self.graph.get_simple_path(1, None, 2), [1, 2, 3, 4, 5])
         self.assertEqual(self.graph.get_simple_path(2, None, 2), [1, 2, 3, 4, 5])
@@ -510,6 +766,31 @@ class TestAssemblyGraphFunctions2(unittest.TestCase):
         self.assertEqual(self.graph.get_simple_path(18, None, 2), [18])
         self.assertEqual(self.graph.get_simple_path(19, None, 2), [19])
 
+    def test_merge_all_possible_paths(self):
+        self.graph.paths = {'a': [1, 2, 3, 4, 5, 6], 'b': [-5, -4, -3, -2, -1, 11],
+                            'c': [7, 9, 10, 6], 'd': [2, 3, 8, 3, 4], 'e': [14, 13]}
+        self.graph.merge_all_possible(None, 2)
+        seg_nums = {self.graph.segments[x].forward_sequence: x for x in self.graph.segments}
+        merged_seg_num = seg_nums['TTCTATTTTGCAACTGAATTGGCTTATCTTGCACGACATGATGACCCGCG']
+        self.assertEqual(sorted(self.graph.paths), ['a', 'b', 'c'])
+        self.assertEqual(self.graph.paths['a'][0], merged_seg_num)
+        self.assertEqual(self.graph.paths['b'][0], -merged_seg_num)
+
+    def test_merge_segments_in_paths(self):
+        merges = [([1, 2], 10), ([3, 4], 11)]
+        paths = {'a': [1, 2, 3, 4], 'b': [5, 2, 1, 6], 'c': [-2, -1, 7, 3, 8, 9]}
+        self.assertEqual(unicycler.assembly_graph.merge_segments_in_paths(paths, merges),
+                         {'a': [10, 11], 'c_1': [-10, 7], 'c_2': [8, 9]})
+
+    def test_merge_segments_in_paths_name_clash(self):
+        # Splitting path 'a' makes a piece named 'a_1', which clashes with an existing path.
+        merges = [([1, 2], 10), ([3, 4], 11)]
+        paths = {'a': [5, 6, 1, 7, 8], 'a_1': [3, 4, 9]}
+        self.assertEqual(unicycler.assembly_graph.merge_segments_in_paths(paths, merges),
+                         unicycler.assembly_graph.merge_segments_in_paths_slowly(paths, merges))
+        self.assertEqual(unicycler.assembly_graph.merge_segments_in_paths(paths, merges),
+                         {'a_1': [11, 9], 'a_2': [7, 8]})
+
     def test_get_mean_path_depth(self):
         self.assertAlmostEqual(self.graph.get_mean_path_depth([1])[0], 1.0)
         self.assertAlmostEqual(self.graph.get_mean_path_depth([1, 2, 3, 4, 5])[0], 1.0)
@@ -853,6 +1134,30 @@ class TestRepairMultiwayJunction(unittest.TestCase):
         self.assertEqual(sorted(self.graph.get_downstream_seg_nums(new_seg_num_2)), [-31, 32])
         self.assertEqual(sorted(self.graph.get_upstream_seg_nums(new_seg_num_2)), [-29, 28])
 
+    def test_get_junction_group(self):
+        self.assertEqual(self.graph.get_junction_group(1), ({1, 2}, {-4, -3}))
+        self.assertEqual(self.graph.get_junction_group(2), ({1, 2}, {-4, -3}))
+        self.assertEqual(self.graph.get_junction_group(4), ({3, 4}, {-2, -1}))
+        self.assertEqual(self.graph.get_junction_group(-7), ({-7, 5, 6}, {-8, -9}))
+
+    def test_repair_multi_way_junctions_large_star(self):
+        # Thousands of segments all leading into one segment make a single junction group, which
+        # is only looked at once (and is too big to repair).
+        hub = self.graph.get_next_available_seg_number()
+        self.graph.segments[hub] = unicycler.assembly_graph_segment.Segment(hub, 1.0, 'ACGT', True)
+        for seg_num in range(hub + 1, hub + 3001):
+            self.graph.segments[seg_num] = \
+                unicycler.assembly_graph_segment.Segment(seg_num, 1.0, 'ACGT', True)
+            self.graph.add_link(seg_num, hub)
+        self.graph.add_link(hub, 1)
+        self.graph.add_link(hub, 2)
+        upstream_segs, downstream_segs = self.graph.get_junction_group(hub + 1)
+        self.assertEqual(len(upstream_segs), 3000)
+        self.assertEqual(downstream_segs, {hub})
+        self.graph.repair_multi_way_junctions()
+        self.assertEqual(len(self.graph.get_upstream_seg_nums(hub)), 3000)
+        self.assertEqual(sorted(self.graph.get_downstream_seg_nums(hub)), [1, 2])
+
 
 class TestRemoveZeroLengthSegments(unittest.TestCase):
     """
@@ -13,8 +13,14 @@ not, see <http://www.gnu.org/licenses/>.
 
 import unittest
 import os
+import itertools
+import random
+import sys
+import tempfile
+import types
 import unicycler.assembly_graph
 import unicycler.assembly_graph_copy_depth
+import unicycler.log
 
 
 class TestCopyDepth(unittest.TestCase):
@@ -90,3 +96,128 @@ class TestCopyDepth(unittest.TestCase):
         self.assertEqual(len(self.graph.copy_depths[308]), 3)
         self.assertEqual(len(self.graph.copy_depths[9]), 1)
         self.assertEqual(len(self.graph.copy_depths[10]), 2)
+
+
+class TestCopyDepthPropagation(unittest.TestCase):
+
+    def setUp(self):
+        unicycler.log.logger = unicycler.log.Log(log_filename=None, stdout_verbosity_level=0)
+
+    def test_long_chain_of_splits(self):
+        """
+        Tests a long chain of bubbles: two single copy segments merge into a two-copy segment,
+        which splits into two branches, which merge into the next two-copy segment, etc. Every
+        split is a separate redistribution, so this needs to work without recursion.
+        """
+        bubble_count = 300
+        with tempfile.TemporaryDirectory() as temp_dir:
+            gfa_filename = os.path.join(temp_dir, 'chain.gfa')
+            with open(gfa_filename, 'wt') as gfa:
+                gfa.write('S\t1\t' + 'A' * 5000 + '\tDP:f:10.0\n')
+                gfa.write('S\t2\t' + 'C' * 5000 + '\tDP:f:10.0\n')
+                links = [(1, 3), (2, 3)]
+                for i in range(bubble_count):
+                    repeat, branch_1, branch_2 = 3 * i + 3, 3 * i + 4, 3 * i + 5
+                    gfa.write('S\t' + str(repeat) + '\t' + 'G' * 100 + '\tDP:f:20.0\n')
+                    gfa.write('S\t' + str(branch_1) + '\t' + 'T' * 100 + '\tDP:f:13.0\n')
+                    gfa.write('S\t' + str(branch_2) + '\t' + 'A' * 100 + '\tDP:f:7.0\n')
+                    links += [(repeat, branch_1), (repeat, branch_2),
+                              (branch_1, repeat + 3), (branch_2, repeat + 3)]
+                gfa.write('S\t' + str(3 * bubble_count + 3) + '\t' + 'G' * 100 + '\tDP:f:20.0\n')
+                for start, end in links:
+                    gfa.write('L\t' + str(start) + '\t+\t' + str(end) + '\t+\t0M\n')
+            graph = unicycler.assembly_graph.AssemblyGraph(gfa_filename, 0)
+
+        recursion_limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(100)
+        try:
+            unicycler.assembly_graph_copy_depth.determine_copy_depth(graph)
+        finally:
+            sys.setrecursionlimit(recursion_limit)
+
+        self.assertEqual(len(graph.copy_depths), len(graph.segments))
+        for i in range(bubble_count):
+            self.assertEqual(len(graph.copy_depths[3 * i + 3]), 2)
+            self.assertEqual(len(graph.copy_depths[3 * i + 4]), 1)
+            self.assertEqual(len(graph.copy_depths[3 * i + 5]), 1)
+        self.assertEqual(len(graph.copy_depths[3 * bubble_count + 3]), 2)
+
+
+class TestCopyDepthArrangement(unittest.TestCase):
+
+    @staticmethod
+    def make_graph(seg_depths):
+        segments = {i + 1: types.SimpleNamespace(depth=x) for i, x in enumerate(seg_depths)}
+        return types.SimpleNamespace(segments=segments)
+
+    @staticmethod
+    def brute_force_arrangement(graph, segment_numbers, copy_depths, targets, error_margin):
+        best_error, best_arrangement = error_margin, None
+        for item_bins in itertools.product(range(len(segment_numbers)), repeat=len(copy_depths)):
+            arrangement = [[] for _ in segment_numbers]
+            for copy_depth, b in zip(copy_depths, item_bins):
+                arrangement[b].append(copy_depth)
+            if not all(arrangement) or any(target and target != len(x)
+                                           for target, x in zip(targets, arrangement)):
+                continue
+            error = unicycler.assembly_graph_copy_depth.\
+                get_error_for_multiple_segments_and_depths(graph, segment_numbers, arrangement)
+            if error < best_error:
+                best_error, best_arrangement = error, arrangement
+        if best_arrangement is None:
+            return float('inf'), None
+        return best_error, best_arrangement
+
+    def test_same_as_brute_force(self):
+        random.seed(0)
+        for _ in range(300):
+            bin_count = random.randint(1, 3)
+            copy_depths = sorted([round(random.choice([1.0, 2.0]) * random.uniform(0.7, 1.3), 1)
+                                  for _ in range(random.randint(1, 7))], reverse=True)
+            graph = self.make_graph([round(random.uniform(0.5, 4.0), 1)
+                                     for _ in range(bin_count)])
+            segment_numbers = list(graph.segments)
+            targets = [random.choice([None, None, 1, 2]) for _ in range(bin_count)]
+            error_margin = random.choice([0.1, 0.5, 1.0])
+            self.assertEqual(
+                unicycler.assembly_graph_copy_depth.get_best_copy_depth_arrangement(
+                    graph, segment_numbers, copy_depths, targets, error_margin),
+                self.brute_force_arrangement(graph, segment_numbers, copy_depths, targets,
+                                             error_margin))
+
+    def test_high_multiplicity_repeat(self):
+        """
+        A repeat with 30 copies splitting into three segments has far too many arrangements to try
+        them all, but when the copies share a few depths, the best one is still found.
+        """
+        random.seed(0)
+        copy_depths = sorted([random.choice([9.5, 10.5]) for _ in range(30)], reverse=True)
+        graph = self.make_graph([50.0, 150.0, 100.0])
+        error, arrangement = unicycler.assembly_graph_copy_depth.get_best_copy_depth_arrangement(
+            graph, [1, 2, 3], copy_depths, [None, None, None], 0.5)
+        self.assertEqual(sorted(itertools.chain.from_iterable(arrangement), reverse=True),
+                         copy_depths)
+
+        # Check the error against every way of splitting each depth's copies between the segments.
+        best_error = float('inf')
+        counts = [copy_depths.count(x) for x in (9.5, 10.5)]
+        splits = [[(a, b, n - a - b) for a in range(n + 1) for b in range(n + 1 - a)]
+                  for n in counts]
+        for split_1, split_2 in itertools.product(*splits):
+            split_arrangement = [[9.5] * x + [10.5] * y for x, y in zip(split_1, split_2)]
+            if all(split_arrangement):
+                best_error = min(best_error, unicycler.assembly_graph_copy_depth.
+                                 get_error_for_multiple_segments_and_depths(graph, [1, 2, 3],
+                                                                            split_arrangement))
+        self.assertEqual(error, best_error)
+
+    def test_too_many_steps(self):
+        """
+        With 30 different copy depths, the search can't finish, so it gives up rather than return
+        an arrangement which might not be the best.
+        """
+        random.seed(0)
+        copy_depths = sorted([random.uniform(9.0, 11.0) for _ in range(30)], reverse=True)
+        graph = self.make_graph([50.0, 150.0, 100.0])
+        self.assertEqual(unicycler.assembly_graph_copy_depth.get_best_copy_depth_arrangement(
+            graph, [1, 2, 3], copy_depths, [None, None, None], 0.5), (float('inf'), None))
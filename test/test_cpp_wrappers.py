@@ -13,6 +13,9 @@ not, see <http://www.gnu.org/licenses/>.
 
 import unittest
 import os
+import random
+import shutil
+import tempfile
 import unicycler.cpp_wrappers
 import unicycler.read_ref
 import unicycler.alignment
@@ -29,10 +32,7 @@ class TestFullyGlobalAlignment(unittest.TestCase):
 
     @staticmethod
     def get_raw_and_scaled_scores(result):
-        seqan_parts = result.split(',', 9)
-        raw_score = int(seqan_parts[6])
-        scaled_score = float(seqan_parts[7])
-        return raw_score, scaled_score
+        return result.raw_score, result.scaled_score
 
     def test_perfect_alignment(self):
         result = unicycler.cpp_wrappers.fully_global_alignment(self.seqs[0], self.seqs[1],
@@ -41,6 +41,15 @@ class TestFullyGlobalAlignment(unittest.TestCase):
         self.assertEqual(raw_score, 60)
         self.assertEqual(scaled_score, 100.0)
 
+    def test_packed_cigar(self):
+        result = unicycler.cpp_wrappers.fully_global_alignment(self.seqs[0], self.seqs[5],
+                                                                self.scoring_scheme, True, 1000)
+        cigar_parts = unicycler.alignment.unpack_cigar(result.cigar)
+        self.assertEqual(cigar_parts, ['3M', '2D', '17M'])
+        self.assertEqual(unicycler.alignment.pack_cigar(''.join(cigar_parts)), result.cigar)
+        self.assertEqual(result.read_end_pos, 20)
+        self.assertEqual(result.ref_end_pos, 22)
+
     def test_one_mismatch(self):
         result = unicycler.cpp_wrappers.fully_global_alignment(self.seqs[0], self.seqs[2],
                                                                 self.scoring_scheme, True, 1000)
@@ -212,3 +221,37 @@ class TestMultipleSequenceAlignment(unittest.TestCase):
         consensus, scores = unicycler.cpp_wrappers.consensus_alignment(seqs, quals,
                                                                        self.scoring_scheme)
         self.assertEqual(consensus, self.original_seq)
+
+
+class TestMinimapAlignment(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(0)
+        self.temp_dir = tempfile.mkdtemp()
+        ref_seq = unicycler.misc.get_random_sequence(10000)
+        self.ref_fasta = os.path.join(self.temp_dir, 'ref.fasta')
+        with open(self.ref_fasta, 'wt') as f:
+            f.write('>ref\n' + ref_seq + '\n')
+        self.reads_fastq = os.path.join(self.temp_dir, 'reads.fastq')
+        with open(self.reads_fastq, 'wt') as f:
+            for start in [0, 2000, 4000]:
+                read_seq = ref_seq[start:start+3000]
+                f.write('@read\n' + read_seq + '\n+\n' + '?' * len(read_seq) + '\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def get_read_names(self, read_renames):
+        result = unicycler.cpp_wrappers.minimap_align_reads(self.ref_fasta, self.reads_fastq, 1, 0,
+                                                            read_renames=read_renames)
+        return {line.split('\t')[0]: int(line.split('\t')[7])
+                for line in result.splitlines() if line}
+
+    def test_no_renames(self):
+        self.assertEqual(list(self.get_read_names(None)), ['read'])
+
+    def test_renames(self):
+        read_starts = self.get_read_names({1: 'read_2', 2: 'read_3'})
+        self.assertEqual(sorted(read_starts), ['read', 'read_2', 'read_3'])
+        self.assertLess(read_starts['read'], read_starts['read_2'])
+        self.assertLess(read_starts['read_2'], read_starts['read_3'])
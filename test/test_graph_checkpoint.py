@@ -0,0 +1,99 @@
+"""
+Copyright 2017 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Unicycler
+
+This file is part of Unicycler. Unicycler is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Unicycler is distributed in
+the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Unicycler. If
+not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import struct
+import tempfile
+import unittest
+import unicycler.assembly_graph
+import unicycler.assembly_graph_copy_depth
+import unicycler.bridge_spades_contig
+import unicycler.graph_checkpoint
+import unicycler.log
+
+
+def graph_state(graph):
+    return ([(num, seg.forward_sequence, seg.depth, seg.original_depth, seg.graph_path,
+              seg.used_in_bridges, type(seg.bridge)) for num, seg in graph.segments.items()],
+            list(graph.forward_links.items()), list(graph.reverse_links.items()),
+            sorted(graph.paths.items()), graph.copy_depths, graph.manual_multiplicity,
+            graph.overlap, graph.insert_size_mean, graph.insert_size_deviation)
+
+
+class TestGraphCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        unicycler.log.logger = unicycler.log.Log(log_filename=None, stdout_verbosity_level=0)
+        test_gfa = os.path.join(os.path.dirname(__file__), 'test_assembly_graph.gfa')
+        self.graph = unicycler.assembly_graph.AssemblyGraph(test_gfa, 25, insert_size_mean=401,
+                                                            insert_size_deviation=60)
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.checkpoint = os.path.join(self.temp_dir.name, 'graph.checkpoint')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def save_and_load(self):
+        self.graph.save_checkpoint(self.checkpoint, verbosity=5)
+        return unicycler.assembly_graph.AssemblyGraph.load_checkpoint(self.checkpoint)
+
+    def test_round_trip(self):
+        self.graph.manual_multiplicity[4] = 2
+        loaded_graph = self.save_and_load()
+        self.assertEqual(graph_state(self.graph), graph_state(loaded_graph))
+
+    def test_round_trip_with_copy_depths_and_bridge(self):
+        unicycler.assembly_graph_copy_depth.determine_copy_depth(self.graph)
+        bridge = unicycler.bridge_spades_contig.SpadesContigBridge(self.graph, [1, 71, -104, 103])
+        self.graph.apply_bridge(bridge, set(), set(), [])
+        bridge_seg_num = max(self.graph.segments)
+        self.assertTrue(self.graph.segments[71].used_in_bridges)
+        self.assertFalse(self.graph.segments[71].original_depth)
+        loaded_graph = self.save_and_load()
+        self.assertEqual(graph_state(self.graph), graph_state(loaded_graph))
+
+        loaded_bridge = loaded_graph.segments[bridge_seg_num].bridge
+        self.assertEqual(loaded_bridge.start_segment, 1)
+        self.assertEqual(loaded_bridge.end_segment, 103)
+        self.assertEqual(loaded_bridge.quality, bridge.quality)
+        self.assertEqual(loaded_bridge.segments_reduced_depth, bridge.segments_reduced_depth)
+
+        # Removing the bridge segment gives its depth back in the same way in both graphs.
+        self.graph.remove_segments([bridge_seg_num])
+        loaded_graph.remove_segments([bridge_seg_num])
+        self.assertEqual(graph_state(self.graph), graph_state(loaded_graph))
+
+    def test_metadata(self):
+        self.graph.save_checkpoint(self.checkpoint, metadata={'stage': 'test'}, verbosity=5)
+        self.assertEqual(unicycler.graph_checkpoint.load_checkpoint_metadata(self.checkpoint),
+                         {'stage': 'test'})
+
+    def test_wrong_version(self):
+        self.graph.save_checkpoint(self.checkpoint, verbosity=5)
+        with open(self.checkpoint, 'r+b') as checkpoint:
+            checkpoint.seek(len(unicycler.graph_checkpoint.CHECKPOINT_MAGIC))
+            checkpoint.write(struct.pack('<I', unicycler.graph_checkpoint.CHECKPOINT_VERSION + 1))
+        with self.assertRaises(unicycler.graph_checkpoint.BadCheckpoint):
+            unicycler.assembly_graph.AssemblyGraph.load_checkpoint(self.checkpoint)
+
+    def test_truncated(self):
+        self.graph.save_checkpoint(self.checkpoint, verbosity=5)
+        with open(self.checkpoint, 'r+b') as checkpoint:
+            checkpoint.truncate(os.path.getsize(self.checkpoint) - 10)
+        with self.assertRaises(unicycler.graph_checkpoint.BadCheckpoint):
+            unicycler.assembly_graph.AssemblyGraph.load_checkpoint(self.checkpoint)
+
+    def test_not_a_checkpoint(self):
+        self.graph.save_to_gfa(self.checkpoint, verbosity=5)
+        with self.assertRaises(unicycler.graph_checkpoint.BadCheckpoint):
+            unicycler.assembly_graph.AssemblyGraph.load_checkpoint(self.checkpoint)
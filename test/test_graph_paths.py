@@ -0,0 +1,115 @@
+"""
+Copyright 2017 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Unicycler
+
+This file is part of Unicycler. Unicycler is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Unicycler is distributed in
+the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Unicycler. If
+not, see <http://www.gnu.org/licenses/>.
+"""
+
+import copy
+import os
+import random
+import tempfile
+import unittest
+import unicycler.assembly_graph
+import unicycler.bridge_spades_contig
+import unicycler.graph_paths
+import unicycler.log
+
+
+def build_index(paths):
+    """
+    Builds the segment index from scratch, to check against the incrementally-maintained one.
+    """
+    index = {}
+    for name, path in paths.items():
+        for i, seg_num in enumerate(path):
+            index.setdefault(abs(seg_num), {}).setdefault(name, []).append(i)
+    return index
+
+
+class TestGraphPaths(unittest.TestCase):
+
+    def setUp(self):
+        unicycler.log.logger = unicycler.log.Log(log_filename=None, stdout_verbosity_level=0)
+
+    def test_index(self):
+        paths = unicycler.graph_paths.GraphPaths({'a': [1, 2, -1], 'b': [-2, 3]})
+        self.assertEqual(paths.get_positions(1), {'a': [0, 2]})
+        self.assertEqual(paths.get_positions(-2), {'a': [1], 'b': [0]})
+        self.assertEqual(paths.get_positions(4), {})
+        self.assertEqual(paths.get_path_names([3, 4]), {'b'})
+        paths['a'] = [4]
+        self.assertEqual(paths.get_positions(1), {})
+        self.assertEqual(paths.get_path_names([-4]), {'a'})
+        del paths['b']
+        self.assertEqual(paths.segment_index, {4: {'a': [0]}})
+        self.assertEqual(list(paths), ['a'])
+
+    def test_index_random_changes(self):
+        rng = random.Random(0)
+        paths = unicycler.graph_paths.GraphPaths()
+        for _ in range(1000):
+            name = 'path_' + str(rng.randint(1, 20))
+            r = rng.random()
+            if r < 0.6:
+                paths[name] = [rng.choice([-1, 1]) * rng.randint(1, 30)
+                               for _ in range(rng.randint(1, 6))]
+            elif r < 0.8:
+                paths.pop(name, None)
+            elif r < 0.9:
+                paths.setdefault(name, [rng.randint(1, 30)])
+            elif paths:
+                paths.popitem()
+            self.assertEqual(paths.segment_index, build_index(paths))
+        paths_copy = copy.deepcopy(paths)
+        self.assertTrue(isinstance(paths_copy, unicycler.graph_paths.GraphPaths))
+        self.assertEqual(paths_copy, paths)
+        self.assertEqual(paths_copy.segment_index, paths.segment_index)
+
+    def test_graph_paths_stay_indexed(self):
+        test_gfa = os.path.join(os.path.dirname(__file__), 'test_assembly_graph.gfa')
+        graph = unicycler.assembly_graph.AssemblyGraph(test_gfa, 0)
+        self.assertTrue(isinstance(graph.paths, unicycler.graph_paths.GraphPaths))
+        graph.paths = dict(graph.paths)
+        self.assertTrue(isinstance(graph.paths, unicycler.graph_paths.GraphPaths))
+        self.assertEqual(graph.paths.segment_index, build_index(graph.paths))
+        graph.remove_segments([1, 5])
+        self.assertEqual(graph.paths.segment_index, build_index(graph.paths))
+        graph.merge_all_possible(None, 2)
+        self.assertEqual(graph.paths.segment_index, build_index(graph.paths))
+
+    def test_removed_link_invalidates_path(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            gfa_filename = os.path.join(temp_dir, 'graph.gfa')
+            with open(gfa_filename, 'wt') as gfa:
+                for i in range(1, 5):
+                    gfa.write('S\t' + str(i) + '\tACGT\tDP:f:1.0\n')
+                for i in range(1, 4):
+                    gfa.write('L\t' + str(i) + '\t+\t' + str(i + 1) + '\t+\t0M\n')
+                gfa.write('P\ta\t1+,2+,3+\t*\n')
+                gfa.write('P\tb\t3+,4+\t*\n')
+            graph = unicycler.assembly_graph.AssemblyGraph(gfa_filename, 0)
+        graph.remove_segments([])
+        self.assertEqual(graph.paths, {'a': [1, 2, 3], 'b': [3, 4]})
+        self.assertEqual(graph.paths.unchecked, set())
+
+        # Only paths which might use the removed link are checked (and invalid ones deleted).
+        graph.remove_link(-2, -1)
+        self.assertEqual(graph.paths.unchecked, {'a'})
+        graph.remove_segments([])
+        self.assertEqual(graph.paths, {'b': [3, 4]})
+
+    def test_contig_bridges_from_index(self):
+        path = [5, 1, 2, -3, 4, 1, 6]
+        for seg_num in [1, 3, 4]:
+            indices = [i for i, x in enumerate(path) if abs(x) == seg_num]
+            self.assertEqual(
+                unicycler.bridge_spades_contig.find_contig_bridges(seg_num, path, {1, 3, 4},
+                                                                   indices),
+                unicycler.bridge_spades_contig.find_contig_bridges(seg_num, path, [1, 3, 4]))
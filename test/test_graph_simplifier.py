@@ -0,0 +1,134 @@
+"""
+Copyright 2017 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Unicycler
+
+This file is part of Unicycler. Unicycler is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Unicycler is distributed in
+the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Unicycler. If
+not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import random
+import tempfile
+import unittest
+import unicycler.assembly_graph
+import unicycler.graph_simplifier
+import unicycler.log
+
+
+def clean_with_graph_methods(graph):
+    while True:
+        graph.repair_multi_way_junctions()
+        graph.remove_unnecessary_links()
+        graph.expand_repeats()
+        if not graph.remove_zero_length_segs():
+            break
+    while True:
+        if not graph.merge_small_segments(5):
+            break
+
+
+def clean_with_simplifier(graph):
+    simplifier = unicycler.graph_simplifier.GraphSimplifier(graph)
+    while True:
+        simplifier.repair_multi_way_junctions()
+        simplifier.remove_unnecessary_links()
+        simplifier.expand_repeats()
+        if not simplifier.remove_zero_length_segs():
+            break
+    while True:
+        if not simplifier.merge_small_segments(5):
+            break
+    simplifier.detach()
+
+
+def graph_state(graph):
+    return ([(num, seg.forward_sequence, seg.depth) for num, seg in graph.segments.items()],
+            list(graph.forward_links.items()), list(graph.reverse_links.items()),
+            sorted(graph.paths.items()))
+
+
+def write_random_gfa(gfa_filename, rng):
+    """
+    Makes a small graph with lots of zero-length and small segments. Links only go forward to
+    nearby segments, as junction repair can go around in circles on some graphs with loops.
+    """
+    segment_count = rng.randint(1, 40)
+    with open(gfa_filename, 'wt') as gfa:
+        for i in range(1, segment_count + 1):
+            seq = ''.join(rng.choice('AC') for _ in range(rng.choice([0, 0, 2, 4, 6, 10])))
+            gfa.write('S\t' + str(i) + '\t' + seq + '\tDP:f:' + str(rng.uniform(1, 10)) + '\n')
+        links = set()
+        for _ in range(rng.randint(0, 2 * segment_count)):
+            start = rng.randint(1, segment_count)
+            end = rng.randint(start, min(segment_count, start + 3))
+            if start != end:
+                links.add((start, '+', end, '+'))
+        for start, start_strand, end, end_strand in sorted(links):
+            gfa.write('L\t' + str(start) + '\t' + start_strand + '\t' + str(end) + '\t' +
+                      end_strand + '\t0M\n')
+
+
+class TestGraphSimplifier(unittest.TestCase):
+
+    def setUp(self):
+        unicycler.log.logger = unicycler.log.Log(log_filename=None, stdout_verbosity_level=0)
+
+    def load_test_graphs(self, gfa_name):
+        test_gfa = os.path.join(os.path.dirname(__file__), gfa_name)
+        graph_1 = unicycler.assembly_graph.AssemblyGraph(test_gfa, None)
+        graph_2 = unicycler.assembly_graph.AssemblyGraph(test_gfa, None)
+        graph_1.remove_all_overlaps()
+        graph_2.remove_all_overlaps()
+        return graph_1, graph_2
+
+    def test_same_as_graph_methods(self):
+        for gfa_name in ['test_assembly_graph.gfa', 'test_multiway_junction_repair.gfa',
+                         'test_remove_zero_length_segs.gfa', 'test_expand_repeats.gfa']:
+            graph_1, graph_2 = self.load_test_graphs(gfa_name)
+            clean_with_graph_methods(graph_1)
+            clean_with_simplifier(graph_2)
+            self.assertEqual(graph_state(graph_1), graph_state(graph_2))
+            self.assertIsNone(graph_2.simplifier)
+
+    def test_single_passes(self):
+        graph_1, graph_2 = self.load_test_graphs('test_multiway_junction_repair.gfa')
+        simplifier = unicycler.graph_simplifier.GraphSimplifier(graph_2)
+        graph_1.repair_multi_way_junctions()
+        simplifier.repair_multi_way_junctions()
+        self.assertEqual(graph_state(graph_1), graph_state(graph_2))
+        self.assertEqual(graph_1.remove_zero_length_segs(), simplifier.remove_zero_length_segs())
+        self.assertEqual(graph_state(graph_1), graph_state(graph_2))
+
+        # Nothing has changed since the last pass, so there's nothing left to look at.
+        self.assertEqual(simplifier.remove_zero_length_segs(), 0)
+        self.assertEqual(simplifier.zero_length_segs.pending, set())
+        simplifier.detach()
+
+    def test_same_as_graph_methods_random(self):
+        rng = random.Random(0)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            gfa_filename = os.path.join(temp_dir, 'graph.gfa')
+            for _ in range(200):
+                write_random_gfa(gfa_filename, rng)
+                graph_1 = unicycler.assembly_graph.AssemblyGraph(gfa_filename, 0)
+                graph_2 = unicycler.assembly_graph.AssemblyGraph(gfa_filename, 0)
+                clean_with_graph_methods(graph_1)
+                clean_with_simplifier(graph_2)
+                self.assertEqual(graph_state(graph_1), graph_state(graph_2))
+
+    def test_worklist(self):
+        worklist = unicycler.graph_simplifier.Worklist([5, 1, 3], abs)
+        worklist.start_sweep(lambda x: x != 3)
+        self.assertEqual(worklist.pop(), 1)
+        worklist.add(4)  # after the current key, so it's in this sweep
+        worklist.add(1)  # not after the current key, so it waits for the next sweep
+        self.assertEqual(worklist.pop(), 4)
+        self.assertEqual(worklist.pop(), 5)
+        self.assertEqual(worklist.pop(), None)
+        worklist.end_sweep()
+        self.assertEqual(worklist.pending, {1})
@@ -66,6 +66,7 @@ class TestBasicHelpText(unittest.TestCase):
         self.assertFalse('--min_kmer_frac' in self.stdout)
         self.assertFalse('--max_kmer_frac' in self.stdout)
         self.assertFalse('--kmer_count' in self.stdout)
+        self.assertFalse('--kmer_search' in self.stdout)
         self.assertFalse('--no_rotate' in self.stdout)
         self.assertFalse('--start_genes' in self.stdout)
         self.assertFalse('--start_gene_id' in self.stdout)
@@ -115,6 +116,7 @@ class TestExtendedHelpText(unittest.TestCase):
         self.assertTrue('--min_kmer_frac' in self.stdout)
         self.assertTrue('--max_kmer_frac' in self.stdout)
         self.assertTrue('--kmer_count' in self.stdout)
+        self.assertTrue('--kmer_search' in self.stdout)
         self.assertTrue('--no_rotate' in self.stdout)
         self.assertTrue('--start_genes' in self.stdout)
         self.assertTrue('--start_gene_id' in self.stdout)
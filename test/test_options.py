@@ -97,6 +97,10 @@ class TestUnicyclerOptions(unittest.TestCase):
         min_kmer_frac_default = float(get_default_from_help('--min_kmer_frac', help_text))
         max_kmer_frac_default = float(get_default_from_help('--max_kmer_frac', help_text))
         kmer_count_default = int(get_default_from_help('--kmer_count', help_text))
+        kmer_search_default = get_default_from_help('--kmer_search', help_text)
+        spades_cache_size_default = float(get_default_from_help('--spades_cache_size', help_text))
+        kmer_search_patience_default = int(get_default_from_help('--kmer_search_patience',
+                                                                 help_text))
         start_gene_id_default = float(get_default_from_help('--start_gene_id', help_text))
         start_gene_cov_default = float(get_default_from_help('--start_gene_cov', help_text))
         makeblastdb_path_default = get_default_from_help('--makeblastdb_path', help_text)
@@ -104,6 +108,8 @@ class TestUnicyclerOptions(unittest.TestCase):
         min_component_size_default = int(get_default_from_help('--min_component_size', help_text))
         min_dead_end_size_default = int(get_default_from_help('--min_dead_end_size', help_text))
         scores_default = get_default_from_help('--scores', help_text)
+        target_depth_default = float(get_default_from_help('--long_read_target_depth',
+                                                           help_text).split(',')[0])
 
         sys.argv = [sys.argv[0], '-1', 'reads_1.fastq.gz', '-2', 'reads_2.fastq.gz',
                     '-o', 'out_dir']
@@ -118,6 +124,10 @@ class TestUnicyclerOptions(unittest.TestCase):
         self.assertEqual(args.min_kmer_frac, min_kmer_frac_default)
         self.assertEqual(args.max_kmer_frac, max_kmer_frac_default)
         self.assertEqual(args.kmer_count, kmer_count_default)
+        self.assertEqual(args.kmer_search, kmer_search_default)
+        self.assertIsNone(args.spades_cache)
+        self.assertEqual(args.spades_cache_size, spades_cache_size_default)
+        self.assertEqual(args.kmer_search_patience, kmer_search_patience_default)
         self.assertEqual(args.start_gene_id, start_gene_id_default)
         self.assertEqual(args.start_gene_cov, start_gene_cov_default)
         self.assertEqual(args.makeblastdb_path, makeblastdb_path_default)
@@ -125,6 +135,8 @@ class TestUnicyclerOptions(unittest.TestCase):
         self.assertEqual(args.min_component_size, min_component_size_default)
         self.assertEqual(args.min_dead_end_size, min_dead_end_size_default)
         self.assertEqual(args.scores, scores_default)
+        self.assertEqual(args.long_read_target_depth, target_depth_default)
+        self.assertFalse(args.align_in_processes)
 
     def test_modes(self):
         sys.argv = [sys.argv[0], '-1', 'reads_1.fastq.gz', '-2', 'reads_2.fastq.gz',
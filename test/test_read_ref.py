@@ -0,0 +1,248 @@
+"""
+Copyright 2017 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Unicycler
+
+This file is part of Unicycler. Unicycler is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Unicycler is distributed in
+the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Unicycler. If
+not, see <http://www.gnu.org/licenses/>.
+"""
+
+import unittest
+import os
+import gzip
+import random
+import shutil
+import tempfile
+import unicycler.read_ref
+import unicycler.log
+import unicycler.settings
+
+
+class TestLoadLongReads(unittest.TestCase):
+
+    def setUp(self):
+        unicycler.log.logger = unicycler.log.Log(log_filename=None, stdout_verbosity_level=0)
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write_file(self, name, contents, gzipped=False):
+        filename = os.path.join(self.temp_dir, name)
+        if gzipped:
+            with gzip.open(filename, 'wt') as f:
+                f.write(contents)
+        else:
+            with open(filename, 'wt') as f:
+                f.write(contents)
+        return filename
+
+    def test_fastq(self):
+        filename = self.write_file('reads.fastq', '@read_1 extra info\nACGTacgt\n+\nABCDEFGH\n'
+                                                  '\n'
+                                                  '@read_2\nGGGG\n+read_2\n!!!!\n')
+        read_dict, read_names, read_filename = \
+            unicycler.read_ref.load_long_reads(filename, silent=True)
+        self.assertEqual(read_names, ['read_1', 'read_2'])
+        self.assertEqual(read_dict['read_1'].sequence, 'ACGTACGT')
+        self.assertEqual(read_dict['read_1'].qualities, 'ABCDEFGH')
+        self.assertEqual(read_dict['read_2'].sequence, 'GGGG')
+        self.assertEqual(read_dict['read_2'].qualities, '!!!!')
+        self.assertEqual(read_filename, filename)
+
+    def test_gzipped_fasta(self):
+        filename = self.write_file('reads.fasta.gz', '>read_1\nACGT\nACGT\n\nAC\n'
+                                                     '>read_2 info\nTTTT\n', gzipped=True)
+        read_dict, read_names, read_filename = \
+            unicycler.read_ref.load_long_reads(filename, silent=True)
+        self.assertEqual(read_names, ['read_1', 'read_2'])
+        self.assertEqual(read_dict['read_1'].sequence, 'ACGTACGTAC')
+        self.assertEqual(read_dict['read_1'].qualities, '++++++++++')
+        self.assertEqual(read_dict['read_2'].sequence, 'TTTT')
+        self.assertEqual(read_filename, filename)
+
+    def test_duplicate_names(self):
+        filename = self.write_file('reads.fasta', '>read\nACGT\n>read\nCCCC\n>read\nGGGG\n')
+        read_dict, read_names, read_filename = \
+            unicycler.read_ref.load_long_reads(filename, silent=True, output_dir=self.temp_dir)
+        self.assertEqual(read_names, ['read', 'read_2', 'read_3'])
+        self.assertEqual(read_dict['read_3'].sequence, 'GGGG')
+        self.assertEqual(read_filename, filename)
+        self.assertEqual(unicycler.read_ref.get_read_renames(read_dict), {1: 'read_2', 2: 'read_3'})
+        self.assertFalse(any('no_duplicates' in x for x in os.listdir(self.temp_dir)))
+
+    def test_truncated_fastq_record(self):
+        filename = self.write_file('reads.fastq', '@read_1\nACGT\n+\n!!!!\n@read_2\nACGT\n+\n')
+        with self.assertRaises(SystemExit):
+            unicycler.read_ref.load_long_reads(filename, silent=True)
+
+    def test_unnamed_fastq_record(self):
+        filename = self.write_file('reads.fastq', '@read_1\nACGT\n+\n!!!!\n@\nACGT\n+\n!!!!\n')
+        with self.assertRaises(SystemExit):
+            unicycler.read_ref.load_long_reads(filename, silent=True)
+
+    def test_unnamed_fasta_record(self):
+        filename = self.write_file('reads.fasta', '>read_1\nACGT\n>\nCCCC\n>read_1\nGGGG\n')
+        with self.assertRaises(SystemExit):
+            unicycler.read_ref.load_long_reads(filename, silent=True)
+
+
+class TestReadStore(unittest.TestCase):
+
+    def test_round_trip(self):
+        read_store = unicycler.read_ref.ReadStore()
+        random.seed(0)
+        reads = []
+        for i in range(200):
+            length = random.randint(0, 50)
+            seq = ''.join(random.choice('ACGTacgtNRY') for _ in range(length))
+            qual = ''.join(chr(random.randint(33, 73)) for _ in range(length)) if i % 2 else None
+            reads.append((seq, qual, unicycler.read_ref.Read(str(i), seq, qual, read_store)))
+        self.assertEqual(len(read_store), 200)
+        for seq, qual, read in reads:
+            self.assertEqual(read.sequence, seq.upper())
+            self.assertEqual(read.get_length(), len(seq))
+            if qual:
+                self.assertEqual(read.qualities, qual)
+            else:
+                self.assertEqual(read.qualities, '+' * len(seq))
+            start = random.randint(0, len(seq))
+            end = random.randint(start, len(seq))
+            self.assertEqual(read.get_subsequence(start, end), seq.upper()[start:end])
+            self.assertEqual(read.get_subqualities(start, end), read.qualities[start:end])
+
+    def test_stand_alone_read(self):
+        read = unicycler.read_ref.Read('read', 'acgtn', None)
+        self.assertEqual(read.sequence, 'ACGTN')
+        self.assertEqual(read.qualities, '+++++')
+        self.assertEqual(str(read), 'read (5 bp)')
+        with self.assertRaises(AttributeError):
+            read.some_new_attribute = 1
+
+
+class TestReadStoreIndex(unittest.TestCase):
+
+    def setUp(self):
+        unicycler.log.logger = unicycler.log.Log(log_filename=None, stdout_verbosity_level=0)
+        self.temp_dir = tempfile.mkdtemp()
+        self.read_filename = os.path.join(self.temp_dir, 'reads.fastq')
+        with open(self.read_filename, 'wt') as f:
+            f.write('@read_1\nACGTNNACGT\n+\nABCDEFGHIJ\n@read_2\nGGGGA\n+\n!!!!!\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_file_backed_store(self):
+        read_dict, read_names, _ = \
+            unicycler.read_ref.load_long_reads(self.read_filename, silent=True,
+                                               output_dir=self.temp_dir)
+        self.assertTrue(os.path.isfile(os.path.join(self.temp_dir, 'long_reads.bin')))
+        self.assertTrue(os.path.isfile(os.path.join(self.temp_dir, 'long_reads.idx')))
+        self.assertEqual(read_dict['read_1'].sequence, 'ACGTNNACGT')
+        self.assertEqual(read_dict['read_1'].qualities, 'ABCDEFGHIJ')
+        self.assertEqual(read_dict['read_2'].sequence, 'GGGGA')
+        self.assertEqual(read_dict['read_2'].get_subqualities(1, 3), '!!')
+
+    def test_index_reuse(self):
+        unicycler.read_ref.load_long_reads(self.read_filename, silent=True,
+                                           output_dir=self.temp_dir)
+        read_store, read_names = unicycler.read_ref.load_read_store_from_index(
+            os.path.join(self.temp_dir, 'long_reads.idx'),
+            os.path.join(self.temp_dir, 'long_reads.bin'), self.read_filename)
+        self.assertEqual(read_names, ['read_1', 'read_2'])
+        self.assertEqual(read_store.renames, {})
+        self.assertEqual(read_store.get_sequence(0), 'ACGTNNACGT')
+        self.assertEqual(read_store.get_qualities(1), '!!!!!')
+
+    def test_stale_index(self):
+        unicycler.read_ref.load_long_reads(self.read_filename, silent=True,
+                                           output_dir=self.temp_dir)
+        with open(self.read_filename, 'at') as f:
+            f.write('@read_3\nTTTT\n+\n!!!!\n')
+        read_store, _ = unicycler.read_ref.load_read_store_from_index(
+            os.path.join(self.temp_dir, 'long_reads.idx'),
+            os.path.join(self.temp_dir, 'long_reads.bin'), self.read_filename)
+        self.assertIsNone(read_store)
+        read_dict, read_names, _ = \
+            unicycler.read_ref.load_long_reads(self.read_filename, silent=True,
+                                               output_dir=self.temp_dir)
+        self.assertEqual(read_names, ['read_1', 'read_2', 'read_3'])
+        self.assertEqual(read_dict['read_3'].sequence, 'TTTT')
+
+    def test_index_from_other_file(self):
+        unicycler.read_ref.load_long_reads(self.read_filename, silent=True,
+                                           output_dir=self.temp_dir)
+
+        # A different file with the same size and modification time doesn't use the index.
+        other_filename = os.path.join(self.temp_dir, 'other_reads.fastq')
+        with open(other_filename, 'wt') as f:
+            f.write('@read_3\nTTTTNNACGT\n+\nABCDEFGHIJ\n@read_4\nCCCCA\n+\n!!!!!\n')
+        read_stat = os.stat(self.read_filename)
+        os.utime(other_filename, ns=(read_stat.st_atime_ns, read_stat.st_mtime_ns))
+        read_store, _ = unicycler.read_ref.load_read_store_from_index(
+            os.path.join(self.temp_dir, 'long_reads.idx'),
+            os.path.join(self.temp_dir, 'long_reads.bin'), other_filename)
+        self.assertIsNone(read_store)
+
+
+class TestSubsampleLongReads(unittest.TestCase):
+
+    def setUp(self):
+        unicycler.log.logger = unicycler.log.Log(log_filename=None, stdout_verbosity_level=0)
+        self.temp_dir = tempfile.mkdtemp()
+        self.read_store = unicycler.read_ref.ReadStore()
+        self.read_dict, self.read_names = {}, []
+        random.seed(0)
+        for i in range(100):
+            length = random.randint(100, 1000)
+            quality = '5' if i % 2 else '+'  # Q20 or Q10
+            name = 'read_' + str(i)
+            self.read_dict[name] = unicycler.read_ref.Read(name, 'A' * length, quality * length,
+                                                           self.read_store)
+            self.read_names.append(name)
+        self.total_bases = sum(x.get_length() for x in self.read_dict.values())
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_zero_genome_size(self):
+        read_dict, read_names, filename = unicycler.read_ref.subsample_long_reads(
+            self.read_dict, self.read_names, 10.0, 0, self.temp_dir)
+        self.assertIs(read_dict, self.read_dict)
+        self.assertIsNone(filename)
+
+    def test_below_target(self):
+        read_dict, read_names, filename = unicycler.read_ref.subsample_long_reads(
+            self.read_dict, self.read_names, 10.0, self.total_bases / 5.0, self.temp_dir)
+        self.assertIs(read_dict, self.read_dict)
+        self.assertIsNone(filename)
+
+    def test_subsample(self):
+        genome_size = self.total_bases / 20.0
+        read_dict, read_names, filename = unicycler.read_ref.subsample_long_reads(
+            self.read_dict, self.read_names, 10.0, genome_size, self.temp_dir)
+        kept_bases = sum(x.get_length() for x in read_dict.values())
+        self.assertGreaterEqual(kept_bases, 10.0 * genome_size)
+        self.assertLess(kept_bases, 10.0 * genome_size + 1000)
+        self.assertTrue(os.path.isfile(filename))
+        self.assertTrue(os.path.isfile(os.path.join(
+            self.temp_dir, unicycler.settings.SUBSAMPLED_LONG_READ_STORE_DATA_FILENAME)))
+
+        # Reads stay in their original order, and better reads are preferred.
+        self.assertEqual(read_names, [x for x in self.read_names if x in read_dict])
+        score = lambda r: r.get_length() * r.get_mean_accuracy()
+        worst_kept = min(score(x) for x in read_dict.values())
+        best_discarded = max(score(self.read_dict[x]) for x in self.read_names
+                             if x not in read_dict)
+        self.assertGreaterEqual(worst_kept, best_discarded)
+        for name in read_names:
+            self.assertEqual(read_dict[name].sequence, self.read_dict[name].sequence)
+            self.assertEqual(read_dict[name].qualities, self.read_dict[name].qualities)
+
+    def test_mean_accuracy(self):
+        self.assertAlmostEqual(self.read_dict['read_0'].get_mean_accuracy(), 0.9)
+        self.assertAlmostEqual(self.read_dict['read_1'].get_mean_accuracy(), 0.99)
@@ -13,10 +13,12 @@ not, see <http://www.gnu.org/licenses/>.
 
 import unittest
 import os
+import random
 import unicycler.read_ref
 import unicycler.alignment
 import unicycler.unicycler_align
 import unicycler.log
+import unicycler.misc
 
 
 class TestPerfectMatchAlignments(unittest.TestCase):
@@ -227,6 +229,47 @@ class TestPerfectMatchAlignments(unittest.TestCase):
         self.assertEqual(alignment.cigar_parts[0], '300M')
 
 
+class TestProcessPoolAlignments(unittest.TestCase):
+    """
+    These tests check that aligning reads in worker processes gives the same alignments (and SAM
+    lines) as aligning them in threads.
+    """
+    def setUp(self):
+        unicycler.log.logger = unicycler.log.Log(log_filename=None, stdout_verbosity_level=0)
+        self.sam_filename = 'TEMP_' + str(os.getpid()) + '.sam'
+
+    def tearDown(self):
+        if os.path.isfile(self.sam_filename):
+            os.remove(self.sam_filename)
+
+    def do_alignment(self, use_processes):
+        ref_fasta = os.path.join(os.path.dirname(__file__), 'test_semi_global_alignment.fasta')
+        read_fastq = os.path.join(os.path.dirname(__file__), 'test_semi_global_alignment.fastq')
+        refs = unicycler.read_ref.load_references(ref_fasta)
+        read_dict, read_names, _ = unicycler.read_ref.load_long_reads(read_fastq)
+        scoring_scheme = unicycler.alignment.AlignmentScoringScheme('3,-6,-5,-2')
+        aligned_reads = unicycler.unicycler_align.\
+            semi_global_align_long_reads(refs, ref_fasta, read_dict, read_names, read_fastq, 3,
+                                         scoring_scheme, [None], False, 10, self.sam_filename,
+                                         None, 0, 0, None, 0, use_processes=use_processes)
+        alignments = {name: [(x.ref.name, x.rev_comp, x.read_start_pos, x.read_end_pos,
+                              x.ref_start_pos, x.ref_end_pos, x.cigar_parts, x.raw_score,
+                              x.scaled_score, x.percent_identity, x.edit_distance)
+                             for x in read.alignments]
+                      for name, read in aligned_reads.items()}
+        with open(self.sam_filename, 'rt') as sam_file:
+            sam_lines = sorted(sam_file)
+        return alignments, sam_lines
+
+    def test_same_as_threads(self):
+        thread_alignments, thread_sam_lines = self.do_alignment(False)
+        process_alignments, process_sam_lines = self.do_alignment(True)
+        self.assertEqual(len(thread_alignments), 9)
+        self.assertTrue(all(len(x) == 1 for x in thread_alignments.values()))
+        self.assertEqual(thread_alignments, process_alignments)
+        self.assertEqual(thread_sam_lines, process_sam_lines)
+
+
 class TestContainedReadAlignments(unittest.TestCase):
     """
     These test cases use real reads/contigs and cover cases where the read aligns to the middle of
@@ -662,3 +705,62 @@ class TestToughAlignments(unittest.TestCase):
         _, read_end = alignment_2.read_start_end_positive_strand()
         self.assertEqual(read_start, 0)    # start of read
         self.assertEqual(read_end, 4144)  # end of read
+
+
+class TestTallyUpScoreAndErrors(unittest.TestCase):
+    """
+    These tests check the alignment tallies against a simple base-by-base count.
+    """
+    def make_alignment(self, length):
+        ref_seq = unicycler.misc.get_random_sequence(length)
+        read_parts, cigar_parts, ref_i = [], [], 0
+        while ref_i < length:
+            match_count = min(random.randint(1, 20), length - ref_i)
+            read_parts.append(''.join(x if random.random() < 0.97 else random.choice('ACGT')
+                                      for x in ref_seq[ref_i:ref_i + match_count]))
+            cigar_parts.append(str(match_count) + 'M')
+            ref_i += match_count
+            gap_length = random.randint(1, 3)
+            if ref_i + gap_length >= length:
+                continue
+            if random.random() < 0.5:
+                read_parts.append(unicycler.misc.get_random_sequence(gap_length))
+                cigar_parts.append(str(gap_length) + 'I')
+            else:
+                cigar_parts.append(str(gap_length) + 'D')
+                ref_i += gap_length
+        alignment = unicycler.alignment.Alignment.__new__(unicycler.alignment.Alignment)
+        alignment.read = unicycler.read_ref.Read('read', ''.join(read_parts), None)
+        alignment.ref = unicycler.read_ref.Reference('ref', ref_seq)
+        alignment.rev_comp = False
+        alignment.read_start_pos, alignment.ref_start_pos = 0, 0
+        alignment.cigar = unicycler.alignment.pack_cigar(''.join(cigar_parts))
+        return alignment
+
+    def test_same_as_base_by_base(self):
+        random.seed(0)
+        scoring_scheme = unicycler.alignment.AlignmentScoringScheme('3,-6,-5,-2')
+        for length in [1, 10, 100, 1000, 10000]:
+            alignment = self.make_alignment(length)
+            counts = {'=': 0, 'X': 0, 'I': 0, 'D': 0}
+            score, read_i, ref_i = 0, 0, 0
+            for cigar_part in alignment.cigar_parts:
+                cigar_count, cigar_type = int(cigar_part[:-1]), cigar_part[-1]
+                if cigar_type == 'M':
+                    for _ in range(cigar_count):
+                        match = alignment.read.sequence[read_i] == alignment.ref.sequence[ref_i]
+                        counts['=' if match else 'X'] += 1
+                        score += scoring_scheme.match if match else scoring_scheme.mismatch
+                        read_i, ref_i = read_i + 1, ref_i + 1
+                else:
+                    counts[cigar_type] += cigar_count
+                    score += scoring_scheme.gap_open + (cigar_count - 1) * scoring_scheme.gap_extend
+                    if cigar_type == 'I':
+                        read_i += cigar_count
+                    else:
+                        ref_i += cigar_count
+            alignment.tally_up_score_and_errors(scoring_scheme)
+            self.assertEqual((alignment.match_count, alignment.mismatch_count,
+                              alignment.insertion_count, alignment.deletion_count,
+                              alignment.raw_score),
+                             (counts['='], counts['X'], counts['I'], counts['D'], score))
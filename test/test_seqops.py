@@ -0,0 +1,104 @@
+"""
+Copyright 2017 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Unicycler
+
+This file is part of Unicycler. Unicycler is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Unicycler is distributed in
+the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Unicycler. If
+not, see <http://www.gnu.org/licenses/>.
+"""
+
+import random
+import unittest
+import unicycler.misc
+import unicycler.seqops
+
+
+def slow_reverse_complement(seq):
+    return ''.join([unicycler.misc.complement_base(x) for x in seq][::-1])
+
+
+class TestSeqOps(unittest.TestCase):
+
+    def test_reverse_complement_types(self):
+        self.assertEqual(unicycler.seqops.reverse_complement('ACCGT'), 'ACGGT')
+        self.assertEqual(unicycler.seqops.reverse_complement(b'ACCGT'), b'ACGGT')
+        self.assertEqual(unicycler.seqops.reverse_complement(bytearray(b'ACCGT')),
+                         bytearray(b'ACGGT'))
+        self.assertEqual(unicycler.seqops.reverse_complement(''), '')
+        self.assertEqual(unicycler.seqops.reverse_complement(b''), b'')
+
+    def test_reverse_complement_matches_dict(self):
+        self.assertEqual(unicycler.seqops.reverse_complement('CnGTKABCMSTDGTRTYTHWVGTca'),
+                         'tgACBWDARAYACHASKGVTMACnG')
+        random.seed(0)
+        for _ in range(100):
+            seq = unicycler.misc.get_random_sequence(100) + 'nX?.-acgtRYkmé中'
+            seq = ''.join(random.sample(seq, len(seq)))
+            self.assertEqual(unicycler.seqops.reverse_complement(seq),
+                             slow_reverse_complement(seq))
+
+    def test_complement(self):
+        self.assertEqual(unicycler.seqops.complement('ACGTNacgtnZ'), 'TGCANtgcanN')
+        self.assertEqual(unicycler.seqops.complement(b'ACGTN'), b'TGCAN')
+
+    def test_pack_two_bit(self):
+        self.assertEqual(unicycler.seqops.pack_two_bit(b''), b'')
+        self.assertEqual(unicycler.seqops.pack_two_bit(b'ACGT'), bytes([0b00011011]))
+        self.assertEqual(unicycler.seqops.pack_two_bit(b'TTTTG'), bytes([0b11111111, 0b10000000]))
+        self.assertEqual(unicycler.seqops.unpack_two_bit(bytes([0b00011011, 0b10000000])),
+                         bytearray(b'ACGTGAAA'))
+
+    def test_pack_two_bit_round_trip(self):
+        for length in [1, 3, 4, 5, 1000, 1001]:
+            seq = unicycler.misc.get_random_sequence(length).encode()
+            packed = unicycler.seqops.pack_two_bit(seq)
+            self.assertEqual(len(packed), (length + 3) // 4)
+            self.assertEqual(unicycler.seqops.unpack_two_bit(packed)[:length], seq)
+
+    def test_kmer_hashes(self):
+        hashes = list(unicycler.seqops.get_kmer_hashes('ACGTA', 3, canonical=False))
+        self.assertEqual(hashes, [(0, 0b000110), (1, 0b011011), (2, 0b101100)])
+
+    def test_kmer_hashes_skip_non_acgt(self):
+        hashes = list(unicycler.seqops.get_kmer_hashes('ACGNACGTA', 3, canonical=False))
+        self.assertEqual([x[0] for x in hashes], [0, 4, 5, 6])
+        self.assertEqual(hashes[0][1], hashes[1][1])
+        self.assertEqual(list(unicycler.seqops.get_kmer_hashes('ACNN', 3)), [])
+
+    def test_kmer_hashes_canonical(self):
+        seq = unicycler.misc.get_random_sequence(200)
+        rev_comp = unicycler.seqops.reverse_complement(seq)
+        forward_hashes = [x[1] for x in unicycler.seqops.get_kmer_hashes(seq, 15)]
+        reverse_hashes = [x[1] for x in unicycler.seqops.get_kmer_hashes(rev_comp, 15)]
+        self.assertEqual(forward_hashes, reverse_hashes[::-1])
+
+    def test_kmer_hashes_case(self):
+        self.assertEqual(list(unicycler.seqops.get_kmer_hashes('acgta', 3)),
+                         list(unicycler.seqops.get_kmer_hashes(b'ACGTA', 3)))
+
+    def test_gc(self):
+        self.assertEqual(unicycler.seqops.gc_count('ACGTgcN'), 4)
+        self.assertEqual(unicycler.seqops.gc_count(b'AATT'), 0)
+        self.assertEqual(unicycler.seqops.gc_fraction('ACGT'), 0.5)
+        self.assertEqual(unicycler.seqops.gc_fraction(''), 0.0)
+
+    def test_count_mismatches(self):
+        self.assertEqual(unicycler.seqops.count_mismatches('', ''), 0)
+        self.assertEqual(unicycler.seqops.count_mismatches('ACGT', 'ACGT'), 0)
+        self.assertEqual(unicycler.seqops.count_mismatches('ACGT', 'TCGA'), 2)
+        self.assertEqual(unicycler.seqops.count_mismatches(b'ACGTN', b'ACGTA'), 1)
+        self.assertEqual(unicycler.seqops.count_mismatches('acgt', 'ACGT'), 4)
+        with self.assertRaises(ValueError):
+            unicycler.seqops.count_mismatches('ACGT', 'ACG')
+
+    def test_count_mismatches_random(self):
+        random.seed(0)
+        for _ in range(100):
+            seq_1 = unicycler.misc.get_random_sequence(random.randint(1, 1000))
+            seq_2 = ''.join(x if random.random() < 0.8 else random.choice('ACGTN') for x in seq_1)
+            self.assertEqual(unicycler.seqops.count_mismatches(seq_1, seq_2),
+                             sum(1 for x, y in zip(seq_1, seq_2) if x != y))
@@ -0,0 +1,80 @@
+"""
+Copyright 2017 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Unicycler
+
+This file is part of Unicycler. Unicycler is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Unicycler is distributed in
+the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Unicycler. If
+not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import unicycler.spades_cache
+
+
+class TestSpadesCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, 'cache')
+        self.graph_file = os.path.join(os.path.dirname(__file__), 'test_assembly_graph.gfa')
+        self.graph_size = os.path.getsize(self.graph_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def get_cache(self, max_size=None, read_digests=('abc', 'def', None), spades_version='3.15.5',
+                  spades_options=None):
+        if max_size is None:
+            max_size = 100 * self.graph_size
+        return unicycler.spades_cache.SpadesCache(self.cache_dir, max_size, read_digests,
+                                                  spades_version, spades_options)
+
+    def test_miss(self):
+        self.assertIsNone(self.get_cache().load([21, 41]))
+
+    def test_store_and_load(self):
+        self.get_cache().store([21, 41], self.graph_file, 350.5, 20.0)
+        graph_file, insert_size_mean, insert_size_deviation = self.get_cache().load([21, 41])
+        with open(graph_file, 'rt') as cached, open(self.graph_file, 'rt') as original:
+            self.assertEqual(cached.read(), original.read())
+        self.assertEqual(insert_size_mean, 350.5)
+        self.assertEqual(insert_size_deviation, 20.0)
+
+    def test_none_insert_size(self):
+        self.get_cache().store([21], self.graph_file, None, None)
+        _, insert_size_mean, insert_size_deviation = self.get_cache().load([21])
+        self.assertIsNone(insert_size_mean)
+        self.assertIsNone(insert_size_deviation)
+
+    def test_key_parts(self):
+        self.get_cache().store([21, 41], self.graph_file, 350.5, 20.0)
+        self.assertIsNone(self.get_cache().load([21]))
+        self.assertIsNone(self.get_cache().load([31, 41]))
+        self.assertIsNone(self.get_cache(read_digests=('abc', 'xyz', None)).load([21, 41]))
+        self.assertIsNone(self.get_cache(spades_version='3.14.0').load([21, 41]))
+        self.assertIsNone(self.get_cache(spades_options='--careful').load([21, 41]))
+        self.assertIsNotNone(self.get_cache(spades_options='').load([21, 41]))
+
+    def test_lru_eviction(self):
+        cache = self.get_cache(max_size=int(2.5 * self.graph_size))
+        cache.store([21], self.graph_file, None, None)
+        cache.store([21, 41], self.graph_file, None, None)
+
+        # Make the first entry older, then use it, so the second entry is the least recently used.
+        for kmers, age in [([21], 200), ([21, 41], 100)]:
+            entry_dir = os.path.join(self.cache_dir, cache.get_key(kmers))
+            old_time = os.path.getmtime(entry_dir) - age
+            os.utime(entry_dir, (old_time, old_time))
+        self.assertIsNotNone(cache.load([21]))
+
+        cache.store([21, 41, 61], self.graph_file, None, None)
+        self.assertIsNotNone(cache.load([21]))
+        self.assertIsNone(cache.load([21, 41]))
+        self.assertIsNotNone(cache.load([21, 41, 61]))
@@ -12,8 +12,17 @@ not, see <http://www.gnu.org/licenses/>.
 """
 
 import unittest
+import gzip
+import json
 import os
+import shutil
+import signal
+import statistics
+import tempfile
 import unicycler.spades_func
+import unicycler.assembly_graph
+import unicycler.log
+import unicycler.misc
 
 
 class TestSPAdesFunc(unittest.TestCase):
@@ -46,6 +55,164 @@ class TestSPAdesFunc(unittest.TestCase):
         with self.assertRaises(unicycler.spades_func.BadFastq):
             unicycler.spades_func.get_read_count(test_fastq)
 
+    def test_scan_short_read_file(self):
+        test_fastq = os.path.join(os.path.dirname(__file__), 'test_semi_global_alignment.fastq')
+        stats = unicycler.spades_func.scan_short_read_file(test_fastq)
+        self.assertTrue(stats.valid)
+        self.assertEqual(stats.count, 9)
+        self.assertEqual(stats.length_histogram, {100: 1, 150: 1, 200: 1, 300: 6})
+        self.assertIsNone(stats.digest)
+
+    def test_short_read_digest(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            test_fastq = os.path.join(os.path.dirname(__file__), 'test_misc.fastq')
+            gzipped_fastq = os.path.join(temp_dir, 'reads.fastq.gz')
+            with open(test_fastq, 'rb') as f_in, gzip.open(gzipped_fastq, 'wb') as f_out:
+                f_out.write(f_in.read())
+            digest_1 = unicycler.spades_func.scan_short_read_file(test_fastq, True).digest
+            digest_2 = unicycler.spades_func.scan_short_read_file(gzipped_fastq, True).digest
+            other_fastq = os.path.join(os.path.dirname(__file__),
+                                       'test_semi_global_alignment.fastq')
+            digest_3 = unicycler.spades_func.scan_short_read_file(other_fastq, True).digest
+            self.assertIsNotNone(digest_1)
+            self.assertEqual(digest_1, digest_2)
+            self.assertNotEqual(digest_1, digest_3)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_scan_bad_short_read_file(self):
+        test_fastq = os.path.join(os.path.dirname(__file__), 'test_bad_reads_2.fastq')
+        self.assertFalse(unicycler.spades_func.scan_short_read_file(test_fastq).valid)
+
+    def test_short_read_stats_cache(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            test_fastq = os.path.join(temp_dir, 'reads.fastq')
+            shutil.copyfile(os.path.join(os.path.dirname(__file__), 'test_misc.fastq'), test_fastq)
+            stats = unicycler.spades_func.get_short_read_stats([test_fastq, None], temp_dir, 1)
+            self.assertEqual(list(stats), [test_fastq])
+            self.assertEqual(stats[test_fastq].count, 3)
+            cache_filename = os.path.join(temp_dir, 'short_read_stats.json')
+            self.assertTrue(os.path.isfile(cache_filename))
+
+            # A second call uses the cache rather than reading the file again.
+            with open(cache_filename, 'rt') as cache_file:
+                cache = json.load(cache_file)
+            cache[os.path.abspath(test_fastq)]['count'] = 99
+            with open(cache_filename, 'wt') as cache_file:
+                json.dump(cache, cache_file)
+            cached = unicycler.spades_func.get_short_read_stats([test_fastq], temp_dir, 1)
+            self.assertEqual(cached[test_fastq].count, 99)
+
+            # But if the file changes, the cached values are no longer used.
+            with open(test_fastq, 'at') as f:
+                f.write('@extra\nACGT\n+\nAAAA\n')
+            rescanned = unicycler.spades_func.get_short_read_stats([test_fastq], temp_dir, 1)
+            self.assertEqual(rescanned[test_fastq].count, 4)
+            self.assertEqual(rescanned[test_fastq].length_histogram, {4: 1, 125: 3})
+            self.assertIsNone(rescanned[test_fastq].digest)
+
+            # Cached stats without a digest are rescanned when a digest is needed.
+            with_digest = unicycler.spades_func.get_short_read_stats([test_fastq], temp_dir, 1,
+                                                                     compute_digests=True)
+            self.assertIsNotNone(with_digest[test_fastq].digest)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_histogram_median(self):
+        read_lengths = [100, 150, 200, 300, 300, 300, 300, 300, 300]
+        histogram = {100: 1, 150: 1, 200: 1, 300: 6}
+        index = len(read_lengths) // 2 - 1
+        self.assertEqual(unicycler.spades_func.get_histogram_value_at_index(histogram, index),
+                         read_lengths[index])
+        self.assertEqual(unicycler.spades_func.get_histogram_value_at_index({125: 1}, -1), 125)
+
+    def test_histogram_mean_and_stdev(self):
+        read_lengths = [100, 150, 200, 300, 300, 300, 300, 300, 300]
+        histogram = {100: 1, 150: 1, 200: 1, 300: 6}
+        mean, stdev = unicycler.spades_func.get_histogram_mean_and_stdev(histogram)
+        self.assertAlmostEqual(mean, statistics.mean(read_lengths))
+        self.assertAlmostEqual(stdev, statistics.stdev(read_lengths))
+
+    def test_score_spades_graph(self):
+        test_gfa = os.path.join(os.path.dirname(__file__), 'test_assembly_graph.gfa')
+        temp_dir = tempfile.mkdtemp()
+        try:
+            clean_gfa = os.path.join(temp_dir, 'k025_assembly_graph.gfa')
+            score, table_values, captured_log = \
+                unicycler.spades_func.score_spades_graph(test_gfa, 25, 0.25, False, 0,
+                                                         clean_gfa, 1)
+            self.assertTrue(os.path.isfile(clean_gfa))
+            self.assertIsNone(unicycler.log.logger.captured)
+            self.assertTrue(any('Saving' in x[0] for x in captured_log))
+
+            graph = unicycler.assembly_graph.AssemblyGraph(test_gfa, 25)
+            graph.clean(0.25, False)
+            segment_count = len(graph.segments)
+            dead_ends = graph.total_dead_end_count()
+            self.assertEqual(score, 1.0 / (segment_count * (dead_ends + 2)))
+            self.assertEqual(table_values, [unicycler.misc.int_to_str(segment_count),
+                                            unicycler.misc.int_to_str(dead_ends),
+                                            '{:.2e}'.format(score)])
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_score_spades_graph_time_budget(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            # This graph takes much longer to load than the tiny time budget.
+            big_gfa = os.path.join(temp_dir, 'big_graph.gfa')
+            with open(big_gfa, 'wt') as gfa:
+                for i in range(1, 50001):
+                    gfa.write('S\t' + str(i) + '\tACGTACGTAC\tDP:f:1.0\n')
+                for i in range(1, 50000):
+                    gfa.write('L\t' + str(i) + '\t+\t' + str(i + 1) + '\t+\t0M\n')
+            clean_gfa = os.path.join(temp_dir, 'k025_assembly_graph.gfa')
+            self.assertIsNone(unicycler.spades_func.score_spades_graph(big_gfa, 25, 0.25, False, 0,
+                                                                       clean_gfa, 1, 0.001))
+            self.assertIsNone(unicycler.log.logger.captured)
+
+            test_gfa = os.path.join(os.path.dirname(__file__), 'test_assembly_graph.gfa')
+            result = unicycler.spades_func.score_spades_graph(test_gfa, 25, 0.25, False, 0,
+                                                              clean_gfa, 1, 600)
+            self.assertIsNotNone(result)
+
+            # A timeout which arrives as the finished job disarms its timer mustn't escape.
+            setitimer = signal.setitimer
+
+            def late_timeout_setitimer(which, seconds):
+                setitimer(which, seconds)
+                if seconds == 0:
+                    unicycler.spades_func.raise_graph_scoring_timeout(signal.SIGPROF, None)
+            signal.setitimer = late_timeout_setitimer
+            try:
+                late_result = unicycler.spades_func.score_spades_graph(test_gfa, 25, 0.25, False,
+                                                                       0, clean_gfa, 1, 600)
+            finally:
+                signal.setitimer = setitimer
+            self.assertEqual(late_result[:2], result[:2])
+            self.assertIsNone(unicycler.log.logger.captured)
+            self.assertIs(signal.getsignal(signal.SIGPROF), signal.SIG_DFL)
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_scores_have_declined(self):
+        declined = unicycler.spades_func.scores_have_declined
+        self.assertFalse(declined([], 2))
+        self.assertFalse(declined([0.0, 0.0, 0.0], 2))
+        self.assertFalse(declined([1.0, 2.0, 3.0], 2))
+        self.assertFalse(declined([1.0, 3.0, 2.0], 2))
+        self.assertTrue(declined([1.0, 3.0, 2.0, 2.5], 2))
+        self.assertTrue(declined([1.0, 3.0, 2.0], 1))
+
+    def test_get_refinement_kmers(self):
+        refine = unicycler.spades_func.get_refinement_kmers
+        self.assertEqual(refine([21, 41, 61, 71], [1.0, 3.0, 2.0, 1.0]), [31, 51])
+        self.assertEqual(refine([21, 41, 61], [3.0, 2.0, 1.0]), [31])
+        self.assertEqual(refine([21, 23, 61], [1.0, 3.0, 2.0]), [41])
+        self.assertEqual(refine([21, 41], [0.0, 0.0]), [])
+
     def test_build_spades_command_1(self):
         command = unicycler.spades_func.build_spades_command('spades.py', 'out', 16, [21, 31, 41],
                                                              0, '1.fq.gz', '2.fq.gz', None, True,
@@ -89,3 +256,9 @@ class TestSPAdesFunc(unittest.TestCase):
                                    '--isolate', '-1', '1.fq.gz', '-2', '2.fq.gz', '--tmp-dir',
                                    'abc', '-m', '1024'])
 
+    def test_build_spades_command_fresh_start(self):
+        command = unicycler.spades_func.build_spades_command('spades.py', 'out', 16, [21, 31, 41],
+                                                             2, '1.fq.gz', '2.fq.gz', None, True,
+                                                             False, None, fresh_start=True)
+        self.assertEqual(command, ['spades.py', '-o', 'out', '-k', '21,31,41', '--threads', '16',
+                                   '--isolate', '-1', '1.fq.gz', '-2', '2.fq.gz', '-m', '1024'])
@@ -14,7 +14,9 @@ not, see <http://www.gnu.org/licenses/>.
 """
 
 import re
-from .misc import get_nice_header, reverse_complement, float_to_str
+from array import array
+from .misc import get_nice_header, float_to_str
+from .seqops import reverse_complement, count_mismatches
 
 
 class AlignmentScoringScheme(object):
@@ -42,20 +44,37 @@ class AlignmentScoringScheme(object):
                str(self.gap_extend)
 
 
+# CIGARs are held as arrays of packed parts, as in the BAM format: each part's length is shifted
+# left four bits and its operation's index in this string is in the lower four bits.
+CIGAR_OPS = 'MIDNSHP=X'
+CIGAR_OP_CODES = {op: i for i, op in enumerate(CIGAR_OPS)}
+CIGAR_MATCH, CIGAR_INSERTION, CIGAR_DELETION, CIGAR_SOFT_CLIP = 0, 1, 2, 4
+
+# Operations which move along the reference (M, D, N, = and X).
+CIGAR_REF_CONSUMING_OPS = {0, 2, 3, 7, 8}
+
+# The Alignment attributes in a compact record (see Alignment.get_record), along with the
+# reference's name.
+RECORD_ATTRIBUTES = ('read_start_pos', 'read_end_pos', 'read_end_gap', 'ref_start_pos',
+                     'ref_end_pos', 'rev_comp', 'cigar', 'match_count', 'mismatch_count',
+                     'insertion_count', 'deletion_count', 'alignment_length', 'edit_distance',
+                     'percent_identity', 'raw_score', 'scaled_score', 'milliseconds')
+
+
 class Alignment(object):
     """
     This class describes an alignment between a long read and a contig.
-    It can be constructed either from a SAM line or from the C++ Seqan output.
+    It can be constructed either from a SAM line or from the C++ Seqan results.
     """
 
     def __init__(self,
                  sam_line=None, read_dict=None,
-                 seqan_output=None, read=None,
+                 seqan_result=None, read=None,
                  reference_dict=None, scoring_scheme=None):
 
         # Make sure we have the appropriate inputs for one of the two ways to construct an
         # alignment.
-        assert (sam_line and read_dict) or (seqan_output and read)
+        assert (sam_line and read_dict) or (seqan_result and read)
 
         # Some inputs are required for both types of construction.
         assert scoring_scheme and reference_dict
@@ -73,7 +92,7 @@ class Alignment(object):
 
         # Alignment details
         self.rev_comp = None
-        self.cigar_parts = None
+        self.cigar = None
         self.match_count = None
         self.mismatch_count = None
         self.insertion_count = None
@@ -87,33 +106,30 @@ class Alignment(object):
 
         # How some of the values are gotten depends on whether this alignment came from SAM
         # or a Seqan alignment.
-        if seqan_output:
-            self.setup_using_seqan_output(seqan_output, read, reference_dict)
+        if seqan_result:
+            self.setup_using_seqan_result(seqan_result, read, reference_dict)
         elif sam_line:
             self.setup_using_sam(sam_line, read_dict, reference_dict)
 
         self.tally_up_score_and_errors(scoring_scheme)
 
-    def setup_using_seqan_output(self, seqan_output, read, reference_dict):
+    def setup_using_seqan_result(self, seqan_result, read, reference_dict):
         """
-        This function sets up the Alignment using the Seqan results. This kind of alignment has
-        complete details about the alignment.
+        This function sets up the Alignment using a Seqan result (a cpp_wrappers.AlignmentResult).
+        This kind of alignment has complete details about the alignment.
         """
-        seqan_parts = seqan_output.split(',', 9)
-        assert len(seqan_parts) >= 10
-
-        self.rev_comp = (seqan_parts[1] == '-')
-        self.cigar_parts = re.findall(r'\d+\w', seqan_parts[9])
-        self.milliseconds = int(seqan_parts[8])
+        self.rev_comp = seqan_result.rev_comp
+        self.cigar = seqan_result.cigar
+        self.milliseconds = seqan_result.milliseconds
 
         self.read = read
-        self.read_start_pos = int(seqan_parts[2])
-        self.read_end_pos = int(seqan_parts[3])
+        self.read_start_pos = seqan_result.read_start_pos
+        self.read_end_pos = seqan_result.read_end_pos
         self.read_end_gap = self.read.get_length() - self.read_end_pos
 
-        self.ref = reference_dict[get_nice_header(seqan_parts[0])]
-        self.ref_start_pos = int(seqan_parts[4])
-        self.ref_end_pos = int(seqan_parts[5])
+        self.ref = reference_dict[get_nice_header(seqan_result.ref_name)]
+        self.ref_start_pos = seqan_result.ref_start_pos
+        self.ref_end_pos = seqan_result.ref_end_pos
 
     def setup_using_sam(self, sam_line, read_dict, reference_dict):
         """
@@ -121,7 +137,7 @@ class Alignment(object):
         """
         sam_parts = sam_line.split('\t', 6)
         self.rev_comp = bool(int(sam_parts[1]) & 0x10)
-        self.cigar_parts = re.findall(r'\d+\w', sam_parts[5])
+        self.cigar = pack_cigar(sam_parts[5])
 
         self.read = read_dict[sam_parts[0]]
         self.read_start_pos = self.get_start_soft_clips()
@@ -131,8 +147,9 @@ class Alignment(object):
         self.ref = reference_dict[get_nice_header(sam_parts[2])]
         self.ref_start_pos = int(sam_parts[3]) - 1
         self.ref_end_pos = self.ref_start_pos
-        for cigar_part in self.cigar_parts:
-            self.ref_end_pos += get_ref_shift_from_cigar_part(cigar_part)
+        for cigar_part in self.cigar:
+            if cigar_part & 15 in CIGAR_REF_CONSUMING_OPS:
+                self.ref_end_pos += cigar_part >> 4
 
         # If all is good with the CIGAR, then we should never end up with a ref_end_pos out of the
         # reference range. But we check just to be safe.
@@ -152,13 +169,14 @@ class Alignment(object):
         self.percent_identity = 0.0
         self.raw_score = 0
 
-        # Remove the soft clipping parts of the CIGAR string for tallying.
-        cigar_parts = self.cigar_parts[:]
-        if cigar_parts[0][-1] == 'S':
-            cigar_parts.pop(0)
-        if cigar_parts and cigar_parts[-1][-1] == 'S':
-            cigar_parts.pop()
-        if not cigar_parts:
+        # Remove the soft clipping parts of the CIGAR for tallying.
+        cigar = self.cigar
+        start, end = 0, len(cigar)
+        if end and cigar[0] & 15 == CIGAR_SOFT_CLIP:
+            start += 1
+        if end > start and cigar[end - 1] & 15 == CIGAR_SOFT_CLIP:
+            end -= 1
+        if start == end:
             return
 
         read_len = self.read.get_length()
@@ -173,41 +191,39 @@ class Alignment(object):
         ref_i = self.ref_start_pos
         align_i = 0
 
-        for cigar_part in cigar_parts:
-            cigar_count = int(cigar_part[:-1])
-            cigar_type = cigar_part[-1]
+        # The aligned parts of the read and reference are gathered up and compared all at once,
+        # instead of base by base.
+        read_aligned_parts, ref_aligned_parts = [], []
+        for i in range(start, end):
+            cigar_count = cigar[i] >> 4
+            cigar_type = cigar[i] & 15
             ins_del_cigar_score = scoring_scheme.gap_open + \
                 ((cigar_count - 1) * scoring_scheme.gap_extend)
-            if cigar_type == 'I':
-                cigar_score = ins_del_cigar_score
+            if cigar_type == CIGAR_INSERTION:
+                self.raw_score += ins_del_cigar_score
                 self.insertion_count += cigar_count
                 read_i += cigar_count
-            elif cigar_type == 'D':
-                cigar_score = ins_del_cigar_score
+            elif cigar_type == CIGAR_DELETION:
+                self.raw_score += ins_del_cigar_score
                 self.deletion_count += cigar_count
                 ref_i += cigar_count
             else:  # match/mismatch
-                cigar_score = 0
-                for _ in range(cigar_count):
-                    # If all is good with the CIGAR, then we should never end up with a sequence
-                    # index out of the sequence range. But a CIGAR error can cause this, so check
-                    # here.
-                    if read_i >= read_len or ref_i >= ref_len:
-                        break
-                    read_base = read_seq[read_i]
-                    ref_base = ref_seq[ref_i]
-                    if read_base == ref_base:
-                        self.match_count += 1
-                        cigar_score += scoring_scheme.match
-                    else:
-                        self.mismatch_count += 1
-                        cigar_score += scoring_scheme.mismatch
-                    read_i += 1
-                    ref_i += 1
-
-            self.raw_score += cigar_score
+                # If all is good with the CIGAR, then we should never end up with a sequence
+                # index out of the sequence range. But a CIGAR error can cause this, so only the
+                # part within both sequences is used.
+                aligned_count = max(0, min(cigar_count, read_len - read_i, ref_len - ref_i))
+                read_aligned_parts.append(read_seq[read_i:read_i + aligned_count])
+                ref_aligned_parts.append(ref_seq[ref_i:ref_i + aligned_count])
+                read_i += aligned_count
+                ref_i += aligned_count
             align_i += cigar_count
 
+        read_aligned = ''.join(read_aligned_parts)
+        self.mismatch_count = count_mismatches(read_aligned, ''.join(ref_aligned_parts))
+        self.match_count = len(read_aligned) - self.mismatch_count
+        self.raw_score += self.match_count * scoring_scheme.match + \
+            self.mismatch_count * scoring_scheme.mismatch
+
         self.percent_identity = 100.0 * self.match_count / align_i
         self.edit_distance = self.mismatch_count + self.insertion_count + self.deletion_count
         self.alignment_length = align_i
@@ -215,6 +231,33 @@ class Alignment(object):
         worst_score = scoring_scheme.mismatch * self.alignment_length
         self.scaled_score = 100.0 * (self.raw_score - worst_score) / (perfect_score - worst_score)
 
+    def get_record(self):
+        """
+        Returns the alignment as a compact tuple without the read and reference objects, e.g. to
+        send it from a worker process. The alignment's score and errors are included, so
+        from_record doesn't need to tally them again.
+        """
+        return (self.ref.name,) + tuple(getattr(self, x) for x in RECORD_ATTRIBUTES)
+
+    @classmethod
+    def from_record(cls, record, read, reference_dict):
+        """
+        Makes an Alignment from a record made by get_record.
+        """
+        alignment = cls.__new__(cls)
+        alignment.read = read
+        alignment.ref = reference_dict[record[0]]
+        for name, value in zip(RECORD_ATTRIBUTES, record[1:]):
+            setattr(alignment, name, value)
+        return alignment
+
+    @property
+    def cigar_parts(self):
+        """
+        The CIGAR as a list of strings, e.g. ['5S', '100M', '2I', '50M'].
+        """
+        return unpack_cigar(self.cigar)
+
     def __repr__(self):
         read_start, read_end = self.read_start_end_positive_strand()
         return_str = self.read.name + ' (' + str(read_start) + '-' + str(read_end) + ', '
@@ -287,8 +330,8 @@ class Alignment(object):
         """
         Returns the number of soft-clipped bases at the start of the alignment.
         """
-        if self.cigar_parts[0][-1] == 'S':
-            return int(self.cigar_parts[0][:-1])
+        if self.cigar and self.cigar[0] & 15 == CIGAR_SOFT_CLIP:
+            return self.cigar[0] >> 4
         else:
             return 0
 
@@ -296,8 +339,8 @@ class Alignment(object):
         """
         Returns the number of soft-clipped bases at the start of the alignment.
         """
-        if self.cigar_parts[-1][-1] == 'S':
-            return int(self.cigar_parts[-1][:-1])
+        if self.cigar and self.cigar[-1] & 15 == CIGAR_SOFT_CLIP:
+            return self.cigar[-1] >> 4
         else:
             return 0
 
@@ -368,20 +411,20 @@ class Alignment(object):
             return self.ref.number
 
 
-def get_ref_shift_from_cigar_part(cigar_part):
+def pack_cigar(cigar_string):
+    """
+    This function packs a CIGAR string into an array of parts (see CIGAR_OPS).
+    Example:
+      * '5S100M2I' returns array('I', [84, 1600, 33])
+    """
+    return array('I', (int(count) << 4 | CIGAR_OP_CODES[op]
+                       for count, op in re.findall(r'(\d+)(\D)', cigar_string)))
+
+
+def unpack_cigar(cigar):
     """
-    This function returns how much a given cigar moves on a reference.
-    Examples:
-      * '5M' returns 5
-      * '5S' returns 0
-      * '5D' returns 5
-      * '5I' returns 0
+    This function turns a packed CIGAR back into a list of CIGAR part strings.
+    Example:
+      * array('I', [84, 1600, 33]) returns ['5S', '100M', '2I']
     """
-    if cigar_part[-1] == 'M':
-        return int(cigar_part[:-1])
-    if cigar_part[-1] == 'I':
-        return 0
-    if cigar_part[-1] == 'D':
-        return int(cigar_part[:-1])
-    if cigar_part[-1] == 'S':
-        return 0
+    return [str(cigar_part >> 4) + CIGAR_OPS[cigar_part & 15] for cigar_part in cigar]
@@ -14,14 +14,17 @@ not, see <http://www.gnu.org/licenses/>.
 """
 
 import math
-import copy
 import os
 import itertools
 from collections import deque, defaultdict
 from .assembly_graph_segment import Segment
+from .component_tracker import ComponentTracker
+from .graph_paths import GraphPaths
+from .graph_snapshot import GraphSnapshot
+from .graph_checkpoint import save_graph_checkpoint, load_graph_checkpoint
 from .misc import int_to_str, float_to_str, weighted_average_list, score_function, \
     add_line_breaks_to_sequence, print_table, get_dim_timestamp, get_right_arrow, \
-    remove_dupes_preserve_order
+    remove_dupes_preserve_order, get_open_function
 from .bridge_long_read import LongReadBridge
 from .bridge_miniasm import MiniasmBridge
 from . import settings
@@ -52,38 +55,72 @@ class AssemblyGraph(object):
         self.reverse_links = {}  # Dict of signed segment number <- list of signed segment numbers
         self.copy_depths = {}  # Dict of unsigned segment number -> list of copy depths
         self.manual_multiplicity = {}  # Dict of unsigned segment number -> multiplicity
-        self.paths = {}  # Dict of path name -> list of signed segment numbers
+        self.paths = {}  # GraphPaths: path name -> list of signed segment numbers
         self.overlap = overlap
         self.insert_size_mean = insert_size_mean
         self.insert_size_deviation = insert_size_deviation
-
-        self.load_from_gfa(filename)
-        if not overlap:
-            self.overlap = get_overlap_from_gfa_link(filename)
+        self.component_tracker = None  # ComponentTracker, built when components are first needed
+        self.snapshots = []  # GraphSnapshots which need to be told about link changes
+        self.simplifier = None  # GraphSimplifier which needs to be told about link changes
+
+        # A graph can be made without a file, to be filled in by load_checkpoint.
+        if filename is not None:
+            gfa_overlap = self.load_from_gfa(filename)
+            if not overlap:
+                self.overlap = gfa_overlap
+
+    @property
+    def paths(self):
+        return self._paths
+
+    @paths.setter
+    def paths(self, paths):
+        # The paths are always held in a GraphPaths, which indexes them by segment.
+        if not isinstance(paths, GraphPaths):
+            paths = GraphPaths(paths)
+        self._paths = paths
 
     def load_from_gfa(self, filename):
         """
-        Loads a Graph from a GFA file. It does not load any GFA file, but makes some restrictions:
+        Loads a Graph from a GFA file (which may be gzipped) in a single pass, dispatching on each
+        line's record type. It does not load any GFA file, but makes some restrictions:
         1) The segment names must be integers.
         2) The depths should be stored in a dp tag.
         3) All link overlaps are the same (equal to the graph overlap value).
+        Returns the overlap of the first link (or 0 if there are no links with an overlap).
         """
-        # Load in the segments.
-        with open(filename, 'rt') as gfa_file:
+        gfa_overlap = None
+        forward_links = {}
+        with get_open_function(filename)(filename, 'rt') as gfa_file:
             for line in gfa_file:
-                if line.startswith('S'):
+                record_type = line[:1]
+                if record_type == 'S':
                     line_parts = line.strip().split('\t')
                     num = int(line_parts[1])
                     depth = 1.0
-                    for part in line_parts:
-                        if part.lower().startswith('dp:'):
-                            depth = float(part[5:])
-                        if part.lower().startswith('ml:'):
-                            self.manual_multiplicity[num] = int(part[5:])
-                    sequence = line_parts[2]
-                    self.segments[num] = Segment(num, depth, sequence, True)
-                    self.segments[num].build_other_sequence_if_necessary()
-                if line.startswith('i'):
+                    for tag in line_parts[3:]:
+                        tag_name = tag[:3].lower()
+                        if tag_name == 'dp:':
+                            depth = float(tag[5:])
+                        elif tag_name == 'ml:':
+                            self.manual_multiplicity[num] = int(tag[5:])
+                    self.segments[num] = Segment(num, depth, line_parts[2], True)
+                elif record_type == 'L':
+                    line_parts = line.strip().split('\t')
+                    start = signed_string_to_int(line_parts[1] + line_parts[2])
+                    end = signed_string_to_int(line_parts[3] + line_parts[4])
+                    if start not in forward_links:
+                        forward_links[start] = [end]
+                    else:
+                        forward_links[start].append(end)
+                    if gfa_overlap is None and len(line_parts) > 5:
+                        gfa_overlap = int(line_parts[5][:-1])
+                elif record_type == 'P':
+                    line_parts = line.strip().split('\t')
+                    segments = [signed_string_to_int(x) for x in line_parts[2].split(',')]
+                    if len(segments) > 1:
+                        self.paths[line_parts[1]] = segments
+                elif record_type == 'i':
                     line_parts = line.strip().split('\t')
                     try:
                         self.insert_size_mean = float(line_parts[1])
@@ -91,30 +128,10 @@ class AssemblyGraph(object):
                     except ValueError:
                         pass
 
-        # Load in the links.
-        with open(filename, 'rt') as gfa_file:
-            for line in gfa_file:
-                if line.startswith('L'):
-                    line_parts = line.strip().split('\t')
-                    start = signed_string_to_int(line_parts[1] + line_parts[2])
-                    end = signed_string_to_int(line_parts[3] + line_parts[4])
-                    if start not in self.forward_links:
-                        self.forward_links[start] = [end]
-                    else:
-                        self.forward_links[start].append(end)
-            self.forward_links = build_rc_links_if_necessary(self.forward_links)
-            self.reverse_links = build_reverse_links(self.forward_links)
+        self.forward_links = build_rc_links_if_necessary(forward_links)
+        self.reverse_links = build_reverse_links(self.forward_links)
         self.sort_link_order()
-
-        # Load in the paths.
-        with open(filename, 'rt') as gfa_file:
-            for line in gfa_file:
-                if line.startswith('P'):
-                    line_parts = line.strip().split('\t')
-                    path_name = line_parts[1]
-                    segments = [signed_string_to_int(x) for x in line_parts[2].split(',')]
-                    if len(segments) > 1:
-                        self.paths[path_name] = segments
+        return gfa_overlap if gfa_overlap is not None else 0
 
     def get_median_read_depth(self, segment_list=None):
         """
@@ -302,6 +319,24 @@ class AssemblyGraph(object):
                 gfa.write(str(self.insert_size_deviation))
                 gfa.write('\n')
 
+    def save_checkpoint(self, filename, metadata=None, verbosity=1, newline=False):
+        """
+        Saves the whole graph state (including copy depths and bridges, which GFA files don't
+        hold) to a binary checkpoint file. The metadata (a JSON-compatible dict) is saved with it.
+        """
+        log.log(('\n' if newline else '') + 'Saving ' + filename, verbosity)
+        save_graph_checkpoint(self, filename, metadata)
+
+    @classmethod
+    def load_checkpoint(cls, filename):
+        """
+        Returns a graph loaded from a checkpoint file made by save_checkpoint. Raises BadCheckpoint
+        if the file can't be used (e.g. it was made by a different checkpoint format version).
+        """
+        graph = cls(None, 0)
+        load_graph_checkpoint(graph, filename)
+        return graph
+
     def get_all_gfa_link_lines(self):
         """
         Returns a string of the link component of the GFA file for this graph.
@@ -333,11 +368,14 @@ class AssemblyGraph(object):
         for component in connected_components:
             component_segs = [self.segments[x] for x in component]
             component_cutoff = self.get_median_read_depth(component_segs) * relative_depth_cutoff
+            all_below_whole_graph_cutoff = None  # only checked (once) if needed
             for seg_num in component:
                 segment = self.segments[seg_num]
                 if segment.depth < whole_graph_cutoff or segment.depth < component_cutoff:
-                    if self.dead_end_count(seg_num) > 0 or \
-                            self.all_segments_below_depth(component, whole_graph_cutoff) or \
+                    if all_below_whole_graph_cutoff is None:
+                        all_below_whole_graph_cutoff = \
+                            self.all_segments_below_depth(component, whole_graph_cutoff)
+                    if self.dead_end_count(seg_num) > 0 or all_below_whole_graph_cutoff or \
                             self.dead_end_change_if_deleted(seg_num) <= 0:
                         segment_nums_to_remove.append(seg_num)
                         total_length_removed += segment.get_length()
@@ -403,6 +441,8 @@ class AssemblyGraph(object):
                                 self.copy_depths[num].append(copy_depth)
                 # Now actually delete the segment.
                 del self.segments[num_to_remove]
+                if self.component_tracker is not None:
+                    self.component_tracker.segment_removed(num_to_remove)
 
         # Delete the copy depths for deleted segments.
         for num in nums_to_remove:
@@ -424,14 +464,21 @@ class AssemblyGraph(object):
     def remove_segments_from_paths(self, seg_nums):
         """
         Deletes the given segment numbers (regardless of sign) from the paths. If this results in
-        an invalid path, then the whole path is deleted.
-        """
-        fixed_paths = {}
-        for path_name, path in self.paths.items():
-            fixed_path = [x for x in path if x not in seg_nums and -x not in seg_nums]
+        an invalid path, then the whole path is deleted. This also deletes any other paths which
+        are no longer valid, but only paths which contain the segments or which might have become
+        invalid (see GraphPaths) need to be checked.
+        """
+        seg_nums = set(abs(x) for x in seg_nums)
+        names_to_check = self.paths.get_path_names(seg_nums) | self.paths.unchecked
+        for path_name in names_to_check:
+            path = self.paths[path_name]
+            fixed_path = [x for x in path if abs(x) not in seg_nums]
             if len(fixed_path) > 1 and self.is_path_valid(fixed_path):
-                fixed_paths[path_name] = fixed_path
-        self.paths = fixed_paths
+                if len(fixed_path) < len(path):
+                    self.paths[path_name] = fixed_path
+            else:
+                del self.paths[path_name]
+        self.paths.unchecked.clear()
 
     def is_path_valid(self, path):
         """
@@ -488,28 +535,52 @@ class AssemblyGraph(object):
     def merge_all_possible(self, anchor_segments, bridging_mode):
         """
         This function merges segments which are in a simple, unbranching path.
+
+        The segments are visited once in numerical order (with merged segments added to the end
+        as they are made, since they get the next available numbers). Merging a path never makes
+        an already-visited segment mergeable, so this gives the same result as starting over
+        after each merge. The graph's paths are set aside while merging and then rewritten once.
         """
         if anchor_segments is not None:
             anchor_seg_nums = set(x.number for x in anchor_segments)
         else:
             anchor_seg_nums = None
-        while True:
-            # Sort the segment numbers first so we apply the merging in a consistent order.
-            seg_nums = sorted(list(self.segments.keys()))
-            for num in seg_nums:
-                path = self.get_simple_path(num, anchor_seg_nums, bridging_mode)
-                assert len(path) > 0
-                if len(path) > 1:
-                    self.merge_simple_path(path)
-                    break
-            else:
-                break
+        paths = self.paths
+        self.paths = {}
+        merges = []
+        seg_nums = deque(sorted(self.segments))
+
+        # Each merged segment gets the next available number, so they can just be counted up.
+        next_seg_num = seg_nums[-1] + 1 if seg_nums else 1
+        while seg_nums:
+            num = seg_nums.popleft()
+            if num not in self.segments:  # already merged
+                continue
+            path = self.get_simple_path(num, anchor_seg_nums, bridging_mode)
+            assert len(path) > 0
+            if len(path) > 1:
+                new_seg_num = self.merge_simple_path_segments(path, next_seg_num)
+                merges.append((path, new_seg_num))
+                seg_nums.append(new_seg_num)
+                next_seg_num += 1
+        self.paths = merge_segments_in_paths(paths, merges)
         self.renumber_segments()
 
     def merge_simple_path(self, merge_path):
         """
         Merges the path into a single segment and adjusts any graph paths as necessary.
         """
+        paths = self.paths
+        new_seg_num = self.merge_simple_path_segments(merge_path)
+        self.paths = merge_segments_in_paths(paths, [(merge_path, new_seg_num)])
+        return new_seg_num
+
+    def merge_simple_path_segments(self, merge_path, new_seg_num=None):
+        """
+        Merges the path into a single segment, but doesn't fix up the graph paths (the caller must
+        do that with merge_segments_in_paths). The new segment gets the next available number,
+        unless the caller already knows it.
+        """
         start = merge_path[0]
         end = merge_path[-1]
         mean_depth, original_depth = self.get_mean_path_depth(merge_path)
@@ -521,14 +592,13 @@ class AssemblyGraph(object):
             if [s_2] != self.forward_links[s_1]:
                 raise BadPath(str(merge_path) + ' is not a simple path')
 
-        new_seg_num = self.get_next_available_seg_number()
-        merged_forward_seq = self.get_path_sequence(merge_path)
+        if new_seg_num is None:
+            new_seg_num = self.get_next_available_seg_number()
+        merged_forward_seq = self.get_path_bytes(merge_path)
         new_seg = Segment(new_seg_num, mean_depth, merged_forward_seq, True,
                           original_depth=original_depth)
-        new_seg.build_other_sequence_if_necessary()
 
         # Save some info that we'll need, and then delete the old segments.
-        paths_copy = self.paths.copy()
         outgoing_links = []
         if end in self.forward_links:
             outgoing_links = list(self.forward_links[end])
@@ -549,26 +619,6 @@ class AssemblyGraph(object):
         for link in incoming_links:
             self.add_link(link, new_seg_num)
 
-        # Merge the segments in any paths.
-        flipped_merge_path = [-x for x in reversed(merge_path)]
-        for path_name in paths_copy:
-            paths_copy[path_name] = find_replace_in_list(paths_copy[path_name], merge_path,
-                                                         [new_seg_num])
-            paths_copy[path_name] = find_replace_in_list(paths_copy[path_name], flipped_merge_path,
-                                                         [-new_seg_num])
-
-        # If any paths still contain the original segments, then split those paths into pieces,
-        # removing the original segments.
-        new_paths = {}
-        for path_name, path_segments in paths_copy.items():
-            split_paths = split_path_multiple(path_segments, merge_path + flipped_merge_path)
-            if len(split_paths) == 1:
-                new_paths[path_name] = split_paths[0]
-            elif len(split_paths) > 1:
-                for i, path in enumerate(split_paths):
-                    new_paths[path_name + '_' + str(i + 1)] = path
-        self.paths = new_paths
-
         return new_seg_num
 
     def get_mean_path_depth(self, path):
@@ -604,6 +654,8 @@ class AssemblyGraph(object):
         Adds a link to the graph in all necessary ways: forward and reverse, and for reverse
         complements too.
         """
+        for snapshot in self.snapshots:
+            snapshot.save_links(start, end)
         if start not in self.forward_links:
             self.forward_links[start] = []
         if end not in self.forward_links[start]:
@@ -624,11 +676,18 @@ class AssemblyGraph(object):
         if -start not in self.forward_links[-end]:
             self.forward_links[-end].append(-start)
 
+        if self.component_tracker is not None:
+            self.component_tracker.link_added(start, end)
+        if self.simplifier is not None:
+            self.simplifier.link_changed(start, end)
+
     def remove_link(self, start, end):
         """
         Removes a link from the graph in all necessary ways: forward and reverse, and for reverse
         complements too.
         """
+        for snapshot in self.snapshots:
+            snapshot.save_links(start, end)
         if start in self.forward_links:
             try:
                 self.forward_links[start].remove(end)
@@ -658,15 +717,45 @@ class AssemblyGraph(object):
             if len(self.reverse_links[-start]) == 0:
                 del self.reverse_links[-start]
 
+        self.paths.link_removed(start)
+        if self.component_tracker is not None:
+            self.component_tracker.link_removed(start, end)
+        if self.simplifier is not None:
+            self.simplifier.link_changed(start, end)
+
     def seq_from_signed_seg_num(self, signed_num):
         """
         Returns the forwards or reverse sequence of a segment, if the number is next_positive or
         negative, respectively. Assumes the segment number is in the graph.
         """
+        return self.bytes_from_signed_seg_num(signed_num).decode()
+
+    def bytes_from_signed_seg_num(self, signed_num):
+        """
+        Same as seq_from_signed_seg_num, but returns bytes, which is cheaper as the segments store
+        their sequences as bytes.
+        """
         if signed_num > 0:
-            return self.segments[signed_num].forward_sequence
+            return self.segments[signed_num].forward_bytes
         else:
-            return self.segments[-signed_num].reverse_sequence
+            return self.segments[-signed_num].get_reverse_bytes()
+
+    def take_snapshot(self):
+        """
+        Returns a read-only GraphSnapshot of the graph as it is now. This is much cheaper than a
+        deep copy: sequences are shared and links are only copied when they change. Call the
+        snapshot's release method when it's no longer needed.
+        """
+        snapshot = GraphSnapshot(self)
+        self.snapshots.append(snapshot)
+        return snapshot
+
+    def detach_snapshots(self):
+        """
+        Makes any snapshots take a full copy of the links, for when all links are about to change.
+        """
+        for snapshot in list(self.snapshots):
+            snapshot.save_all_links()
 
     def get_connected_components(self):
         """
@@ -674,6 +763,30 @@ class AssemblyGraph(object):
         component of the graph.
         E.g. [[1, 2], [3, 4, 5]] would mean that segments 1 and 2 are in a connected component
         and segments 3, 4 and 5 are in another connected component.
+
+        The components are found once and then kept up to date by a ComponentTracker, so after
+        the graph changes only the components which might have split need to be searched again.
+        """
+        return self.get_component_tracker().get_components()
+
+    def get_component(self, seg_num):
+        """
+        Returns the set of unsigned segment numbers in the connected component which contains the
+        given segment. The set belongs to the component tracker, so don't modify it.
+        """
+        return self.get_component_tracker().get_component(seg_num)
+
+    def get_component_tracker(self):
+        if self.component_tracker is None:
+            self.component_tracker = ComponentTracker(self.find_connected_components())
+        else:
+            self.component_tracker.sync_segments(self.segments)
+            self.component_tracker.split_dirty_components(self.get_connected_segments)
+        return self.component_tracker
+
+    def find_connected_components(self):
+        """
+        Finds the connected components from scratch (see get_connected_components).
         """
         visited = set()
         components = []
@@ -897,112 +1010,139 @@ class AssemblyGraph(object):
         """
         seg_nums = list(self.segments) + [-x for x in self.segments]
         already_examined = set()
+        next_seg_num = None
         for seg_num in seg_nums:
             if seg_num in already_examined:
                 continue
+            upstream_segs, downstream_segs = self.get_junction_group(seg_num)
 
-            upstream_segs = {seg_num}
-            downstream_segs = set()
-
-            # Keep growing the upstream and downstream steps until they stop getting bigger.
-            while True:
-                upstream_size = len(upstream_segs)
-                downstream_size = len(downstream_segs)
-                for upstream_seg in upstream_segs:
-                    downstream_segs.update(self.get_downstream_seg_nums(upstream_seg))
-                for downstream_seg in downstream_segs:
-                    upstream_segs.update(self.get_upstream_seg_nums(downstream_seg))
-                if len(upstream_segs) == upstream_size and len(downstream_segs) == downstream_size:
-                    break
+            # Every segment in the group gives the same group (and no repair changes another
+            # group), so we can skip them in the future.
+            already_examined.update(upstream_segs)
+            already_examined.update([-s for s in downstream_segs])
             if len(upstream_segs) < 2 or len(downstream_segs) < 2:
                 continue
+            if next_seg_num is None:
+                next_seg_num = self.get_next_available_seg_number()
+            next_seg_num += len(self.repair_junction_group(upstream_segs, next_seg_num))
+
+    def get_junction_group(self, seg_num):
+        """
+        Starting with the given segment, this function grows a set of upstream segments and a set
+        of downstream segments (the segments they lead to) until they stop getting bigger. Every
+        upstream segment in the group gives the same result.
+        """
+        upstream_segs = {seg_num}
+        downstream_segs = set()
+
+        # Keep growing the upstream and downstream sets (only following the segments which were
+        # just added) until they stop getting bigger.
+        new_upstream_segs = [seg_num]
+        while new_upstream_segs:
+            new_downstream_segs = []
+            for upstream_seg in new_upstream_segs:
+                for downstream_seg in self.get_downstream_seg_nums(upstream_seg):
+                    if downstream_seg not in downstream_segs:
+                        downstream_segs.add(downstream_seg)
+                        new_downstream_segs.append(downstream_seg)
+            new_upstream_segs = []
+            for downstream_seg in new_downstream_segs:
+                for upstream_seg in self.get_upstream_seg_nums(downstream_seg):
+                    if upstream_seg not in upstream_segs:
+                        upstream_segs.add(upstream_seg)
+                        new_upstream_segs.append(upstream_seg)
+        return upstream_segs, downstream_segs
+
+    def repair_junction_group(self, upstream_segs, next_seg_num):
+        """
+        Fixes any multi-way junctions in a group of upstream segments (from get_junction_group).
+        New segments are numbered from next_seg_num, which must be unused (along with any numbers
+        after it). Returns the numbers of the new segments.
+        """
+        # Skip groups that are too large (otherwise checking each subset will take way too long).
+        if len(upstream_segs) > 8:
+            return []
+        # Examine every subset in the upstream segments of size 2 or larger. This includes the
+        # full set.
+        starting_seg_groups = []
+        ending_seg_groups = []
+        used_upstream_subsets = []
+        for i in range(len(upstream_segs), 1, -1):
+            # The segments are sorted for consistency between runs.
+            upstream_subsets = itertools.combinations(sorted(upstream_segs), i)
+            for upstream_subset in upstream_subsets:
+
+                # No need to examine this subset if we've already made use of a larger subset
+                # which contains it.
+                if any(set(upstream_subset).issubset(x) for x in used_upstream_subsets):
+                    continue
 
-            # We're looking at this group now so we can skip them in the future.
-            already_examined.update(upstream_segs)
-            already_examined.update([-s for s in downstream_segs])
+                # Now that we have some upstream segments to look at, see if there are more
+                # than one downstream segments which lead back to all of them.
+                downstream_subset = set()
+                for upstream_seg in upstream_subset:
+                    downstream_subset.update(self.get_downstream_seg_nums(upstream_seg))
+                downstream_subset = [x for x in downstream_subset
+                                     if all(y in self.get_upstream_seg_nums(x)
+                                            for y in upstream_subset)]
+                if len(downstream_subset) < 2:
+                    continue
 
-            # Skip groups that are too large (otherwise checking each subset will take way too
-            # long).
-            if len(upstream_segs) > 8:
-                continue
+                # If we got here, then the combination of segments looks good!
+                used_upstream_subsets.append(set(upstream_subset))
+                starting_segs = sorted(list(upstream_subset))
+                ending_segs = sorted(list(downstream_subset))
 
-            # Examine every subset in the upstream segments of size 2 or larger. This includes the
-            # full set.
-            starting_seg_groups = []
-            ending_seg_groups = []
-            used_upstream_subsets = []
-            for i in range(len(upstream_segs), 1, -1):
-                upstream_subsets = set(itertools.combinations(upstream_segs, i))
-                for upstream_subset in upstream_subsets:
-
-                    # No need to examine this subset if we've already made use of a larger subset
-                    # which contains it.
-                    if any(set(upstream_subset).issubset(x) for x in used_upstream_subsets):
-                        continue
-
-                    # Now that we have some upstream segments to look at, see if there are more
-                    # than one downstream segments which lead back to all of them.
-                    downstream_subset = set()
-                    for upstream_seg in upstream_subset:
-                        downstream_subset.update(self.get_downstream_seg_nums(upstream_seg))
-                    downstream_subset = [x for x in downstream_subset
-                                         if all(y in self.get_upstream_seg_nums(x)
-                                                for y in upstream_subset)]
-                    if len(downstream_subset) < 2:
-                        continue
-
-                    # If we got here, then the combination of segments looks good!
-                    used_upstream_subsets.append(set(upstream_subset))
-                    starting_segs = sorted(list(upstream_subset))
-                    ending_segs = sorted(list(downstream_subset))
-
-                    # Sanity check: all upstream segments should lead to all downstream segments.
-                    for start_seg in starting_segs:
-                        for end_seg in ending_segs:
-                            assert end_seg in self.forward_links[start_seg]
-                            assert start_seg in self.reverse_links[end_seg]
-
-                    # We'll set it aside to make a small bridge segment to replace the links
-                    # between the start and end segments.
-                    starting_seg_groups.append(starting_segs)
-                    ending_seg_groups.append(ending_segs)
-
-            assert len(starting_seg_groups) == len(ending_seg_groups)
-            for starting_segs, ending_segs in zip(starting_seg_groups, ending_seg_groups):
-                log.log('Multi-way junction:', 3)
-                log.log('  start segs: ' + ', '.join([str(x) for x in starting_segs]), 3)
-                log.log('  end segs:   ' + ', '.join([str(x) for x in ending_segs]), 3)
-
-                # Create a new segment to bridge the starting and ending segments.
-                bridge_num = self.get_next_available_seg_number()
-                start_seg_depth_sum = sum(self.segments[abs(x)].depth for x in starting_segs)
-                end_seg_depth_sum = sum(self.segments[abs(x)].depth for x in ending_segs)
-                bridge_depth = (start_seg_depth_sum + end_seg_depth_sum) / 2.0
-                bridge_seq = self.seq_from_signed_seg_num(ending_segs[0])[:self.overlap]
-                bridge_seg = Segment(bridge_num, bridge_depth, bridge_seq, True)
-                bridge_seg.build_other_sequence_if_necessary()
-                self.segments[bridge_num] = bridge_seg
-                log.log('   new seg:   ' + str(bridge_num), 3)
-
-                # Now rebuild the links around the junction.
+                # Sanity check: all upstream segments should lead to all downstream segments.
                 for start_seg in starting_segs:
                     for end_seg in ending_segs:
-                        self.remove_link(start_seg, end_seg)
-                for start_seg in starting_segs:
-                    self.add_link(start_seg, bridge_num)
+                        assert end_seg in self.forward_links[start_seg]
+                        assert start_seg in self.reverse_links[end_seg]
+
+                # We'll set it aside to make a small bridge segment to replace the links
+                # between the start and end segments.
+                starting_seg_groups.append(starting_segs)
+                ending_seg_groups.append(ending_segs)
+
+        assert len(starting_seg_groups) == len(ending_seg_groups)
+        new_seg_nums = []
+        for starting_segs, ending_segs in zip(starting_seg_groups, ending_seg_groups):
+            log.log('Multi-way junction:', 3)
+            log.log('  start segs: ' + ', '.join([str(x) for x in starting_segs]), 3)
+            log.log('  end segs:   ' + ', '.join([str(x) for x in ending_segs]), 3)
+
+            # Create a new segment to bridge the starting and ending segments.
+            bridge_num = next_seg_num + len(new_seg_nums)
+            start_seg_depth_sum = sum(self.segments[abs(x)].depth for x in starting_segs)
+            end_seg_depth_sum = sum(self.segments[abs(x)].depth for x in ending_segs)
+            bridge_depth = (start_seg_depth_sum + end_seg_depth_sum) / 2.0
+            bridge_seq = self.bytes_from_signed_seg_num(ending_segs[0])[:self.overlap]
+            bridge_seg = Segment(bridge_num, bridge_depth, bridge_seq, True)
+            self.segments[bridge_num] = bridge_seg
+            new_seg_nums.append(bridge_num)
+            log.log('   new seg:   ' + str(bridge_num), 3)
+
+            # Now rebuild the links around the junction.
+            for start_seg in starting_segs:
                 for end_seg in ending_segs:
-                    self.add_link(bridge_num, end_seg)
-
-                # Finally, we need to check to see if there were any paths through the junction.
-                # If so, they need to be adjusted to contain the new segment.
-                for name in self.paths:
-                    for start_num in starting_segs:
-                        for end_num in ending_segs:
-                            self.paths[name] = insert_num_in_list(self.paths[name], start_num,
-                                                                  end_num, bridge_num)
-                            self.paths[name] = insert_num_in_list(self.paths[name], -end_num,
-                                                                  -start_num, -bridge_num)
-                log.log('', 3)
+                    self.remove_link(start_seg, end_seg)
+            for start_seg in starting_segs:
+                self.add_link(start_seg, bridge_num)
+            for end_seg in ending_segs:
+                self.add_link(bridge_num, end_seg)
+
+            # Finally, we need to check to see if there were any paths through the junction.
+            # If so, they need to be adjusted to contain the new segment.
+            for name in self.paths.get_path_names(starting_segs + ending_segs):
+                path = self.paths[name]
+                for start_num in starting_segs:
+                    for end_num in ending_segs:
+                        path = insert_num_in_list(path, start_num, end_num, bridge_num)
+                        path = insert_num_in_list(path, -end_num, -start_num, -bridge_num)
+                if path != self.paths[name]:
+                    self.paths[name] = path
+            log.log('', 3)
+        return new_seg_nums
 
     def remove_unnecessary_links(self):
         """
@@ -1012,16 +1152,22 @@ class AssemblyGraph(object):
         assert self.overlap == 0
         seg_nums = list(self.segments) + [-x for x in self.segments]
         for seg_num in seg_nums:
-            down_segs = self.get_downstream_seg_nums(seg_num)
-            zero_bp_segs = [x for x in down_segs if self.segments[abs(x)].get_length() == 0]
-            for zero_bp_seg in zero_bp_segs:
-                down_segs_2 = self.get_downstream_seg_nums(zero_bp_seg)
-                common_down_segs = set(down_segs) & set(down_segs_2)
-                for common_down_seg in common_down_segs:
-                    try:
-                        self.remove_link(seg_num, common_down_seg)
-                    except ValueError:
-                        pass
+            self.remove_unnecessary_links_from(seg_num)
+
+    def remove_unnecessary_links_from(self, seg_num):
+        """
+        Removes the given segment's (signed) direct links which are also made via a 0 bp segment.
+        """
+        down_segs = self.get_downstream_seg_nums(seg_num)
+        zero_bp_segs = [x for x in down_segs if self.segments[abs(x)].get_length() == 0]
+        for zero_bp_seg in zero_bp_segs:
+            down_segs_2 = self.get_downstream_seg_nums(zero_bp_seg)
+            common_down_segs = set(down_segs) & set(down_segs_2)
+            for common_down_seg in common_down_segs:
+                try:
+                    self.remove_link(seg_num, common_down_seg)
+                except ValueError:
+                    pass
 
     def get_next_available_seg_number(self):
         """
@@ -1090,27 +1236,37 @@ class AssemblyGraph(object):
         """
         Gets a linear (i.e. not circular) path sequence from the graph.
         """
-        path_sequence = ''
+        return self.get_path_bytes(path_segments).decode()
+
+    def get_path_bytes(self, path_segments):
+        """
+        Same as get_path_sequence, but returns bytes. The path is built from the segments' bytes
+        and only the finished sequence is decoded (by get_path_sequence).
+        """
+        sequence_parts = []
+        path_end = b''  # the last overlap-length bases of the path so far
         prev_segment_number = None
         for i, seg_num in enumerate(path_segments):
             segment = self.segments[abs(seg_num)]
             if seg_num > 0:
-                seg_sequence = segment.forward_sequence
+                seg_sequence = segment.forward_bytes
             else:
-                seg_sequence = segment.reverse_sequence
+                seg_sequence = segment.get_reverse_bytes()
             if i == 0:
-                path_sequence = seg_sequence
+                seg_part = seg_sequence
             else:
                 if seg_num not in self.forward_links[prev_segment_number]:
                     raise BadPath(str(path_segments) + ' is not a valid path')
-                if self.overlap > 0 and \
-                        path_sequence[-self.overlap:] != seg_sequence[:self.overlap]:
+                if self.overlap > 0 and path_end != seg_sequence[:self.overlap]:
                     raise BadOverlaps('overlaps do not match when merging ' +
                                       str(prev_segment_number) + ' and ' + str(seg_num) +
                                       ' in path ' + str(path_segments))
-                path_sequence += seg_sequence[self.overlap:]
+                seg_part = seg_sequence[self.overlap:]
+            sequence_parts.append(seg_part)
+            if self.overlap > 0:
+                path_end = (path_end + seg_part)[-self.overlap:]
             prev_segment_number = seg_num
-        return path_sequence
+        return b''.join(sequence_parts)
 
     def apply_bridges(self, bridges, verbosity, min_bridge_qual):
         """
@@ -1121,8 +1277,17 @@ class AssemblyGraph(object):
                             'This ensures that when multiple, contradictory bridges exist, the '
                             'most supported option is used.')
 
-        unbridged_graph = copy.deepcopy(self)
+        unbridged_graph = self.take_snapshot()
+        try:
+            return self.apply_bridges_to_graph(bridges, verbosity, min_bridge_qual, unbridged_graph)
+        finally:
+            unbridged_graph.release()
 
+    def apply_bridges_to_graph(self, bridges, verbosity, min_bridge_qual, unbridged_graph):
+        """
+        Does the work of apply_bridges. The unbridged graph is a snapshot of the graph from before
+        any bridges were applied.
+        """
         # Each segment can have only one bridge per side, so we will track which segments have had
         # a bridge applied off one side or the other.
         right_bridged = set()
@@ -1241,7 +1406,6 @@ class AssemblyGraph(object):
         new_seg_num = self.get_next_available_seg_number()
         new_seg = Segment(new_seg_num, bridge.depth, bridge.bridge_sequence, True, bridge,
                           bridge.graph_path)
-        new_seg.build_other_sequence_if_necessary()
         self.segments[new_seg_num] = new_seg
 
         # Link the bridge segment in to the start/end segments.
@@ -1647,6 +1811,7 @@ class AssemblyGraph(object):
         """
         This function gives the longest segment the number 1, the second-longest the number 2, etc.
         """
+        self.detach_snapshots()
         old_nums = [x.number for x in sorted(self.segments.values(), reverse=True,
                                              key=lambda x: x.get_length())]
         new_nums = list(range(1, len(old_nums) + 1))
@@ -1666,6 +1831,7 @@ class AssemblyGraph(object):
             if link_nums:
                 new_forward_links[changes[seg_num]] = [changes[x] for x in link_nums]
         self.forward_links = new_forward_links
+        self.component_tracker = None
 
         new_reverse_links = {}
         for seg_num, link_nums in self.reverse_links.items():
@@ -1675,9 +1841,10 @@ class AssemblyGraph(object):
 
         self.copy_depths = {changes[x]: y for x, y in self.copy_depths.items()}
 
-        new_paths = {}
+        new_paths = GraphPaths()
         for name, path_nums in self.paths.items():
             new_paths[name] = [changes[x] for x in path_nums]
+        new_paths.unchecked = self.paths.unchecked & set(new_paths)  # renumbering keeps validity
         self.paths = new_paths
 
     def print_component_table(self):
@@ -1810,51 +1977,55 @@ class AssemblyGraph(object):
         just return a list of the starting segment. At lower bridging modes, we only allow the
         merging of paths which are made up of single copy segments and bridges.
         """
-        simple_path = [starting_seg]
+        forward_path, backward_path = [starting_seg], []
+        path_seg_nums = {abs(starting_seg)}  # for quick checks of whether a segment is in the path
 
         # Expand forward as much as possible.
         while True:
-            if simple_path[-1] not in self.forward_links or \
-                            len(self.forward_links[simple_path[-1]]) != 1:
-                break
-            potential = self.forward_links[simple_path[-1]][0]
-            if potential in simple_path or -potential in simple_path:
+            if forward_path[-1] not in self.forward_links or \
+                            len(self.forward_links[forward_path[-1]]) != 1:
                 break
+            potential = self.forward_links[forward_path[-1]][0]
             abs_potential = abs(potential)
+            if abs_potential in path_seg_nums:
+                break
             if bridging_mode < 2 and not self.is_single_copy_or_bridge(abs_potential, bridging_mode,
                                                                        single_copy_seg_nums):
                 break
             if len(self.reverse_links[potential]) == 1 and \
-                    self.reverse_links[potential][0] == simple_path[-1]:
-                simple_path.append(potential)
+                    self.reverse_links[potential][0] == forward_path[-1]:
+                forward_path.append(potential)
+                path_seg_nums.add(abs_potential)
             else:
                 break
 
         # Expand backward as much as possible.
         while True:
-            if simple_path[0] not in self.reverse_links or \
-                            len(self.reverse_links[simple_path[0]]) != 1:
-                break
-            potential = self.reverse_links[simple_path[0]][0]
-            if potential in simple_path or -potential in simple_path:
+            path_start = backward_path[-1] if backward_path else starting_seg
+            if path_start not in self.reverse_links or len(self.reverse_links[path_start]) != 1:
                 break
+            potential = self.reverse_links[path_start][0]
             abs_potential = abs(potential)
+            if abs_potential in path_seg_nums:
+                break
             if bridging_mode < 2 and not self.is_single_copy_or_bridge(abs_potential, bridging_mode,
                                                                        single_copy_seg_nums):
                 break
             if len(self.forward_links[potential]) == 1 and \
-                    self.forward_links[potential][0] == simple_path[0]:
-                simple_path.insert(0, potential)
+                    self.forward_links[potential][0] == path_start:
+                backward_path.append(potential)
+                path_seg_nums.add(abs_potential)
             else:
                 break
 
-        return simple_path
+        return backward_path[::-1] + forward_path
 
     def sort_link_order(self):
         """
         This function sorts the lists in links so path finding can be consistent from one run to
         the next.
         """
+        self.detach_snapshots()
         for seg_num in self.forward_links:
             self.forward_links[seg_num].sort()
         for seg_num in self.reverse_links:
@@ -2143,38 +2314,49 @@ class AssemblyGraph(object):
         """
         segs_to_remove = []
         for seg_num in sorted(self.segments):  # sort for consistency between runs
-            seg = self.segments[seg_num]
-            if seg.get_length() != self.overlap:
-                continue
-            if seg_num in self.forward_links:
-                forward_connections = len(self.forward_links[seg_num])
-            else:
-                forward_connections = 0
-            if seg_num in self.reverse_links:
-                reverse_connections = len(self.reverse_links[seg_num])
-            else:
-                reverse_connections = 0
+            if self.bypass_zero_length_seg(seg_num):
+                segs_to_remove.append(seg_num)
+        self.finish_removing_zero_length_segs(segs_to_remove, suppress_log)
+        return len(segs_to_remove)
 
-            # Don't delete junction points.
-            if forward_connections > 1 and reverse_connections > 1:
-                continue
-            if forward_connections == 0 and reverse_connections > 1:
-                continue
-            if forward_connections > 1 and reverse_connections == 0:
-                continue
+    def bypass_zero_length_seg(self, seg_num):
+        """
+        If the segment is zero-length and can be removed, this function links its upstream
+        segments directly to its downstream segments and returns True (the segment itself is left
+        for finish_removing_zero_length_segs).
+        """
+        seg = self.segments[seg_num]
+        if seg.get_length() != self.overlap:
+            return False
+        if seg_num in self.forward_links:
+            forward_connections = len(self.forward_links[seg_num])
+        else:
+            forward_connections = 0
+        if seg_num in self.reverse_links:
+            reverse_connections = len(self.reverse_links[seg_num])
+        else:
+            reverse_connections = 0
 
-            segs_to_remove.append(seg_num)
+        # Don't delete junction points.
+        if forward_connections > 1 and reverse_connections > 1:
+            return False
+        if forward_connections == 0 and reverse_connections > 1:
+            return False
+        if forward_connections > 1 and reverse_connections == 0:
+            return False
 
-            if forward_connections == 1 and reverse_connections > 0:
-                downstream_seg = self.forward_links[seg_num][0]
-                for upstream_seg in self.reverse_links[seg_num]:
-                    self.add_link(upstream_seg, downstream_seg)
+        if forward_connections == 1 and reverse_connections > 0:
+            downstream_seg = self.forward_links[seg_num][0]
+            for upstream_seg in self.reverse_links[seg_num]:
+                self.add_link(upstream_seg, downstream_seg)
 
-            elif reverse_connections == 1 and forward_connections > 0:
-                upstream_seg = self.reverse_links[seg_num][0]
-                for downstream_seg in self.forward_links[seg_num]:
-                    self.add_link(upstream_seg, downstream_seg)
+        elif reverse_connections == 1 and forward_connections > 0:
+            upstream_seg = self.reverse_links[seg_num][0]
+            for downstream_seg in self.forward_links[seg_num]:
+                self.add_link(upstream_seg, downstream_seg)
+        return True
 
+    def finish_removing_zero_length_segs(self, segs_to_remove, suppress_log):
         if segs_to_remove:
             self.remove_segments(segs_to_remove)
         if not suppress_log and segs_to_remove:
@@ -2184,7 +2366,6 @@ class AssemblyGraph(object):
         if suppress_log and segs_to_remove:
             log.log('  Removed zero-length segments:', 2)
             log.log_number_list(segs_to_remove, 2)
-        return len(segs_to_remove)
 
     def merge_small_segments(self, max_merge_size):
         """
@@ -2195,91 +2376,111 @@ class AssemblyGraph(object):
         merged_seg_nums = []
         while True:
             for seg_num in sorted(self.segments):  # sort for consistency between runs
-                segment = self.segments[seg_num]
-                if segment.get_length() > max_merge_size or segment.get_length() == 0:
-                    continue
-                downstream_segs = self.get_downstream_seg_nums(seg_num)
-                upstream_segs = self.get_upstream_seg_nums(seg_num)
-
-                # If the segment has one downstream segment and multiple upstream segments,
-                # then we can merge it into the upstream segments.
-                if len(downstream_segs) == 1 and len(upstream_segs) > 1 and \
-                        all(self.lead_exclusively_to(x, seg_num) for x in upstream_segs):
-                    for upstream_seg_num in upstream_segs:
-                        upstream_seg = self.segments[abs(upstream_seg_num)]
-                        if upstream_seg_num > 0:
-                            upstream_seg.append_to_forward_sequence(segment.forward_sequence)
-                        else:
-                            upstream_seg.append_to_reverse_sequence(segment.forward_sequence)
-                    segment.remove_sequence()
-                    merged_seg_nums.append(seg_num)
-                    break
-
-                # If the segment has one upstream segment and multiple downstream segments,
-                # then we can merge it into the downstream segments.
-                if len(upstream_segs) == 1 and len(downstream_segs) > 1 and \
-                        all(self.lead_exclusively_from(x, seg_num) for x in downstream_segs):
-                    for downstream_seg_num in downstream_segs:
-                        downstream_seg = self.segments[abs(downstream_seg_num)]
-                        if downstream_seg_num > 0:
-                            downstream_seg.prepend_to_forward_sequence(segment.forward_sequence)
-                        else:
-                            downstream_seg.prepend_to_reverse_sequence(segment.forward_sequence)
-                    segment.remove_sequence()
+                if self.merge_small_segment(seg_num, max_merge_size):
                     merged_seg_nums.append(seg_num)
                     break
             else:
                 break
             self.remove_zero_length_segs(suppress_log=True)
+        self.finish_merging_small_segments(merged_seg_nums)
+        return len(merged_seg_nums)
+
+    def merge_small_segment(self, seg_num, max_merge_size):
+        """
+        Merges the segment into its upstream or downstream segments, if it is small enough and the
+        graph structure allows it. Returns whether it was merged (leaving it with no sequence).
+        """
+        segment = self.segments[seg_num]
+        if segment.get_length() > max_merge_size or segment.get_length() == 0:
+            return False
+        downstream_segs = self.get_downstream_seg_nums(seg_num)
+        upstream_segs = self.get_upstream_seg_nums(seg_num)
+
+        # If the segment has one downstream segment and multiple upstream segments,
+        # then we can merge it into the upstream segments.
+        if len(downstream_segs) == 1 and len(upstream_segs) > 1 and \
+                all(self.lead_exclusively_to(x, seg_num) for x in upstream_segs):
+            for upstream_seg_num in upstream_segs:
+                upstream_seg = self.segments[abs(upstream_seg_num)]
+                if upstream_seg_num > 0:
+                    upstream_seg.append_to_forward_sequence(segment.forward_bytes)
+                else:
+                    upstream_seg.append_to_reverse_sequence(segment.forward_bytes)
+            segment.remove_sequence()
+            return True
 
+        # If the segment has one upstream segment and multiple downstream segments,
+        # then we can merge it into the downstream segments.
+        if len(upstream_segs) == 1 and len(downstream_segs) > 1 and \
+                all(self.lead_exclusively_from(x, seg_num) for x in downstream_segs):
+            for downstream_seg_num in downstream_segs:
+                downstream_seg = self.segments[abs(downstream_seg_num)]
+                if downstream_seg_num > 0:
+                    downstream_seg.prepend_to_forward_sequence(segment.forward_bytes)
+                else:
+                    downstream_seg.prepend_to_reverse_sequence(segment.forward_bytes)
+            segment.remove_sequence()
+            return True
+        return False
+
+    def finish_merging_small_segments(self, merged_seg_nums):
         if merged_seg_nums:
             log.log('\nMerged small segments:')
             log.log_number_list(merged_seg_nums)
             self.remove_zero_length_segs()
-        return len(merged_seg_nums)
 
     def expand_repeats(self):
         """
         This function moves sequence into repeat segments, wherever possible.
         """
         for seg_num in sorted(self.segments):  # sort for consistency between runs
+            self.expand_repeat(seg_num)
 
-            def trim_amount_okay(seg_nums, trim_length):
-                for num in seg_nums:
-                    pos_seg_num = abs(num)
-                    seg_count = [abs(x) for x in seg_nums].count(pos_seg_num)  # should be 1 or 2
-                    if seg_count * trim_length > self.segments[pos_seg_num].get_length():
-                        return False
-                return True
-
-            segment = self.segments[seg_num]
-            inputs = sorted(self.get_upstream_seg_nums(seg_num))
-            exclusive_inputs = sorted(self.get_exclusive_inputs_signed(seg_num))
-            if len(inputs) > 1 and inputs == exclusive_inputs:
-                common_end = os.path.commonprefix([self.seq_from_signed_seg_num(x)[::-1]
-                                                   for x in inputs])[::-1]
-                common_end_len = len(common_end)
-                if common_end_len > 0 and trim_amount_okay(inputs, common_end_len):
-                    segment.prepend_to_forward_sequence(common_end)
-                    for in_seg in inputs:
-                        if in_seg > 0:
-                            self.segments[in_seg].trim_from_end(common_end_len)
-                        else:
-                            self.segments[-in_seg].trim_from_start(common_end_len)
-
-            outputs = sorted(self.get_downstream_seg_nums(seg_num))
-            exclusive_outputs = sorted(self.get_exclusive_outputs_signed(seg_num))
-            if len(outputs) > 1 and outputs == exclusive_outputs:
-                common_start = os.path.commonprefix([self.seq_from_signed_seg_num(x)
-                                                     for x in outputs])
-                common_start_len = len(common_start)
-                if common_start_len > 0 and trim_amount_okay(outputs, common_start_len):
-                    segment.append_to_forward_sequence(common_start)
-                    for out_seg in outputs:
-                        if out_seg > 0:
-                            self.segments[out_seg].trim_from_start(common_start_len)
-                        else:
-                            self.segments[-out_seg].trim_from_end(common_start_len)
+    def expand_repeat(self, seg_num):
+        """
+        Moves the common end of the segment's inputs and the common start of its outputs into the
+        segment. Returns the segments whose sequences changed.
+        """
+        def trim_amount_okay(seg_nums, trim_length):
+            for num in seg_nums:
+                pos_seg_num = abs(num)
+                seg_count = [abs(x) for x in seg_nums].count(pos_seg_num)  # should be 1 or 2
+                if seg_count * trim_length > self.segments[pos_seg_num].get_length():
+                    return False
+            return True
+
+        changed_seg_nums = []
+        segment = self.segments[seg_num]
+        inputs = sorted(self.get_upstream_seg_nums(seg_num))
+        exclusive_inputs = sorted(self.get_exclusive_inputs_signed(seg_num))
+        if len(inputs) > 1 and inputs == exclusive_inputs:
+            common_end = os.path.commonprefix([self.bytes_from_signed_seg_num(x)[::-1]
+                                               for x in inputs])[::-1]
+            common_end_len = len(common_end)
+            if common_end_len > 0 and trim_amount_okay(inputs, common_end_len):
+                segment.prepend_to_forward_sequence(common_end)
+                for in_seg in inputs:
+                    if in_seg > 0:
+                        self.segments[in_seg].trim_from_end(common_end_len)
+                    else:
+                        self.segments[-in_seg].trim_from_start(common_end_len)
+                changed_seg_nums += [seg_num] + [abs(x) for x in inputs]
+
+        outputs = sorted(self.get_downstream_seg_nums(seg_num))
+        exclusive_outputs = sorted(self.get_exclusive_outputs_signed(seg_num))
+        if len(outputs) > 1 and outputs == exclusive_outputs:
+            common_start = os.path.commonprefix([self.bytes_from_signed_seg_num(x)
+                                                 for x in outputs])
+            common_start_len = len(common_start)
+            if common_start_len > 0 and trim_amount_okay(outputs, common_start_len):
+                segment.append_to_forward_sequence(common_start)
+                for out_seg in outputs:
+                    if out_seg > 0:
+                        self.segments[out_seg].trim_from_start(common_start_len)
+                    else:
+                        self.segments[-out_seg].trim_from_end(common_start_len)
+                changed_seg_nums += [seg_num] + [abs(x) for x in outputs]
+        return changed_seg_nums
 
     def starts_with_dead_end(self, signed_seg_num):
         """
@@ -2501,12 +2702,12 @@ def all_segments_are_one_base(segments):
     non_empty_segments = [x for x in segments if x.get_length() > 0]
     if not non_empty_segments:
         return False
-    base = non_empty_segments[0].forward_sequence[0].lower()
+    base = non_empty_segments[0].forward_bytes[:1].lower()
     for segment in non_empty_segments:
         if not segment.is_homopolymer():
             return False
-        forward_base = segment.forward_sequence[0].lower()
-        reverse_base = segment.reverse_sequence[0].lower()
+        forward_base = segment.forward_bytes[:1].lower()
+        reverse_base = segment.get_reverse_bytes()[:1].lower()
         if forward_base != base and reverse_base != base:
             return False
     return True
@@ -2580,6 +2781,76 @@ def insert_num_in_list(lst, val_1, val_2, insert_val):
     return new_list
 
 
+def merge_segments_in_paths(paths, merges):
+    """
+    Given graph paths and a list of (merge path, new segment number) merges (in the order they
+    were made), this function returns the paths with each merged path replaced by its new segment.
+    Paths which only partly contain a merged path are split into pieces (named with _1, _2, etc.)
+    without those segments.
+
+    Each path only needs the merges which involve its segments. That isn't safe if a piece's new
+    name could clash with another path's name (e.g. a path named X_1 alongside a path X which gets
+    split), so in that rare case the merges are applied to all paths one at a time.
+    """
+    if not merges or not paths:
+        return paths
+    merge_indices = {}  # unsigned segment number -> index of the merge which used it
+    for i, (merge_path, _) in enumerate(merges):
+        for seg_num in merge_path:
+            merge_indices[abs(seg_num)] = i
+
+    # Paths which don't contain any merged segment are unchanged. With a GraphPaths, these can be
+    # found from its index without looking through every path.
+    if isinstance(paths, GraphPaths):
+        changed_names = paths.get_path_names(merge_indices)
+    else:
+        changed_names = None
+
+    new_paths = {}
+    all_names = set(paths)
+    for path_name, path_segments in paths.items():
+        if changed_names is not None and path_name not in changed_names:
+            new_paths[path_name] = path_segments
+            continue
+        relevant_merges = sorted(set(merge_indices[abs(x)] for x in path_segments
+                                     if abs(x) in merge_indices))
+        pieces = {path_name: path_segments}
+        for i in relevant_merges:
+            new_pieces = merge_segments_in_paths_one_merge(pieces, merges[i][0], merges[i][1])
+            for name in new_pieces:
+                if name not in pieces:
+                    if name in all_names:
+                        return merge_segments_in_paths_slowly(paths, merges)
+                    all_names.add(name)
+            pieces = new_pieces
+        new_paths.update(pieces)
+    return new_paths
+
+
+def merge_segments_in_paths_slowly(paths, merges):
+    for merge_path, new_seg_num in merges:
+        paths = merge_segments_in_paths_one_merge(paths, merge_path, new_seg_num)
+    return paths
+
+
+def merge_segments_in_paths_one_merge(paths, merge_path, new_seg_num):
+    flipped_merge_path = [-x for x in reversed(merge_path)]
+    new_paths = {}
+    for path_name, path_segments in paths.items():
+        path_segments = find_replace_in_list(path_segments, merge_path, [new_seg_num])
+        path_segments = find_replace_in_list(path_segments, flipped_merge_path, [-new_seg_num])
+
+        # If the path still contains the original segments, then split it into pieces, removing
+        # the original segments.
+        split_paths = split_path_multiple(path_segments, merge_path + flipped_merge_path)
+        if len(split_paths) == 1:
+            new_paths[path_name] = split_paths[0]
+        elif len(split_paths) > 1:
+            for i, path in enumerate(split_paths):
+                new_paths[path_name + '_' + str(i + 1)] = path
+    return new_paths
+
+
 def find_replace_in_list(lst, pattern, replacement):
     """
     This function looks for the given pattern in the list and if found, replaces it.
@@ -2671,18 +2942,3 @@ def add_to_bridged_sets(start, end, right_bridged, left_bridged):
         left_bridged.add(end)
     else:
         right_bridged.add(-end)
-
-
-def get_overlap_from_gfa_link(filename):
-    """
-    Looks for the first link line and gets the overlap. Assumes that all overlaps in the graph are
-    the same.
-    """
-    with open(filename, 'rt') as gfa_file:
-        for line in gfa_file:
-            if line.startswith('L'):
-                line_parts = line.strip().split('\t')
-                if len(line_parts) > 5:
-                    cigar = line_parts[5]
-                    return int(cigar[:-1])
-    return 0
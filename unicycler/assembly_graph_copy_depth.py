@@ -13,7 +13,10 @@ details. You should have received a copy of the GNU General Public License along
 not, see <http://www.gnu.org/licenses/>.
 """
 
-from .misc import print_table, get_right_arrow
+import heapq
+import time
+
+from .misc import print_table, get_right_arrow, float_to_str
 from . import settings
 from . import log
 
@@ -37,6 +40,8 @@ def determine_copy_depth(graph):
                         'than one link per side.',
                         verbosity=2)
 
+    phase_times = []
+    phase_start_time = time.time()
     single_copy_depth = graph.get_single_copy_depth()
 
     # Assign single copy status to segments within the tolerance of the single copy depth.
@@ -58,6 +63,7 @@ def determine_copy_depth(graph):
         log.log_number_list(initial_single_copy_segments, 2)
     else:
         log.log('Initial single copy segments: none', 2)
+    phase_times.append(('Initial single copy segments', time.time() - phase_start_time))
 
     log.log('', verbosity=2)
     log.log_explanation('Unicycler now uses a greedy algorithm to propagate multiplicity '
@@ -70,117 +76,251 @@ def determine_copy_depth(graph):
                         verbosity=2)
 
     # Propagate copy depth as much as possible using those initial assignments.
+    phase_start_time = time.time()
     copy_depth_table = [['Input', '', 'Output']]
-    determine_copy_depth_part_2(graph, settings.COPY_PROPAGATION_TOLERANCE, copy_depth_table)
+    propagator = CopyDepthPropagator(graph, copy_depth_table)
+    propagator.propagate(settings.COPY_PROPAGATION_TOLERANCE)
+    phase_times.append(('Initial propagation', time.time() - phase_start_time))
+    phase_start_time = time.time()
 
     # Assign single copy to the largest available segment, propagate and repeat.
     while True:
-        assignments = assign_single_copy_depth(graph, settings.MIN_SINGLE_COPY_LENGTH,
-                                               copy_depth_table)
-        determine_copy_depth_part_2(graph, settings.COPY_PROPAGATION_TOLERANCE, copy_depth_table)
+        assignments = propagator.assign_single_copy_depth(settings.MIN_SINGLE_COPY_LENGTH)
+        propagator.propagate(settings.COPY_PROPAGATION_TOLERANCE)
         if not assignments:
             break
+    phase_times.append(('New single copy segments', time.time() - phase_start_time))
+    phase_start_time = time.time()
 
     # Now propagate with no tolerance threshold to complete the remaining segments.
     if log.logger.stdout_verbosity_level >= 3:
         copy_depth_table.append(['REMOVING PROPAGATION TOLERANCE', '', ''])
-    determine_copy_depth_part_2(graph, 1.0, copy_depth_table)
+    propagator.propagate(1.0)
+    phase_times.append(('Propagation without tolerance', time.time() - phase_start_time))
 
     print_table(copy_depth_table, alignments='RLL', max_col_width=999, hide_header=True,
                 indent=0, col_separation=1, verbosity=2)
+    log.log('', verbosity=2)
+    print_table([['Multiplicity phase', 'Time (s)']] +
+                [[name, float_to_str(phase_time, 3)] for name, phase_time in phase_times],
+                alignments='LR', indent=0, verbosity=2)
 
 
-def determine_copy_depth_part_2(graph, tolerance, copy_depth_table):
-    """
-    Propagates copy depth repeatedly until assignments stop.
+class CopyDepthPropagator(object):
     """
-    if log.logger.stdout_verbosity_level >= 3:
-        copy_depth_table.append(['MERGING MULTIPLICITY', '', ''])
-    while merge_copy_depths(graph, tolerance, copy_depth_table):
-        pass
-    if log.logger.stdout_verbosity_level >= 3:
-        copy_depth_table.append(['SPLITTING MULTIPLICITY', '', ''])
-    if redistribute_copy_depths(graph, tolerance, copy_depth_table):
-        try:
-            determine_copy_depth_part_2(graph, tolerance, copy_depth_table)
-        except RecursionError:
-            pass
+    Propagates copy depths through a graph. Each step (a merge, a redistribution or a new single
+    copy segment) makes the same choice as a scan of the whole graph would, but the results of
+    looking at each segment are kept and only redone when one of its neighbours gets copy depths.
+    Nothing else can change them, as the links, depths and existing copy depths don't change
+    during propagation.
 
-
-def assign_single_copy_depth(graph, min_single_copy_length, copy_depth_table):
-    """
-    This function assigns a single copy to the longest available segment.
+    All copy depth assignments during propagation must go through set_copy_depths.
     """
-    if log.logger.stdout_verbosity_level >= 3:
-        copy_depth_table.append(['FINDING NEW SINGLE-COPY', '', ''])
-    segments = sorted(get_segments_without_copies(graph), key=lambda x: x.get_length(),
-                      reverse=True)
-    for segment in segments:
-        if segment.get_length() < min_single_copy_length:
-            continue
-        num = segment.number
-        if num in graph.manual_multiplicity and graph.manual_multiplicity[num] != 1:
-            continue
-        if exactly_one_link_per_end(graph, segment):
-            name_depth_before = get_seg_name_depth_str(graph, segment.number)
-            graph.copy_depths[segment.number] = [segment.depth]
-            name_depth_after = get_seg_name_depth_str(graph, segment.number)
-            add_to_copy_depth_table(name_depth_before, name_depth_after, copy_depth_table)
-            return 1
-    return 0
 
+    def __init__(self, graph, copy_depth_table):
+        self.graph = graph
+        self.copy_depth_table = copy_depth_table
+        self.seg_index = {num: i for i, num in enumerate(graph.segments)}
+
+        # Merge candidates: the best merge for each segment without copy depths, in a heap ordered
+        # like a scan of the graph (lowest error, then earliest segment, then inputs before
+        # outputs). Heap entries which are no longer a segment's current candidate are skipped.
+        self.merge_candidates = {}
+        self.merge_heap = []
+        for num in graph.segments:
+            if num not in graph.copy_depths:
+                self.update_merge_candidate(num)
+
+        # Segments with two or more copy depths which might be able to redistribute them, in a
+        # heap ordered by segment. The others have already failed and won't do any better until
+        # one of their neighbours gets copy depths (or the error margin changes).
+        self.redistribute_queue = []
+        self.redistribute_queued = set()
+        self.redistribute_error_margin = None
+
+        self.single_copy_candidates = None
+        self.single_copy_min_length = None
+        self.single_copy_position = 0
+
+    def set_copy_depths(self, num, copy_depths):
+        self.graph.copy_depths[num] = copy_depths
+        self.merge_candidates.pop(num, None)
+        if len(copy_depths) > 1:
+            self.queue_for_redistribution(num)
+        for connected_num in self.graph.get_connected_segments(num):
+            if connected_num not in self.graph.copy_depths:
+                self.update_merge_candidate(connected_num)
+            elif len(self.graph.copy_depths[connected_num]) > 1:
+                self.queue_for_redistribution(connected_num)
+
+    def propagate(self, error_margin):
+        """
+        Propagates copy depth repeatedly until assignments stop.
+        """
+        while True:
+            if log.logger.stdout_verbosity_level >= 3:
+                self.copy_depth_table.append(['MERGING MULTIPLICITY', '', ''])
+            while self.merge_copy_depths(error_margin):
+                pass
+            if log.logger.stdout_verbosity_level >= 3:
+                self.copy_depth_table.append(['SPLITTING MULTIPLICITY', '', ''])
+            if not self.redistribute_copy_depths(error_margin):
+                break
 
-def merge_copy_depths(graph, error_margin, copy_depth_table):
-    """
-    This function looks for segments where they have input on one end where:
-      1) All input segments have copy depth assigned.
-      2) All input segments exclusively input to this segment.
-    All such cases are evaluated, and the segment with the lowest error (if that error is below
-    the allowed error margin) is assigned copy depths, scaling the inputs so their sum
-    exactly matches the segment's depth.
-    """
-    segments = get_segments_without_copies(graph)
-    if not segments:
+    def assign_single_copy_depth(self, min_single_copy_length):
+        """
+        This function assigns a single copy to the longest available segment.
+        """
+        graph = self.graph
+        if log.logger.stdout_verbosity_level >= 3:
+            self.copy_depth_table.append(['FINDING NEW SINGLE-COPY', '', ''])
+
+        # Whether a segment can be made single copy only depends on the segment itself, so the
+        # candidates are found once (longest first) and used in order.
+        if self.single_copy_min_length != min_single_copy_length:
+            self.single_copy_min_length = min_single_copy_length
+            self.single_copy_position = 0
+            self.single_copy_candidates = \
+                [x.number for x in sorted(graph.segments.values(), key=lambda x: x.get_length(),
+                                          reverse=True)
+                 if x.get_length() >= min_single_copy_length and
+                 not (x.number in graph.manual_multiplicity and
+                      graph.manual_multiplicity[x.number] != 1) and
+                 exactly_one_link_per_end(graph, x)]
+        while self.single_copy_position < len(self.single_copy_candidates):
+            num = self.single_copy_candidates[self.single_copy_position]
+            self.single_copy_position += 1
+            if num in graph.copy_depths:
+                continue
+            name_depth_before = get_seg_name_depth_str(graph, num)
+            self.set_copy_depths(num, [graph.segments[num].depth])
+            name_depth_after = get_seg_name_depth_str(graph, num)
+            add_to_copy_depth_table(name_depth_before, name_depth_after, self.copy_depth_table)
+            return 1
         return 0
 
-    best_segment_num = None
-    best_source_nums = None
-    best_new_depths = []
-    lowest_error = float('inf')
-
-    for segment in segments:
-        num = segment.number
-        exclusive_inputs = graph.get_exclusive_inputs(num)
-        exclusive_outputs = graph.get_exclusive_outputs(num)
-        in_depth_possible = exclusive_inputs and all_have_copy_depths(graph, exclusive_inputs)
-        out_depth_possible = exclusive_outputs and all_have_copy_depths(graph, exclusive_outputs)
-        if in_depth_possible:
-            depths, error = scale_copy_depths_from_source_segments(graph, num, exclusive_inputs)
-            conflict = (num in graph.manual_multiplicity and
-                        graph.manual_multiplicity[num] != len(depths))
-            if error < lowest_error and not conflict:
-                lowest_error = error
-                best_segment_num = num
-                best_source_nums = exclusive_inputs
-                best_new_depths = depths
-        if out_depth_possible:
-            depths, error = scale_copy_depths_from_source_segments(graph, num, exclusive_outputs)
+    def update_merge_candidate(self, num):
+        """
+        Finds the best merge for a segment without copy depths, from one end where:
+          1) All input segments have copy depth assigned.
+          2) All input segments exclusively input to this segment.
+        """
+        graph = self.graph
+        best = None
+        for side, sources in enumerate((graph.get_exclusive_inputs(num),
+                                        graph.get_exclusive_outputs(num))):
+            if not sources or not all_have_copy_depths(graph, sources):
+                continue
+            depths, error = scale_copy_depths_from_source_segments(graph, num, sources)
             conflict = (num in graph.manual_multiplicity and
                         graph.manual_multiplicity[num] != len(depths))
-            if error < lowest_error and not conflict:
-                lowest_error = error
-                best_segment_num = num
-                best_source_nums = exclusive_outputs
-                best_new_depths = depths
-    if best_segment_num and lowest_error < error_margin:
-        graph.copy_depths[best_segment_num] = best_new_depths
-        add_to_copy_depth_table(' + '.join(get_seg_name_depth_str(graph, x)
-                                           for x in best_source_nums),
-                                get_seg_name_depth_str(graph, best_segment_num), copy_depth_table)
-        return 1
-    else:
+            if error < float('inf') and not conflict and (best is None or error < best[0]):
+                best = (error, self.seg_index[num], side, num, sources, depths)
+        if best is None:
+            self.merge_candidates.pop(num, None)
+        else:
+            self.merge_candidates[num] = best
+            heapq.heappush(self.merge_heap, best)
+
+    def merge_copy_depths(self, error_margin):
+        """
+        Of all the segments which can get copy depths from their inputs (or outputs), the one with
+        the lowest error (if that error is below the allowed error margin) is assigned copy depths,
+        scaling the inputs so their sum exactly matches the segment's depth.
+        """
+        while self.merge_heap:
+            candidate = self.merge_heap[0]
+            error, _, _, num, sources, depths = candidate
+            if self.merge_candidates.get(num) is not candidate:
+                heapq.heappop(self.merge_heap)
+                continue
+            if not error < error_margin:
+                return 0
+            heapq.heappop(self.merge_heap)
+            self.set_copy_depths(num, depths)
+            add_to_copy_depth_table(' + '.join(get_seg_name_depth_str(self.graph, x)
+                                               for x in sources),
+                                    get_seg_name_depth_str(self.graph, num),
+                                    self.copy_depth_table)
+            return 1
+        return 0
+
+    def queue_for_redistribution(self, num):
+        if num not in self.redistribute_queued:
+            self.redistribute_queued.add(num)
+            heapq.heappush(self.redistribute_queue, (self.seg_index[num], num))
+
+    def redistribute_copy_depths(self, error_margin):
+        """
+        This function deals with the easier case of copy depth redistribution: where one segments
+        with copy depth leads exclusively to multiple segments without copy depth.
+        We will then try to redistribute the source segment's copy depths among the destination
+        segments.  If it can be done within the allowed error margin, the destination segments will
+        get their copy depths.
+        """
+        graph = self.graph
+        if error_margin != self.redistribute_error_margin:
+            self.redistribute_error_margin = error_margin
+            for num, copy_depths in graph.copy_depths.items():
+                if len(copy_depths) > 1:
+                    self.queue_for_redistribution(num)
+
+        while self.redistribute_queue:
+            _, num = heapq.heappop(self.redistribute_queue)
+            self.redistribute_queued.discard(num)
+            connections = graph.get_exclusive_inputs(num)
+            if not connections or all_have_copy_depths(graph, connections):
+                connections = graph.get_exclusive_outputs(num)
+            if not connections or all_have_copy_depths(graph, connections):
+                continue
+
+            # If we got here, then we can try to redistribute the segment's copy depths to its
+            # connections which are lacking copy depth.
+            copy_depths = graph.copy_depths[num]
+            targets = [None if x not in graph.copy_depths else len(graph.copy_depths[x])
+                       for x in connections]
+            lowest_error, best_arrangement = \
+                get_best_copy_depth_arrangement(graph, connections, copy_depths, targets,
+                                                error_margin)
+            if best_arrangement is None:
+                continue
+
+            # Make sure this redistribution of copy depths does not conflict with any manually
+            # assigned multiplicities.
+            conflict = False
+            if best_arrangement is not None:
+                for connection_num, connection_depths in zip(connections, best_arrangement):
+                    if (connection_num in graph.manual_multiplicity and
+                            graph.manual_multiplicity[connection_num] != len(connection_depths)):
+                        conflict = True
+
+            if lowest_error < error_margin and not conflict:
+                if self.assign_copy_depths_where_needed(connections, best_arrangement,
+                                                        error_margin):
+                    add_to_copy_depth_table(get_seg_name_depth_str(graph, num),
+                                            ' + '.join(get_seg_name_depth_str(graph, x)
+                                                       for x in connections),
+                                            self.copy_depth_table)
+                    return 1
         return 0
 
+    def assign_copy_depths_where_needed(self, segment_numbers, new_depths, error_margin):
+        """
+        For the given segments, this function assigns the corresponding copy depths, scaled to fit
+        the segment.  If a segment already has copy depths, it is skipped (i.e. this function only
+        write new copy depths, doesn't overwrite existing ones).
+        It will only create copy depths if doing so is within the allowed error margin.
+        """
+        success = False
+        for i, num in enumerate(segment_numbers):
+            if num not in self.graph.copy_depths:
+                new_copy_depths, error = scale_copy_depths(self.graph.segments[num].depth,
+                                                           new_depths[i])
+                if error <= error_margin:
+                    self.set_copy_depths(num, new_copy_depths)
+                    success = True
+        return success
+
 
 def get_seg_name_depth_str(graph, segment_num):
     if segment_num in graph.copy_depths and len(graph.copy_depths[segment_num]) > 0:
@@ -208,69 +348,6 @@ def add_to_copy_depth_table(before_str, after_str, copy_depth_table):
     copy_depth_table.append([before_str, get_right_arrow(), after_str])
 
 
-def redistribute_copy_depths(graph, error_margin, copy_depth_table):
-    """
-    This function deals with the easier case of copy depth redistribution: where one segments
-    with copy depth leads exclusively to multiple segments without copy depth.
-    We will then try to redistribute the source segment's copy depths among the destination
-    segments.  If it can be done within the allowed error margin, the destination segments will
-    get their copy depths.
-    """
-    segments = get_segments_with_two_or_more_copies(graph)
-    if not segments:
-        return 0
-
-    for segment in segments:
-        num = segment.number
-        connections = graph.get_exclusive_inputs(num)
-        if not connections or all_have_copy_depths(graph, connections):
-            connections = graph.get_exclusive_outputs(num)
-        if not connections or all_have_copy_depths(graph, connections):
-            continue
-
-        # If we got here, then we can try to redistribute the segment's copy depths to its
-        # connections which are lacking copy depth.
-        copy_depths = graph.copy_depths[num]
-        bins = [[]] * len(connections)
-        targets = [None if x not in graph.copy_depths else len(graph.copy_depths[x])
-                   for x in connections]
-
-        # For cases where there are many copy depths being distributed to many segments, there
-        # will be too many combinations, so we don't bother trying.
-        arrangement_count = len(bins) ** len(copy_depths)
-        if arrangement_count > settings.MAX_COPY_DEPTH_DISTRIBUTION_ARRANGEMENTS:
-            continue
-        arrangements = shuffle_into_bins(copy_depths, bins, targets)
-        if not arrangements:
-            continue
-
-        lowest_error = float('inf')
-        best_arrangement = None
-        for i, arrangement in enumerate(arrangements):
-            error = get_error_for_multiple_segments_and_depths(graph, connections, arrangement)
-            if i == 0 or error < lowest_error:
-                lowest_error = error
-                best_arrangement = arrangement
-
-        # Make sure this redistribution of copy depths does not conflict with any manually assigned
-        # multiplicities.
-        conflict = False
-        if best_arrangement is not None:
-            for connection_num, connection_depths in zip(connections, best_arrangement):
-                if (connection_num in graph.manual_multiplicity and
-                        graph.manual_multiplicity[connection_num] != len(connection_depths)):
-                    conflict = True
-
-        if lowest_error < error_margin and not conflict:
-            if assign_copy_depths_where_needed(graph, connections, best_arrangement, error_margin):
-                add_to_copy_depth_table(get_seg_name_depth_str(graph, num),
-                                        ' + '.join(get_seg_name_depth_str(graph, x)
-                                                   for x in connections),
-                                        copy_depth_table)
-                return 1
-    return 0
-
-
 def okay_for_initial_single_copy(graph, segment):
     """
     Returns True if the given segment's links don't preclude calling this a single copy segment
@@ -377,18 +454,6 @@ def scale_copy_depths(target_depth, source_depths):
     return scaled_depths, error
 
 
-def get_segments_without_copies(graph):
-    """
-    Returns a list of the graph segments lacking copy depth information.
-    """
-    return [x for x in graph.segments.values() if x.number not in graph.copy_depths]
-
-
-def get_segments_with_two_or_more_copies(graph):
-    return [x for x in graph.segments.values() if
-            x.number in graph.copy_depths and len(graph.copy_depths[x.number]) > 1]
-
-
 def get_error_for_multiple_segments_and_depths(graph, segment_numbers, copy_depths):
     """
     For the given segments, this function assesses how well the given copy depths match up.
@@ -402,23 +467,6 @@ def get_error_for_multiple_segments_and_depths(graph, segment_numbers, copy_dept
     return max_error
 
 
-def assign_copy_depths_where_needed(graph, segment_numbers, new_depths, error_margin):
-    """
-    For the given segments, this function assigns the corresponding copy depths, scaled to fit
-    the segment.  If a segment already has copy depths, it is skipped (i.e. this function only
-    write new copy depths, doesn't overwrite existing ones).
-    It will only create copy depths if doing so is within the allowed error margin.
-    """
-    success = False
-    for i, num in enumerate(segment_numbers):
-        if num not in graph.copy_depths:
-            new_copy_depths, error = scale_copy_depths(graph.segments[num].depth, new_depths[i])
-            if error <= error_margin:
-                graph.copy_depths[num] = new_copy_depths
-                success = True
-    return success
-
-
 def get_error(source, target):
     """
     Returns the relative error from trying to assign the source value to the target value.
@@ -430,40 +478,138 @@ def get_error(source, target):
         return float('inf')
 
 
-def shuffle_into_bins(items, bins, targets):
+def get_best_copy_depth_arrangement(graph, segment_numbers, copy_depths, targets, error_margin):
     """
-    Shuffle items into bins in all possible arrangements that satisfy these conditions:
-      1) All bins must have at least one item.
-      2) Any bins with a specified target must have exactly that number of items.
+    Finds the arrangement of copy depths into the given segments with the lowest error (as measured
+    by get_error_for_multiple_segments_and_depths), where:
+      1) All segments must get at least one copy depth.
+      2) Any segments with a specified target must get exactly that number of copy depths.
+    Only arrangements with an error below the error margin are considered. Ties go to the
+    arrangement which puts larger copy depths in earlier segments. Returns the error and the
+    arrangement (a list of copy depths for each segment), or infinity and None if there isn't one.
+
+    This is a branch-and-bound search: copy depths are placed from largest to smallest, and a
+    partial arrangement is abandoned as soon as a lower bound on its error shows it can't beat the
+    best arrangement found so far. Copy depths of equal value are interchangeable, so only one
+    order of them is tried. The most promising segment for each copy depth is tried first, so good
+    arrangements are found early. If the search would take more than
+    MAX_COPY_DEPTH_DISTRIBUTION_STEPS, the best arrangement found by then may not be the best
+    overall, so infinity and None are returned, as for too many possible arrangements before.
     """
-    arrangements = []
-
-    # If there are items not yet in a bin, place the first item in each possible bin and call this
-    # function recursively.
-    if items:
-
-        # If there are only enough items to fill the empty bins, then we will only put the next
-        # item in an empty bin (because putting it in a non-empty bin would prevent us from filling
-        # all bins).
-        empty_bin_count = sum(1 for x in bins if not x)
-        only_put_in_empty = len(items) <= empty_bin_count
-
-        for i, _ in enumerate(bins):
-
-            # Don't put an item in a bin if that bin is already at capacity.
-            if targets[i] and len(bins[i]) >= targets[i]:
-                continue
-
-            if only_put_in_empty and bins[i]:
+    bin_count, item_count = len(segment_numbers), len(copy_depths)
+    seg_depths = [graph.segments[x].depth for x in segment_numbers]
+    min_counts = [x if x else 1 for x in targets]
+    if sum(min_counts) > item_count or (all(targets) and sum(targets) != item_count) or \
+            any(x <= 0.0 for x in seg_depths):
+        return float('inf'), None
+
+    # The error can't be lower than the overall error between the copy depths and the segments.
+    overall_error = get_error(sum(copy_depths), sum(seg_depths))
+    if overall_error >= error_margin:
+        return float('inf'), None
+
+    items = sorted(copy_depths, reverse=True)
+    tail_sums = [0.0] * (item_count + 1)  # tail_sums[k] is the sum of items[k:]
+    for k in range(item_count - 1, -1, -1):
+        tail_sums[k] = tail_sums[k + 1] + items[k]
+
+    bin_sums = [0.0] * bin_count
+    bin_counts = [0] * bin_count
+    item_bins = [0] * item_count  # the segment each item is in, for the items placed so far
+    best = [error_margin, None, None]  # error, arrangement, item_bins
+
+    def error_lower_bound(k):
+        """
+        The lowest error possible for any arrangement which starts with the first k items placed.
+        If a segment gets c more items, they will add at least the sum of the c smallest remaining
+        items and at most the sum of the c largest, so each segment's error can't be lower than
+        its error for the closest of these ranges.
+        """
+        remaining = item_count - k
+        min_adds = [(targets[b] - bin_counts[b]) if targets[b] else (0 if bin_counts[b] else 1)
+                    for b in range(bin_count)]
+        needed = sum(min_adds)
+        if needed > remaining:
+            return float('inf')
+        bound = overall_error
+        for b in range(bin_count):
+            seg_depth = seg_depths[b]
+            wanted = seg_depth - bin_sums[b]
+            min_count = min_adds[b]
+            max_count = min_count if targets[b] else remaining - needed + min_count
+
+            # Find the fewest items whose largest possible sum reaches the wanted depth.
+            low, high = min_count, max_count + 1
+            while low < high:
+                middle = (low + high) // 2
+                if tail_sums[k] - tail_sums[k + middle] >= wanted:
+                    high = middle
+                else:
+                    low = middle + 1
+            if low > max_count:
+                distance = wanted - (tail_sums[k] - tail_sums[k + max_count])
+            else:
+                distance = max(0.0, tail_sums[item_count - low] - wanted)
+                if low > min_count:
+                    distance = min(distance, wanted - (tail_sums[k] - tail_sums[k + low - 1]))
+            bound = max(bound, distance / seg_depth)
+        return bound
+
+    def try_arrangement():
+        arrangement = [[] for _ in range(bin_count)]
+        for item, b in zip(items, item_bins):
+            arrangement[b].append(item)
+        error = get_error_for_multiple_segments_and_depths(graph, segment_numbers, arrangement)
+        if error < best[0] or (error == best[0] and best[2] is not None and item_bins < best[2]):
+            best[:] = [error, arrangement, list(item_bins)]
+
+    def bins_to_try(k):
+        """
+        Returns the segments the kth item can go in, the one most in need of depth last (they are
+        popped off the end), so good arrangements are found early. An item equal to the one
+        before it can't go in an earlier segment.
+        """
+        min_bin = item_bins[k - 1] if k > 0 and items[k] == items[k - 1] else 0
+        bins = [b for b in range(min_bin, bin_count)
+                if not targets[b] or bin_counts[b] < targets[b]]
+        bins.sort(key=lambda b: (bin_sums[b] + items[k] - seg_depths[b]) / seg_depths[b],
+                  reverse=True)
+        return bins
+
+    # Depth-first search with an explicit stack: one entry per placed item, holding the segments
+    # left to try for that item. The bound is allowed a little slack for rounding errors, so
+    # arrangements tied with the best one are still found.
+    stack = [bins_to_try(0)]
+    steps = 0
+    while stack and steps < settings.MAX_COPY_DEPTH_DISTRIBUTION_STEPS:
+        k = len(stack) - 1
+        remaining_bins = stack[-1]
+        if not remaining_bins:
+            stack.pop()
+            if stack:
+                previous = len(stack) - 1
+                bin_sums[item_bins[previous]] -= items[previous]
+                bin_counts[item_bins[previous]] -= 1
+            continue
+        steps += 1
+        b = remaining_bins.pop()
+        item_bins[k] = b
+        bin_sums[b] += items[k]
+        bin_counts[b] += 1
+        if error_lower_bound(k + 1) <= best[0] * (1.0 + 1e-9):
+            if k + 1 == item_count:
+                try_arrangement()
+            else:
+                stack.append(bins_to_try(k + 1))
                 continue
-
-            bins_copy = [list(x) for x in bins]
-            bins_copy[i].append(items[0])
-            arrangements += shuffle_into_bins(items[1:], bins_copy, targets)
-
-    # If all items are in a bin, all bins have at least one item and any bins with a target have
-    # the appropriate amount, then add the arrangement to the results.
-    elif all(x for x in bins) and \
-            all([not target or target == len(bins[i]) for i, target in enumerate(targets)]):
-        arrangements.append(bins)
-    return arrangements
+        bin_sums[b] -= items[k]
+        bin_counts[b] -= 1
+
+    if stack:
+        log.log('Copy depth redistribution to segments ' +
+                ', '.join(str(x) for x in segment_numbers) + ' took more than ' +
+                str(settings.MAX_COPY_DEPTH_DISTRIBUTION_STEPS) + ' steps, so it was skipped', 3)
+        return float('inf'), None
+    if best[1] is None:
+        return float('inf'), None
+    return best[0], best[1]
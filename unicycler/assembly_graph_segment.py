@@ -15,7 +15,8 @@ not, see <http://www.gnu.org/licenses/>.
 """
 
 import textwrap
-from .misc import reverse_complement, add_line_breaks_to_sequence
+from .misc import add_line_breaks_to_sequence
+from .seqops import reverse_complement
 from .bridge_long_read import LongReadBridge
 from .bridge_spades_contig import SpadesContigBridge
 from .bridge_loop_unroll import LoopUnrollingBridge
@@ -23,62 +24,79 @@ from .bridge_long_read_simple import SimpleLongReadBridge
 from .bridge_miniasm import MiniasmBridge
 
 
-# noinspection PyAugmentAssignment
 class Segment(object):
     """
     This hold a graph segment with a number, depth, direction and sequence.
+
+    Only the forward strand is stored (as bytes). The reverse strand is made from it when needed
+    and cached until the sequence next changes. The forward_sequence and reverse_sequence
+    attributes give the strands as strings, but they decode the whole strand each time, so code
+    which reads sequences a lot should use forward_bytes and get_reverse_bytes instead.
     """
+    __slots__ = ['number', 'depth', 'original_depth', 'forward_bytes', 'reverse_bytes_cache',
+                 'bridge', 'graph_path', 'used_in_bridges']
+
     def __init__(self, number, depth, sequence, positive, bridge=None, graph_path=None,
                  original_depth=True):
         self.number = number
         self.depth = depth
         self.original_depth = original_depth
-        self.forward_sequence = ''
-        self.reverse_sequence = ''
+        self.forward_bytes = b''
+        self.reverse_bytes_cache = None
         self.bridge = bridge
         self.graph_path = graph_path
-        if positive:
-            self.forward_sequence = sequence
-        else:
-            self.reverse_sequence = sequence
+        self.add_sequence(sequence, positive)
         self.used_in_bridges = []
 
     def __repr__(self):
-        if len(self.forward_sequence) > 6:
+        if len(self.forward_bytes) > 6:
             seq_string = self.forward_sequence[:3] + '...' + self.forward_sequence[-3:]
         else:
             seq_string = self.forward_sequence
         return str(self.number) + ' (' + seq_string + ')'
 
+    @property
+    def forward_sequence(self):
+        return self.forward_bytes.decode()
+
+    @forward_sequence.setter
+    def forward_sequence(self, sequence):
+        self.set_forward_bytes(to_bytes(sequence))
+
+    @property
+    def reverse_sequence(self):
+        return self.get_reverse_bytes().decode()
+
+    @reverse_sequence.setter
+    def reverse_sequence(self, sequence):
+        self.set_forward_bytes(reverse_complement(to_bytes(sequence)))
+
+    def set_forward_bytes(self, forward_bytes, reverse_bytes=None):
+        self.forward_bytes = forward_bytes
+        self.reverse_bytes_cache = reverse_bytes
+
+    def get_reverse_bytes(self):
+        if self.reverse_bytes_cache is None:
+            self.reverse_bytes_cache = reverse_complement(self.forward_bytes)
+        return self.reverse_bytes_cache
+
     def add_sequence(self, sequence, positive):
         if positive:
             self.forward_sequence = sequence
         else:
             self.reverse_sequence = sequence
 
-    def build_other_sequence_if_necessary(self):
-        if not self.forward_sequence:
-            self.forward_sequence = reverse_complement(self.reverse_sequence)
-        if not self.reverse_sequence:
-            self.reverse_sequence = reverse_complement(self.forward_sequence)
-
     def get_length(self):
-        return len(self.forward_sequence)
+        return len(self.forward_bytes)
 
     def get_length_no_overlap(self, overlap):
-        return len(self.forward_sequence) - overlap
+        return len(self.forward_bytes) - overlap
 
     def is_homopolymer(self):
         """
         Returns True if the segment's sequence is made up of only one base.
         """
-        if len(self.forward_sequence) == 0:
-            return False
-        first_base = self.forward_sequence[0].lower()
-        for base in self.forward_sequence[1:]:
-            if base.lower() != first_base:
-                return False
-        return True
+        return len(set(self.forward_bytes.lower())) == 1
 
     def gfa_segment_line(self):
         """
@@ -141,8 +159,10 @@ class Segment(object):
         assert self.get_length() >= amount
         if amount == 0:
             return
-        self.forward_sequence = self.forward_sequence[:-amount]
-        self.reverse_sequence = self.reverse_sequence[amount:]
+        reverse_bytes = self.reverse_bytes_cache
+        if reverse_bytes is not None:
+            reverse_bytes = reverse_bytes[amount:]
+        self.set_forward_bytes(self.forward_bytes[:-amount], reverse_bytes)
 
     def trim_from_start(self, amount):
         """
@@ -151,47 +171,55 @@ class Segment(object):
         assert self.get_length() >= amount
         if amount == 0:
             return
-        self.forward_sequence = self.forward_sequence[amount:]
-        self.reverse_sequence = self.reverse_sequence[:-amount]
+        reverse_bytes = self.reverse_bytes_cache
+        if reverse_bytes is not None:
+            reverse_bytes = reverse_bytes[:-amount]
+        self.set_forward_bytes(self.forward_bytes[amount:], reverse_bytes)
 
     def append_to_forward_sequence(self, additional_seq):
         """
         Adds the given sequence to the end of the forward sequence (and updates the reverse
         sequence accordingly).
         """
-        self.forward_sequence = self.forward_sequence + additional_seq
-        self.reverse_sequence = reverse_complement(self.forward_sequence)
+        self.add_to_forward_bytes(b'', to_bytes(additional_seq))
 
     def append_to_reverse_sequence(self, additional_seq):
         """
         Adds the given sequence to the end of the reverse sequence (and updates the forward
         sequence accordingly).
         """
-        self.reverse_sequence = self.reverse_sequence + additional_seq
-        self.forward_sequence = reverse_complement(self.reverse_sequence)
+        self.add_to_forward_bytes(reverse_complement(to_bytes(additional_seq)), b'')
 
     def prepend_to_forward_sequence(self, additional_seq):
         """
         Adds the given sequence to the end of the forward sequence (and updates the reverse
         sequence accordingly).
         """
-        self.forward_sequence = additional_seq + self.forward_sequence
-        self.reverse_sequence = reverse_complement(self.forward_sequence)
+        self.add_to_forward_bytes(to_bytes(additional_seq), b'')
 
     def prepend_to_reverse_sequence(self, additional_seq):
         """
         Adds the given sequence to the end of the reverse sequence (and updates the forward
         sequence accordingly).
         """
-        self.reverse_sequence = additional_seq + self.reverse_sequence
-        self.forward_sequence = reverse_complement(self.reverse_sequence)
+        self.add_to_forward_bytes(b'', reverse_complement(to_bytes(additional_seq)))
+
+    def add_to_forward_bytes(self, before, after):
+        """
+        Adds sequence to both ends of the forward strand. If the reverse strand is cached, only
+        the added parts need to be reverse complemented.
+        """
+        reverse_bytes = self.reverse_bytes_cache
+        if reverse_bytes is not None:
+            reverse_bytes = reverse_complement(after) + reverse_bytes + \
+                reverse_complement(before)
+        self.set_forward_bytes(before + self.forward_bytes + after, reverse_bytes)
 
     def remove_sequence(self):
         """
         Gets rid of the segment sequence entirely, turning it into a zero-length segment.
         """
-        self.forward_sequence = ''
-        self.reverse_sequence = ''
+        self.set_forward_bytes(b'', b'')
 
     def rotate_sequence(self, start_pos, flip):
         """
@@ -199,13 +227,17 @@ class Segment(object):
         forward and reverse strands. This function assumes that the segment is a circular
         completed replicon with no overlap.
         """
-        unrotated_seq = self.forward_sequence
+        unrotated_seq = self.forward_bytes
         rotated_seq = unrotated_seq[start_pos:] + unrotated_seq[:start_pos]
         rev_comp_rotated_seq = reverse_complement(rotated_seq)
 
         if flip:
-            self.forward_sequence = rev_comp_rotated_seq
-            self.reverse_sequence = rotated_seq
+            self.set_forward_bytes(rev_comp_rotated_seq, rotated_seq)
         else:
-            self.forward_sequence = rotated_seq
-            self.reverse_sequence = rev_comp_rotated_seq
+            self.set_forward_bytes(rotated_seq, rev_comp_rotated_seq)
+
+
+def to_bytes(sequence):
+    if isinstance(sequence, str):
+        return sequence.encode()
+    return bytes(sequence)
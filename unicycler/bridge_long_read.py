@@ -22,7 +22,8 @@ import sys
 from collections import defaultdict
 from .bridge_common import get_bridge_str, get_mean_depth, get_depth_agreement_factor, \
     get_bridge_table_parameters, print_bridge_table_header, print_bridge_table_row
-from .misc import float_to_str, reverse_complement, flip_number_order, score_function
+from .misc import float_to_str, flip_number_order, score_function
+from .seqops import reverse_complement
 from . import settings
 from .path_finding import get_best_paths_for_seq
 from . import log
@@ -475,8 +476,8 @@ def create_long_read_bridges(graph, read_dict, read_names, anchor_segments, verb
                     bridge_end = alignment_2.read_start_positive_strand()
 
                     if bridge_end > bridge_start:
-                        bridge_seq = read.sequence[bridge_start:bridge_end]
-                        bridge_qual = read.qualities[bridge_start:bridge_end]
+                        bridge_seq = read.get_subsequence(bridge_start, bridge_end)
+                        bridge_qual = read.get_subqualities(bridge_start, bridge_end)
                         if flipped:
                             bridge_seq = reverse_complement(bridge_seq)
                             bridge_qual = bridge_qual[::-1]
@@ -28,6 +28,7 @@ import itertools
 from multiprocessing.dummy import Pool as ThreadPool
 from .minimap_alignment import align_long_reads_to_assembly_graph, build_start_end_overlap_sets
 from .misc import print_table, get_right_arrow, float_to_str
+from .read_ref import get_read_renames
 from .bridge_common import get_bridge_str, get_mean_depth, get_depth_agreement_factor
 from . import log
 from . import settings
@@ -124,7 +125,8 @@ def create_simple_long_read_bridges(graph, out_dir, keep, threads, read_dict, lo
     if not os.path.exists(bridging_dir):
         os.makedirs(bridging_dir)
     minimap_alignments = align_long_reads_to_assembly_graph(graph, long_read_filename,
-                                                            bridging_dir, threads)
+                                                            bridging_dir, threads,
+                                                            get_read_renames(read_dict))
     start_overlap_reads, end_overlap_reads = build_start_end_overlap_sets(minimap_alignments)
     bridges = simple_bridge_two_way_junctions(graph, start_overlap_reads, end_overlap_reads,
                                               minimap_alignments, anchor_segments)
@@ -452,7 +454,7 @@ def get_read_loop_vote(start, end, middle, repeat, strand, minimap_alignments, r
 
     # Now that we have the alignments, we can extract the relevant part of the read...
     read_start_pos, read_end_pos = start_alignment.read_start, end_alignment.read_end
-    read_seq = read_dict[read].sequence[read_start_pos:read_end_pos]
+    read_seq = read_dict[read].get_subsequence(read_start_pos, read_end_pos)
 
     # ... and the relevant parts of the start/end segments.
     if start_alignment.read_strand == '+':
@@ -485,8 +487,7 @@ def get_read_loop_vote(start, end, middle, repeat, strand, minimap_alignments, r
         alignment_result = fully_global_alignment(read_seq, test_seq, scoring_scheme, True,
                                                   settings.SIMPLE_REPEAT_BRIDGING_BAND_SIZE)
         if alignment_result:
-            seqan_parts = alignment_result.split(',', 9)
-            test_seq_score = int(seqan_parts[6])
+            test_seq_score = alignment_result.raw_score
             if best_score is None or test_seq_score > best_score:
                 best_score = test_seq_score
                 best_count = loop_count
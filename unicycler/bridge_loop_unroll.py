@@ -159,7 +159,8 @@ def create_loop_unrolling_bridges(graph, anchor_segments):
             continue
 
         joined = False
-        for path in graph.paths.values():
+        for path_name in graph.paths.get_positions(middle):
+            path = graph.paths[path_name]
             flipped_path = [-x for x in reversed(path)]
             if (start in path and middle in path) or \
                     (end in path and middle in path) or \
@@ -131,12 +131,17 @@ def create_spades_contig_bridges(graph, anchor_segments):
                         'create a bridge from the path.', verbosity=1)
 
     bridge_path_set = set()
-    single_copy_numbers = [x.number for x in anchor_segments]
+    single_copy_numbers = set(x.number for x in anchor_segments)
     for segment in anchor_segments:
-        for path in graph.paths.values():
+        # Only the paths which contain the segment can give bridges from it.
+        for path_name, indices in graph.paths.get_positions(segment.number).items():
+            path = graph.paths[path_name]
             flipped_path = [-x for x in reversed(path)]
-            contig_bridges = find_contig_bridges(segment.number, path, single_copy_numbers)
-            contig_bridges += find_contig_bridges(segment.number, flipped_path, single_copy_numbers)
+            flipped_indices = [len(path) - 1 - i for i in reversed(indices)]
+            contig_bridges = find_contig_bridges(segment.number, path, single_copy_numbers,
+                                                 indices)
+            contig_bridges += find_contig_bridges(segment.number, flipped_path,
+                                                  single_copy_numbers, flipped_indices)
             for contig_bridge in contig_bridges:
                 flipped_contig_bridge = [-x for x in reversed(contig_bridge)]
                 contig_bridge_str = ','.join([str(x) for x in contig_bridge])
@@ -202,13 +207,15 @@ def create_spades_contig_bridges(graph, anchor_segments):
     return bridges
 
 
-def find_contig_bridges(segment_num, path, single_copy_numbers):
+def find_contig_bridges(segment_num, path, single_copy_numbers, indices=None):
     """
     This function returns a list of lists: every part of the path which starts on the segment_num
-    and ends on any of the single_copy_numbers.
+    and ends on any of the single_copy_numbers. If the segment's positions in the path are already
+    known, they can be given as indices.
     """
     bridge_paths = []
-    indices = [i for i, x in enumerate(path) if abs(x) == segment_num]
+    if indices is None:
+        indices = [i for i, x in enumerate(path) if abs(x) == segment_num]
     for index in indices:
         bridge_path = [path[index]]
         for i in range(index + 1, len(path)):
@@ -0,0 +1,150 @@
+"""
+Copyright 2017 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Unicycler
+
+This module contains a class which keeps track of an assembly graph's connected components as the
+graph changes, so they don't have to be found from scratch each time.
+
+This file is part of Unicycler. Unicycler is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Unicycler is distributed in
+the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Unicycler. If
+not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+class ComponentTracker(object):
+    """
+    Holds each segment's component id and each component's segments (unsigned segment numbers).
+
+    Adding a link joins two components (the smaller is merged into the larger, like union by
+    size), which is cheap. Removing a link or a segment might split a component, so the component
+    is just marked as dirty. Dirty components are split up (by a search of only that component)
+    the next time the components are needed.
+    """
+    __slots__ = ['component_of', 'members', 'dirty', 'next_id', 'sorted_members', 'order']
+
+    def __init__(self, components):
+        self.component_of = {}
+        self.members = {}
+        self.dirty = set()
+        self.next_id = 0
+        self.sorted_members = {}  # component id -> sorted tuple of its segments (cached)
+        self.order = None  # cached component ids in get_components order
+        for component in components:
+            self.new_component(component)
+
+    def new_component(self, seg_nums):
+        component_id = self.next_id
+        self.next_id += 1
+        self.members[component_id] = set(seg_nums)
+        for seg_num in seg_nums:
+            self.component_of[seg_num] = component_id
+        self.order = None
+        return component_id
+
+    def changed(self, component_id):
+        self.sorted_members.pop(component_id, None)
+        self.order = None
+
+    def add_segment(self, seg_num):
+        if seg_num not in self.component_of:
+            self.new_component([seg_num])
+
+    def segment_removed(self, seg_num):
+        component_id = self.component_of.pop(seg_num, None)
+        if component_id is None:
+            return
+        component = self.members[component_id]
+        component.discard(seg_num)
+        if component:
+            self.dirty.add(component_id)
+        else:
+            del self.members[component_id]
+            self.dirty.discard(component_id)
+        self.changed(component_id)
+
+    def link_added(self, start, end):
+        seg_num_1, seg_num_2 = abs(start), abs(end)
+        self.add_segment(seg_num_1)
+        self.add_segment(seg_num_2)
+        id_1, id_2 = self.component_of[seg_num_1], self.component_of[seg_num_2]
+        if id_1 == id_2:
+            return
+        if len(self.members[id_1]) < len(self.members[id_2]):
+            id_1, id_2 = id_2, id_1
+        smaller = self.members.pop(id_2)
+        for seg_num in smaller:
+            self.component_of[seg_num] = id_1
+        self.members[id_1].update(smaller)
+        if id_2 in self.dirty:
+            self.dirty.discard(id_2)
+            self.dirty.add(id_1)
+        self.changed(id_1)
+        self.changed(id_2)
+
+    def link_removed(self, start, end):
+        for seg_num in (abs(start), abs(end)):
+            component_id = self.component_of.get(seg_num)
+            if component_id is not None:
+                self.dirty.add(component_id)
+                return
+
+    def sync_segments(self, segments):
+        """
+        Segments are removed through the graph (which tells the tracker) and get into the tracker
+        when they are linked, but a new segment with no links is never seen. So if the counts
+        don't match, this adds (and removes) segments to match the graph.
+        """
+        if len(self.component_of) == len(segments):
+            return
+        for seg_num in [x for x in self.component_of if x not in segments]:
+            self.segment_removed(seg_num)
+        for seg_num in segments:
+            self.add_segment(seg_num)
+
+    def split_dirty_components(self, get_connected_segments):
+        """
+        Searches each dirty component (using the graph's links) and replaces it with the one or
+        more components it now consists of.
+        """
+        for component_id in self.dirty:
+            self.changed(component_id)
+            remaining = self.members.pop(component_id)
+            while remaining:
+                start = remaining.pop()
+                piece = [start]
+                for seg_num in piece:
+                    for connected_seg_num in get_connected_segments(seg_num):
+                        if connected_seg_num in remaining:
+                            remaining.discard(connected_seg_num)
+                            piece.append(connected_seg_num)
+                self.new_component(piece)
+        self.dirty = set()
+
+    def get_components(self):
+        """
+        Returns the components in the same form as AssemblyGraph.get_connected_components: a
+        sorted list of sorted lists. There must be no dirty components.
+
+        Each component's sorted segments are cached, so only changed components need sorting. And
+        since components don't overlap, sorting the components only needs their first segments.
+        """
+        assert not self.dirty
+        sorted_members = self.sorted_members
+        for component_id, component in self.members.items():
+            if component_id not in sorted_members:
+                sorted_members[component_id] = tuple(sorted(component))
+        if self.order is None:
+            self.order = sorted(self.members, key=lambda x: sorted_members[x][0])
+        return [list(sorted_members[x]) for x in self.order]
+
+    def get_component(self, seg_num):
+        """
+        Returns the segment numbers in the component containing the given segment, as a set. There
+        must be no dirty components.
+        """
+        assert not self.dirty
+        return self.members[self.component_of[abs(seg_num)]]
@@ -15,8 +15,9 @@ not, see <http://www.gnu.org/licenses/>.
 """
 
 import os
+from array import array
 from ctypes import CDLL, cast, c_char_p, c_int, c_uint, c_ulong, c_double, c_void_p, c_bool, \
-    c_float, POINTER
+    c_float, c_uint32, POINTER, Structure, byref, sizeof, string_at
 from .misc import quit_with_error
 
 
@@ -29,6 +30,74 @@ C_LIB = CDLL(SO_FILE_FULL)
 
 
 
+# The alignment functions return their results in these structs (AlignmentResult and
+# AlignmentResults in scoredalignment.h), not in strings which would need parsing.
+class CAlignmentResult(Structure):
+    _fields_ = [('ref_name', c_char_p),
+                ('rev_comp', c_int),
+                ('read_start_pos', c_int),
+                ('read_end_pos', c_int),
+                ('ref_start_pos', c_int),
+                ('ref_end_pos', c_int),
+                ('raw_score', c_int),
+                ('scaled_score', c_double),
+                ('milliseconds', c_int),
+                ('cigar_length', c_int),
+                ('cigar', POINTER(c_uint32))]
+
+
+class CAlignmentResults(Structure):
+    _fields_ = [('count', c_int),
+                ('alignments', POINTER(CAlignmentResult)),
+                ('output', c_char_p)]
+
+
+class AlignmentResult(object):
+    """
+    This class holds the results of one C++ alignment. The CIGAR is an array of packed parts, as
+    in the BAM format: each part's length is in the upper 28 bits and its operation code (an index
+    into 'MIDNSHP=X') is in the lower four bits.
+    """
+    __slots__ = ['ref_name', 'rev_comp', 'read_start_pos', 'read_end_pos', 'ref_start_pos',
+                 'ref_end_pos', 'raw_score', 'scaled_score', 'milliseconds', 'cigar']
+
+    def __init__(self, c_result):
+        self.ref_name = c_result.ref_name.decode()
+        self.rev_comp = bool(c_result.rev_comp)
+        self.read_start_pos = c_result.read_start_pos
+        self.read_end_pos = c_result.read_end_pos
+        self.ref_start_pos = c_result.ref_start_pos
+        self.ref_end_pos = c_result.ref_end_pos
+        self.raw_score = c_result.raw_score
+        self.scaled_score = c_result.scaled_score
+        self.milliseconds = c_result.milliseconds
+
+        # The CIGAR is copied in one go, as the C++ memory is freed after this.
+        self.cigar = array('I')
+        if c_result.cigar_length:
+            self.cigar.frombytes(string_at(c_result.cigar,
+                                           c_result.cigar_length * sizeof(c_uint32)))
+
+
+C_LIB.freeAlignmentResult.argtypes = [POINTER(CAlignmentResult)]
+C_LIB.freeAlignmentResult.restype = None
+
+C_LIB.freeAlignmentResults.argtypes = [POINTER(CAlignmentResults)]
+C_LIB.freeAlignmentResults.restype = None
+
+def c_alignment_result_to_python(c_result_ptr):
+    """
+    This function copies a C++ alignment result to an AlignmentResult (or None if the alignment
+    failed) and then deletes the C++ result from the heap.
+    """
+    if not c_result_ptr:
+        return None
+    result = AlignmentResult(c_result_ptr.contents)
+    C_LIB.freeAlignmentResult(c_result_ptr)
+    return result
+
+
+
 # This is the big semi-global C++ Seqan alignment function at the heart of the aligner.
 C_LIB.semiGlobalAlignment.argtypes = [c_char_p,  # Read name
                                       c_char_p,  # Read sequence
@@ -42,7 +111,7 @@ C_LIB.semiGlobalAlignment.argtypes = [c_char_p,  # Read name
                                       c_double,  # Low score threshold
                                       c_bool,    # Return bad alignments
                                       c_int]     # Sensitivity level
-C_LIB.semiGlobalAlignment.restype = c_void_p     # String describing alignments
+C_LIB.semiGlobalAlignment.restype = POINTER(CAlignmentResults)  # Alignments and output
 
 def semi_global_alignment(read_name, read_sequence, verbosity, minimap_alignments_str,
                           kmer_positions_ptr, match_score, mismatch_score, gap_open_score,
@@ -52,7 +121,11 @@ def semi_global_alignment(read_name, read_sequence, verbosity, minimap_alignment
                                     kmer_positions_ptr, match_score, mismatch_score,
                                     gap_open_score, gap_extend_score, low_score_threshold,
                                     keep_bad, sensitivity_level)
-    return c_string_to_python_string(ptr)
+    c_results = ptr.contents
+    alignments = [AlignmentResult(c_results.alignments[i]) for i in range(c_results.count)]
+    output = c_results.output.decode()
+    C_LIB.freeAlignmentResults(ptr)
+    return alignments, output
 
 
 
@@ -64,14 +137,14 @@ C_LIB.semiGlobalAlignmentExhaustive.argtypes = [c_char_p,  # Sequence 1
                                                 c_int,  # Mismatch score
                                                 c_int,  # Gap open score
                                                 c_int]  # Gap extension score
-C_LIB.semiGlobalAlignmentExhaustive.restype = c_void_p  # String describing alignment
+C_LIB.semiGlobalAlignmentExhaustive.restype = POINTER(CAlignmentResult)
 
 def semi_global_alignment_exhaustive(sequence_1, sequence_2, scoring_scheme):
     ptr = C_LIB.semiGlobalAlignmentExhaustive(sequence_1.encode('utf-8'),
                                               sequence_2.encode('utf-8'),
                                               scoring_scheme.match, scoring_scheme.mismatch,
                                               scoring_scheme.gap_open, scoring_scheme.gap_extend)
-    return c_string_to_python_string(ptr)
+    return c_alignment_result_to_python(ptr)
 
 
 
@@ -85,14 +158,14 @@ C_LIB.fullyGlobalAlignment.argtypes = [c_char_p,  # Sequence 1
                                        c_int,  # Gap extension score
                                        c_bool,  # Use banding
                                        c_int]  # Band size
-C_LIB.fullyGlobalAlignment.restype = c_void_p  # String describing alignment
+C_LIB.fullyGlobalAlignment.restype = POINTER(CAlignmentResult)
 
 def fully_global_alignment(sequence_1, sequence_2, scoring_scheme, use_banding, band_size):
     ptr = C_LIB.fullyGlobalAlignment(sequence_1.encode('utf-8'), sequence_2.encode('utf-8'),
                                      scoring_scheme.match, scoring_scheme.mismatch,
                                      scoring_scheme.gap_open, scoring_scheme.gap_extend,
                                      use_banding, band_size)
-    return c_string_to_python_string(ptr)
+    return c_alignment_result_to_python(ptr)
 
 
 
@@ -107,14 +180,14 @@ C_LIB.pathAlignment.argtypes = [c_char_p,  # Sequence 1
                                 c_int,  # Gap extension score
                                 c_bool,  # Use banding
                                 c_int]  # Band size
-C_LIB.pathAlignment.restype = c_void_p  # String describing alignment
+C_LIB.pathAlignment.restype = POINTER(CAlignmentResult)
 
 def path_alignment(partial_seq, full_seq, scoring_scheme, use_banding, band_size):
     ptr = C_LIB.pathAlignment(partial_seq.encode('utf-8'), full_seq.encode('utf-8'),
                               scoring_scheme.match, scoring_scheme.mismatch,
                               scoring_scheme.gap_open, scoring_scheme.gap_extend,
                               use_banding, band_size)
-    return c_string_to_python_string(ptr)
+    return c_alignment_result_to_python(ptr)
 
 
 
@@ -251,22 +324,36 @@ def consensus_alignment(sequences, qualities, scoring_scheme, bandwidth=1000):
 
 
 # These functions conduct a minimap alignment between reads and reference.
-C_LIB.minimapAlignReads.argtypes = [c_char_p,  # Reference FASTA filename
-                                    c_char_p,  # Reads FASTQ filename
-                                    c_int,     # Threads
-                                    c_int,     # Sensitivity level
-                                    c_int]     # Settings preset
-C_LIB.minimapAlignReads.restype = c_void_p     # String describing alignments
+C_LIB.minimapAlignReads.argtypes = [c_char_p,          # Reference FASTA filename
+                                    c_char_p,          # Reads FASTQ filename
+                                    c_int,             # Threads
+                                    c_int,             # Sensitivity level
+                                    c_int,             # Settings preset
+                                    c_int,             # Read rename count
+                                    POINTER(c_int),    # Indices (in file) of renamed reads
+                                    POINTER(c_char_p)] # New names of renamed reads
+C_LIB.minimapAlignReads.restype = c_void_p             # String describing alignments
 
 def minimap_align_reads(reference_fasta, reads_fastq, threads, sensitivity_level,
-                        preset_name='default'):
+                        preset_name='default', read_renames=None):
+    """
+    The optional read_renames dictionary (key = read's index in reads_fastq, value = new name) is
+    used to rename reads as minimap loads them, e.g. to give reads with duplicate names the unique
+    names they have in Unicycler.
+    """
     preset = 0  # default
     if preset_name == 'read vs read':
         preset = 1
     elif preset_name == 'find contigs':
         preset = 2
+    if not read_renames:
+        read_renames = {}
+    rename_indices = (c_int * len(read_renames))(*read_renames.keys())
+    rename_names = (c_char_p * len(read_renames))(*(x.encode('utf-8')
+                                                     for x in read_renames.values()))
     ptr = C_LIB.minimapAlignReads(reference_fasta.encode('utf-8'), reads_fastq.encode('utf-8'),
-                                  threads, sensitivity_level, preset)
+                                  threads, sensitivity_level, preset, len(read_renames),
+                                  rename_indices, rename_names)
     return c_string_to_python_string(ptr)
 
 C_LIB.minimapAlignReadsWithSettings.argtypes = [c_char_p,  # Reference FASTA filename
@@ -314,15 +401,18 @@ C_LIB.overlapAlignment.argtypes = [c_char_p,  # Sequence 1
                                    c_int,     # Mismatch score
                                    c_int,     # Gap open score
                                    c_int,     # Gap extension score
-                                   c_int]     # Guess overlap
-C_LIB.overlapAlignment.restype = c_void_p     # String describing alignment
+                                   c_int,     # Guess overlap
+                                   POINTER(c_int),  # Overlap 1 (filled in by the function)
+                                   POINTER(c_int)]  # Overlap 2 (filled in by the function)
+C_LIB.overlapAlignment.restype = None
 
 def overlap_alignment(sequence_1, sequence_2, scoring_scheme, guess_overlap):
-    ptr = C_LIB.overlapAlignment(sequence_1.encode('utf-8'), sequence_2.encode('utf-8'),
-                                 scoring_scheme.match, scoring_scheme.mismatch,
-                                 scoring_scheme.gap_open, scoring_scheme.gap_extend, guess_overlap)
-    result = c_string_to_python_string(ptr)
-    return (int(x) for x in result.split(','))
+    overlap_1, overlap_2 = c_int(), c_int()
+    C_LIB.overlapAlignment(sequence_1.encode('utf-8'), sequence_2.encode('utf-8'),
+                           scoring_scheme.match, scoring_scheme.mismatch,
+                           scoring_scheme.gap_open, scoring_scheme.gap_extend, guess_overlap,
+                           byref(overlap_1), byref(overlap_2))
+    return overlap_1.value, overlap_2.value
 
 
 # When s1 is expected to be at the start of s2, this function will align them to give the s2
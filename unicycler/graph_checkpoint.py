@@ -0,0 +1,275 @@
+"""
+Copyright 2017 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Unicycler
+
+This module contains a compact binary checkpoint format for assembly graphs, so a pipeline stage
+can save a graph and a later run can resume from it with its full state (copy depths, bridges,
+original-depth flags, etc.), without the cost and losses of a GFA round trip.
+
+This file is part of Unicycler. Unicycler is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Unicycler is distributed in
+the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Unicycler. If
+not, see <http://www.gnu.org/licenses/>.
+"""
+
+import itertools
+import json
+import os
+import struct
+import sys
+from array import array
+from operator import attrgetter
+
+from .assembly_graph_segment import Segment
+from .bridge_long_read import LongReadBridge
+from .bridge_spades_contig import SpadesContigBridge
+from .bridge_loop_unroll import LoopUnrollingBridge
+from .bridge_long_read_simple import SimpleLongReadBridge
+from .bridge_miniasm import MiniasmBridge
+
+CHECKPOINT_MAGIC = b'UNICYCLER_GRAPH\n'
+CHECKPOINT_VERSION = 1
+HEADER_STRUCT = struct.Struct('<IQ')  # version, header length
+
+BRIDGE_TYPES = {x.__name__: x for x in [LongReadBridge, SpadesContigBridge, LoopUnrollingBridge,
+                                        SimpleLongReadBridge, MiniasmBridge]}
+
+
+class BadCheckpoint(Exception):
+    pass
+
+
+def save_graph_checkpoint(graph, filename, metadata=None):
+    """
+    Saves the graph to a checkpoint file. The file starts with a magic string, the format version
+    and a JSON header (the graph's scalar values, the bridges, any metadata given and the layout
+    of the sections). The rest of the file is the sections: flat arrays of the segments, links,
+    copy depths and paths, with all segment sequences in a single blob.
+
+    The file is written under a temporary name and then renamed, so a checkpoint is never left
+    half-written.
+    """
+    sections = []
+
+    def add_section(name, values):
+        sections.append((name, values))
+
+    # Built with map/itertools where possible, as per-item Python code would dominate the time.
+    segments = list(graph.segments.values())
+    sequences = list(map(attrgetter('forward_bytes'), segments))
+    add_section('seg_nums', array('q', map(attrgetter('number'), segments)))
+    add_section('depths', array('d', map(attrgetter('depth'), segments)))
+    add_section('original_depths', array('B', map(bool, map(attrgetter('original_depth'),
+                                                            segments))))
+    add_section('seq_ends', array('Q', itertools.accumulate(map(len, sequences))))
+    add_section('sequences', b''.join(sequences))
+
+    # Bridges are stored in the header and segments refer to them by index (-1 for no bridge).
+    bridges, bridge_indices, seg_bridges = [], {}, array('q')
+    for segment in segments:
+        if segment.bridge is None:
+            seg_bridges.append(-1)
+            continue
+        bridge_index = bridge_indices.get(id(segment.bridge))
+        if bridge_index is None:
+            bridge_index = len(bridges)
+            bridge_indices[id(segment.bridge)] = bridge_index
+            bridges.append(bridge_to_record(segment.bridge))
+        seg_bridges.append(bridge_index)
+    add_section('seg_bridges', seg_bridges)
+    add_section('graph_path_lengths',
+                array('q', [-1 if x.graph_path is None else len(x.graph_path) for x in segments]))
+    add_section('graph_paths', array('q', itertools.chain.from_iterable(
+        x.graph_path for x in segments if x.graph_path)))
+    used_in_bridges = {str(i): x.used_in_bridges for i, x in enumerate(segments)
+                       if x.used_in_bridges}
+
+    for name, lists, typecode in [('forward_links', graph.forward_links, 'q'),
+                                  ('reverse_links', graph.reverse_links, 'q'),
+                                  ('copy_depths', graph.copy_depths, 'd'),
+                                  ('paths', graph.paths, 'q')]:
+        keys = list(lists.keys())
+        if name != 'paths':  # path names are strings, so they go in the header
+            add_section(name + '_keys', array('q', keys))
+        values = list(map(lists.__getitem__, keys))
+        add_section(name + '_ends', array('Q', itertools.accumulate(map(len, values))))
+        add_section(name, array(typecode, itertools.chain.from_iterable(values)))
+    add_section('multiplicity_segs', array('q', graph.manual_multiplicity.keys()))
+    add_section('multiplicities', array('q', graph.manual_multiplicity.values()))
+    path_names = list(graph.paths.keys())
+
+    header = {'byteorder': sys.byteorder,
+              'metadata': metadata if metadata is not None else {},
+              'overlap': graph.overlap,
+              'insert_size_mean': graph.insert_size_mean,
+              'insert_size_deviation': graph.insert_size_deviation,
+              'bridges': bridges,
+              'used_in_bridges': used_in_bridges,
+              'path_names': path_names,
+              'sections': [[name, values.typecode if isinstance(values, array) else 'blob',
+                            len(values)] for name, values in sections]}
+    header_bytes = json.dumps(header, separators=(',', ':')).encode()
+
+    temp_filename = filename + '.tmp'
+    with open(temp_filename, 'wb') as checkpoint:
+        checkpoint.write(CHECKPOINT_MAGIC)
+        checkpoint.write(HEADER_STRUCT.pack(CHECKPOINT_VERSION, len(header_bytes)))
+        checkpoint.write(header_bytes)
+        for _, values in sections:
+            checkpoint.write(values)
+    os.replace(temp_filename, filename)
+
+
+def load_graph_checkpoint(graph, filename):
+    """
+    Loads a checkpoint file (made by save_graph_checkpoint) into an empty graph. Returns the
+    checkpoint's metadata.
+    """
+    with open(filename, 'rb') as checkpoint:
+        data = memoryview(checkpoint.read())
+    header, position = read_header(data, filename)
+
+    sections = {}
+    for name, typecode, count in header['sections']:
+        values = None if typecode == 'blob' else array(typecode)
+        size = count if values is None else count * values.itemsize
+        if position + size > len(data):
+            raise BadCheckpoint(filename + ' is truncated')
+        if values is None:
+            sections[name] = data[position:position + size]
+            position += size
+            continue
+        values.frombytes(data[position:position + size])
+        if header['byteorder'] != sys.byteorder:
+            values.byteswap()
+        sections[name] = values
+        position += size
+    if position != len(data):
+        raise BadCheckpoint(filename + ' is truncated or has trailing data')
+
+    graph.overlap = header['overlap']
+    graph.insert_size_mean = header['insert_size_mean']
+    graph.insert_size_deviation = header['insert_size_deviation']
+
+    # Bridge segments are rare, so their bridges and graph paths are filled in afterwards.
+    seg_nums = sections['seg_nums'].tolist()
+    seq_ends = sections['seq_ends'].tolist()
+    sequences = map(bytes(sections['sequences']).__getitem__,
+                    map(slice, itertools.chain([0], seq_ends), seq_ends))
+    segments = dict(zip(seg_nums, map(Segment, seg_nums, sections['depths'].tolist(), sequences,
+                                      itertools.repeat(True), itertools.repeat(None),
+                                      itertools.repeat(None),
+                                      map(bool, sections['original_depths']))))
+    bridges = [record_to_bridge(x, graph) for x in header['bridges']]
+    graph_paths = sections['graph_paths'].tolist()
+    graph_path_start = 0
+    for i, graph_path_length in enumerate(sections['graph_path_lengths']):
+        if graph_path_length >= 0:
+            segment = segments[seg_nums[i]]
+            segment.graph_path = graph_paths[graph_path_start:graph_path_start + graph_path_length]
+            graph_path_start += graph_path_length
+    for i, seg_bridge in enumerate(sections['seg_bridges']):
+        if seg_bridge >= 0:
+            segments[seg_nums[i]].bridge = bridges[seg_bridge]
+    for i, used_in_bridges in header['used_in_bridges'].items():
+        segments[seg_nums[int(i)]].used_in_bridges = used_in_bridges
+    graph.segments = segments
+
+    graph.forward_links = split_into_lists(sections['forward_links_keys'],
+                                           sections['forward_links_ends'],
+                                           sections['forward_links'])
+    graph.reverse_links = split_into_lists(sections['reverse_links_keys'],
+                                           sections['reverse_links_ends'],
+                                           sections['reverse_links'])
+    graph.copy_depths = split_into_lists(sections['copy_depths_keys'],
+                                         sections['copy_depths_ends'], sections['copy_depths'])
+    graph.manual_multiplicity = dict(zip(sections['multiplicity_segs'].tolist(),
+                                         sections['multiplicities'].tolist()))
+    graph.paths = split_into_lists(header['path_names'], sections['paths_ends'],
+                                   sections['paths'])
+    return header['metadata']
+
+
+def load_checkpoint_metadata(filename):
+    """
+    Returns a checkpoint's metadata without loading the graph.
+    """
+    with open(filename, 'rb') as checkpoint:
+        data = checkpoint.read(len(CHECKPOINT_MAGIC) + HEADER_STRUCT.size)
+        if len(data) == len(CHECKPOINT_MAGIC) + HEADER_STRUCT.size:
+            header_length = HEADER_STRUCT.unpack_from(data, len(CHECKPOINT_MAGIC))[1]
+            data += checkpoint.read(header_length)
+    return read_header(data, filename)[0]['metadata']
+
+
+def read_header(data, filename):
+    """
+    Checks the magic string and version and returns the JSON header and the position of the first
+    section.
+    """
+    if bytes(data[:len(CHECKPOINT_MAGIC)]) != CHECKPOINT_MAGIC:
+        raise BadCheckpoint(filename + ' is not a Unicycler graph checkpoint')
+    position = len(CHECKPOINT_MAGIC)
+    try:
+        version, header_length = HEADER_STRUCT.unpack_from(data, position)
+    except struct.error:
+        raise BadCheckpoint(filename + ' is truncated')
+    if version != CHECKPOINT_VERSION:
+        raise BadCheckpoint(filename + ' is checkpoint version ' + str(version) +
+                            ' (expected version ' + str(CHECKPOINT_VERSION) + ')')
+    position += HEADER_STRUCT.size
+    try:
+        header = json.loads(bytes(data[position:position + header_length]).decode())
+    except ValueError:
+        raise BadCheckpoint(filename + ' has a damaged header')
+    return header, position + header_length
+
+
+def split_into_lists(keys, ends, values):
+    """
+    Turns the keys, cumulative end positions and flat values of a section back into a dict of
+    key -> list.
+    """
+    ends = ends.tolist()
+    slices = map(slice, itertools.chain([0], ends), ends)
+    return dict(zip(keys, map(values.tolist().__getitem__, slices)))
+
+
+def bridge_to_record(bridge):
+    """
+    Bridges are stored with their type and their simple attributes (numbers, strings and lists of
+    them). Other attributes, like a long read bridge's reads, are only needed while bridges are
+    being made and are not kept. A reference back to the graph is noted so it can be restored.
+    """
+    attributes = {}
+    for name, value in vars(bridge).items():
+        if name != 'graph' and is_simple_value(value):
+            attributes[name] = value
+    return {'type': type(bridge).__name__, 'has_graph': hasattr(bridge, 'graph'),
+            'attributes': attributes}
+
+
+def record_to_bridge(record, graph):
+    try:
+        bridge_type = BRIDGE_TYPES[record['type']]
+    except KeyError:
+        raise BadCheckpoint('unknown bridge type: ' + record['type'])
+    bridge = bridge_type.__new__(bridge_type)
+    for name, value in record['attributes'].items():
+        setattr(bridge, name, value)
+    if 'segments_reduced_depth' in record['attributes']:
+        bridge.segments_reduced_depth = [tuple(x) for x in bridge.segments_reduced_depth]
+    if record['has_graph']:
+        bridge.graph = graph
+    return bridge
+
+
+def is_simple_value(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return True
+    if isinstance(value, (list, tuple)):
+        return all(is_simple_value(x) for x in value)
+    return False
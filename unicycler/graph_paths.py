@@ -0,0 +1,114 @@
+"""
+Copyright 2017 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Unicycler
+
+This module contains a class for an assembly graph's paths (e.g. the SPAdes contig paths) which
+keeps an index of where each segment occurs, so path updates only need to look at the affected
+paths.
+
+This file is part of Unicycler. Unicycler is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Unicycler is distributed in
+the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Unicycler. If
+not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+class GraphPaths(dict):
+    """
+    A dict of path name -> list of signed segment numbers, which also keeps an inverted index:
+    unsigned segment number -> {path name: positions of that segment in the path}. To keep the
+    index correct, paths must be replaced (paths[name] = new_path) rather than edited in place.
+
+    It also remembers which paths might not be valid in the graph: new paths (which haven't been
+    checked) and paths which contain a segment that has lost a link. The graph checks these when it
+    next removes segments from the paths, so it doesn't have to check every path each time.
+    """
+
+    def __init__(self, paths=None):
+        super(GraphPaths, self).__init__()
+        self.segment_index = {}
+        self.unchecked = set()
+        if paths:
+            self.update(paths)
+
+    def __reduce__(self):
+        # Rebuild the index when copied or pickled.
+        return GraphPaths, (dict(self),)
+
+    def __setitem__(self, name, path):
+        if name in self:
+            self.remove_from_index(name, self[name])
+        super(GraphPaths, self).__setitem__(name, path)
+        for i, seg_num in enumerate(path):
+            self.segment_index.setdefault(abs(seg_num), {}).setdefault(name, []).append(i)
+        self.unchecked.add(name)
+
+    def __delitem__(self, name):
+        self.remove_from_index(name, self[name])
+        super(GraphPaths, self).__delitem__(name)
+        self.unchecked.discard(name)
+
+    def remove_from_index(self, name, path):
+        for seg_num in set(abs(x) for x in path):
+            segment_paths = self.segment_index[seg_num]
+            del segment_paths[name]
+            if not segment_paths:
+                del self.segment_index[seg_num]
+
+    def pop(self, name, *default):
+        if name not in self:
+            if default:
+                return default[0]
+            raise KeyError(name)
+        path = self[name]
+        del self[name]
+        return path
+
+    def popitem(self):
+        name, path = super(GraphPaths, self).popitem()
+        self.remove_from_index(name, path)
+        self.unchecked.discard(name)
+        return name, path
+
+    def setdefault(self, name, default=None):
+        if name not in self:
+            self[name] = default
+        return self[name]
+
+    def update(self, *args, **kwargs):
+        for name, path in dict(*args, **kwargs).items():
+            self[name] = path
+
+    def clear(self):
+        super(GraphPaths, self).clear()
+        self.segment_index = {}
+        self.unchecked = set()
+
+    def copy(self):
+        return GraphPaths(self)
+
+    def get_positions(self, seg_num):
+        """
+        Returns a dict of path name -> positions for the paths which contain the segment (in
+        either orientation).
+        """
+        return self.segment_index.get(abs(seg_num), {})
+
+    def get_path_names(self, seg_nums):
+        """
+        Returns the set of path names for the paths which contain any of the segments.
+        """
+        names = set()
+        for seg_num in seg_nums:
+            names.update(self.segment_index.get(abs(seg_num), ()))
+        return names
+
+    def link_removed(self, start):
+        """
+        Marks the paths which might have used a removed link as needing a check. A path can only
+        use the link (or its reverse complement) if it contains the link's start segment.
+        """
+        self.unchecked.update(self.segment_index.get(abs(start), ()))
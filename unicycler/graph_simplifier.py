@@ -0,0 +1,323 @@
+"""
+Copyright 2017 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Unicycler
+
+This module contains a worklist engine for the graph cleaning passes (repairing multi-way
+junctions, removing unnecessary links, expanding repeats, removing zero-length segments and merging
+small segments). Each pass gives the same result as the AssemblyGraph method of the same name, but
+only looks at segments near where the graph has changed since the pass last ran.
+
+This file is part of Unicycler. Unicycler is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Unicycler is distributed in
+the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Unicycler. If
+not, see <http://www.gnu.org/licenses/>.
+"""
+
+import heapq
+
+
+class GraphSimplifier(object):
+    """
+    Runs the cleaning passes on a graph, with one Worklist per pass. The graph tells the simplifier
+    about each link change (see AssemblyGraph.add_link and remove_link) and the passes report
+    sequence changes, and each makes the keys near it dirty in every pass that depends on them:
+      * remove_zero_length_segs looks at a segment's own length and links, so a change only makes
+        its own segments dirty.
+      * remove_unnecessary_links, expand_repeats and merge_small_segments look at a segment's
+        neighbours too, so a change also makes the segments connected to its segments dirty.
+      * repair_multi_way_junctions looks at whole junction groups, which are handled separately
+        (see JunctionGroup).
+
+    A pass (apart from merge_small_segments, which restarts after each merge) sweeps over its
+    dirty keys in the same order as the full pass would, so the graph ends up the same. The
+    simplifier should be detached once cleaning is done, so the graph stops reporting changes.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.segment_indices = {}  # seg num -> (position in graph.segments, Segment)
+        self.next_index = 0
+        for seg_num in graph.segments:
+            self.add_segment(seg_num)
+
+        signed_seg_nums = list(graph.segments) + [-x for x in graph.segments]
+        self.junctions = Worklist(signed_seg_nums, self.signed_rank)
+        self.junction_groups = {}  # signed seg num -> JunctionGroup from its last examination
+        self.examined = None  # signed seg nums examined in the current junction sweep
+        self.step = 0
+        self.unnecessary_links = Worklist(signed_seg_nums, self.signed_rank)
+        self.repeats = Worklist(graph.segments, abs)
+        self.zero_length_segs = Worklist(graph.segments, abs)
+        self.small_segs = Worklist(graph.segments, abs)
+        graph.simplifier = self
+
+    def detach(self):
+        if self.graph.simplifier is self:
+            self.graph.simplifier = None
+
+    def add_segment(self, seg_num):
+        self.segment_indices[seg_num] = (self.next_index, self.graph.segments[seg_num])
+        self.next_index += 1
+
+    def signed_rank(self, seg_num):
+        """
+        Gives signed segment numbers the order used by the passes which look at both strands:
+        positive numbers in the graph's segment order, then negative numbers in the same order.
+        """
+        return seg_num < 0, self.segment_indices[abs(seg_num)][0]
+
+    def is_eligible_for_sweep(self):
+        """
+        Returns a function which says whether a key's segment was in the graph when the sweep
+        started (a full pass only looks at the segments that were there when it started).
+        """
+        segments = self.graph.segments
+        segment_indices = self.segment_indices
+        limit = self.next_index
+
+        def eligible(seg_num):
+            seg_num = abs(seg_num)
+            seg_index = segment_indices.get(seg_num)
+            return seg_index is not None and seg_index[0] < limit and \
+                segments.get(seg_num) is seg_index[1]
+        return eligible
+
+    def link_changed(self, start, end):
+        self.junction_link_changed(start, end)
+        seg_nums = {abs(start), abs(end)}
+        for seg_num in seg_nums:
+            self.zero_length_segs.add(seg_num)
+        nearby_seg_nums = set(seg_nums)
+        for seg_num in seg_nums:
+            nearby_seg_nums.update(self.graph.get_connected_segments(seg_num))
+        self.nearby_segments_changed(nearby_seg_nums)
+
+    def sequences_changed(self, seg_nums):
+        nearby_seg_nums = set(seg_nums)
+        for seg_num in seg_nums:
+            self.zero_length_segs.add(seg_num)
+            nearby_seg_nums.update(self.graph.get_connected_segments(seg_num))
+        self.nearby_segments_changed(nearby_seg_nums)
+
+    def nearby_segments_changed(self, seg_nums):
+        for seg_num in seg_nums:
+            self.unnecessary_links.add(seg_num)
+            self.unnecessary_links.add(-seg_num)
+            self.repeats.add(seg_num)
+            self.small_segs.add(seg_num)
+
+    def junction_link_changed(self, start, end):
+        """
+        A link from start to end changes the downstream segments of start and -end, so their
+        junction groups (as a whole) need another look.
+        """
+        for seg_num in (start, -end):
+            self.junctions.add(seg_num)
+            group = self.junction_groups.get(seg_num)
+            if group is None or (group.dirty and group.step == self.step):
+                continue
+            if not group.dirty:
+                group.dirty = True
+
+                # In a full pass, a clean group which is earlier in the sweep was looked at
+                # (unchanged) when the pass got to it, so its segments were skipped from then on.
+                if self.examined is not None and group.min_rank < self.junctions.current:
+                    self.examined.update(group.seg_nums)
+            group.step = self.step
+            for group_seg_num in group.seg_nums:
+                self.junctions.add(group_seg_num)
+
+    def repair_multi_way_junctions(self):
+        """
+        Does the same as AssemblyGraph.repair_multi_way_junctions, but only for dirty junction
+        groups.
+
+        A full pass skips segments which were in an earlier junction group, so for this to give the
+        same result, a junction group has to be dirty or clean as a whole. So if any of a group's
+        segments are waiting for the next sweep, they all wait.
+        """
+        graph = self.graph
+        worklist = self.junctions
+        worklist.start_sweep(self.is_eligible_for_sweep())
+        self.examined = set()
+        new_seg_nums = []
+        next_seg_num = None
+        while True:
+            self.step += 1
+            seg_num = worklist.pop()
+            if seg_num is None:
+                break
+            if seg_num in self.examined:
+                worklist.pending.add(seg_num)
+                continue
+            upstream_segs, downstream_segs = graph.get_junction_group(seg_num)
+            group_seg_nums = upstream_segs | {-x for x in downstream_segs}
+            if any(x in worklist.pending for x in group_seg_nums):
+                worklist.pending.update(group_seg_nums)
+            else:
+                group = JunctionGroup(group_seg_nums,
+                                      min(self.signed_rank(x) for x in group_seg_nums))
+                for group_seg_num in group_seg_nums:
+                    self.junction_groups[group_seg_num] = group
+                    worklist.queued.discard(group_seg_num)
+            self.examined.update(group_seg_nums)
+            if len(upstream_segs) >= 2 and len(downstream_segs) >= 2:
+                if next_seg_num is None:
+                    next_seg_num = graph.get_next_available_seg_number()
+                repaired_seg_nums = graph.repair_junction_group(upstream_segs, next_seg_num)
+                next_seg_num += len(repaired_seg_nums)
+                new_seg_nums += repaired_seg_nums
+        worklist.end_sweep()
+        self.examined = None
+        for seg_num in new_seg_nums:
+            self.add_segment(seg_num)
+
+    def remove_unnecessary_links(self):
+        """
+        Does the same as AssemblyGraph.remove_unnecessary_links, but only for dirty segments.
+        """
+        assert self.graph.overlap == 0
+        worklist = self.unnecessary_links
+        worklist.start_sweep(self.is_eligible_for_sweep())
+        while True:
+            seg_num = worklist.pop()
+            if seg_num is None:
+                break
+            self.graph.remove_unnecessary_links_from(seg_num)
+        worklist.end_sweep()
+
+    def expand_repeats(self):
+        """
+        Does the same as AssemblyGraph.expand_repeats, but only for dirty segments.
+        """
+        worklist = self.repeats
+        worklist.start_sweep(self.is_eligible_for_sweep())
+        while True:
+            seg_num = worklist.pop()
+            if seg_num is None:
+                break
+            self.sequences_changed(self.graph.expand_repeat(seg_num))
+        worklist.end_sweep()
+
+    def remove_zero_length_segs(self, suppress_log=False):
+        """
+        Does the same as AssemblyGraph.remove_zero_length_segs, but only for dirty segments.
+        """
+        worklist = self.zero_length_segs
+        worklist.start_sweep(self.is_eligible_for_sweep())
+        segs_to_remove = []
+        while True:
+            seg_num = worklist.pop()
+            if seg_num is None:
+                break
+            if self.graph.bypass_zero_length_seg(seg_num):
+                segs_to_remove.append(seg_num)
+        worklist.end_sweep()
+        self.graph.finish_removing_zero_length_segs(segs_to_remove, suppress_log)
+        return len(segs_to_remove)
+
+    def merge_small_segments(self, max_merge_size):
+        """
+        Does the same as AssemblyGraph.merge_small_segments, but only for dirty segments. That
+        method starts again from the first segment after each merge, so here the sweep goes back to
+        the start too: the next merge is the first dirty segment which can be merged.
+        """
+        assert self.graph.overlap == 0
+        worklist = self.small_segs
+        worklist.start_sweep(self.is_eligible_for_sweep())
+        merged_seg_nums = []
+        while True:
+            seg_num = worklist.pop()
+            if seg_num is None:
+                break
+            if self.graph.merge_small_segment(seg_num, max_merge_size):
+                merged_seg_nums.append(seg_num)
+                changed_seg_nums = [seg_num] + self.graph.get_connected_segments(seg_num)
+                self.sequences_changed(changed_seg_nums)
+                worklist.restart()
+                self.remove_zero_length_segs(suppress_log=True)
+        worklist.end_sweep()
+        self.graph.finish_merging_small_segments(merged_seg_nums)
+        return len(merged_seg_nums)
+
+
+class Worklist(object):
+    """
+    The dirty keys (signed or unsigned segment numbers) for one cleaning pass.
+
+    Keys are looked at in sweeps, in order of rank. During a sweep, a key which becomes dirty is
+    looked at later in the same sweep if it ranks after the current key (a full pass would get to
+    it), otherwise it is pending for the next sweep.
+    """
+    __slots__ = ['rank', 'pending', 'queued', 'heap', 'eligible', 'current']
+
+    def __init__(self, keys, rank):
+        self.rank = rank
+        self.pending = set(keys)
+        self.queued = set()
+        self.heap = []
+        self.eligible = None  # during a sweep: whether a key can be looked at in this sweep
+        self.current = None  # during a sweep: the rank of the current key
+
+    def add(self, key):
+        if self.eligible is not None and self.eligible(key):
+            rank = self.rank(key)
+            if self.current is None or rank > self.current:
+                if key not in self.queued:
+                    self.queued.add(key)
+                    heapq.heappush(self.heap, (rank, key))
+                return
+        self.pending.add(key)
+
+    def start_sweep(self, eligible):
+        self.eligible = eligible
+        self.current = None
+        self.queued = {x for x in self.pending if eligible(x)}
+        self.pending = set()
+        self.heap = [(self.rank(x), x) for x in self.queued]
+        heapq.heapify(self.heap)
+
+    def pop(self):
+        """
+        Returns the next key in the sweep, or None if there are none left.
+        """
+        while self.heap:
+            rank, key = heapq.heappop(self.heap)
+            if key in self.queued:
+                self.queued.discard(key)
+                if self.eligible(key):
+                    self.current = rank
+                    return key
+        return None
+
+    def restart(self):
+        """
+        Goes back to the start of the sweep, so keys which become dirty are looked at in this
+        sweep whatever their rank.
+        """
+        self.current = None
+
+    def end_sweep(self):
+        self.pending.update(self.queued)
+        self.queued = set()
+        self.heap = []
+        self.eligible = None
+        self.current = None
+
+
+class JunctionGroup(object):
+    """
+    The result of looking at a junction group (see AssemblyGraph.get_junction_group): its upstream
+    segments and the negatives of its downstream segments, which all give the same group. It is
+    clean until one of its links changes.
+    """
+    __slots__ = ['seg_nums', 'min_rank', 'dirty', 'step']
+
+    def __init__(self, seg_nums, min_rank):
+        self.seg_nums = seg_nums
+        self.min_rank = min_rank
+        self.dirty = False
+        self.step = None
@@ -0,0 +1,173 @@
+"""
+Copyright 2017 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Unicycler
+
+This module contains a lightweight, read-only snapshot of an assembly graph, used in place of a
+full deep copy when later code needs to look at the graph as it was.
+
+This file is part of Unicycler. Unicycler is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Unicycler is distributed in
+the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Unicycler. If
+not, see <http://www.gnu.org/licenses/>.
+"""
+
+from collections.abc import Mapping
+from .seqops import reverse_complement
+
+
+class GraphSnapshot(object):
+    """
+    A read-only view of a graph at the time the snapshot was taken, with segments, forward_links,
+    reverse_links and overlap like the graph itself.
+
+    Segment depths are copied, but sequences aren't: segments hold their sequences as immutable
+    bytes, so the snapshot just keeps references to them. Links are copy-on-write: the snapshot
+    reads the graph's current links, and the graph hands over the original link lists before it
+    changes them (see AssemblyGraph.add_link and remove_link). Once the snapshot is no longer
+    needed, it should be released so the graph stops doing this.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.overlap = graph.overlap
+        self.segments = SnapshotSegments(graph.segments)
+        self.saved_forward_links = {}
+        self.saved_reverse_links = {}
+        self.forward_links = SnapshotLinks(graph.forward_links, self.saved_forward_links)
+        self.reverse_links = SnapshotLinks(graph.reverse_links, self.saved_reverse_links)
+
+    def save_links(self, start, end):
+        """
+        Called by the graph just before it changes the links between the start and end segments.
+        """
+        graph = self.graph
+        for links, saved, seg_num in ((graph.forward_links, self.saved_forward_links, start),
+                                      (graph.forward_links, self.saved_forward_links, -end),
+                                      (graph.reverse_links, self.saved_reverse_links, end),
+                                      (graph.reverse_links, self.saved_reverse_links, -start)):
+            if seg_num not in saved:
+                saved[seg_num] = list(links[seg_num]) if seg_num in links else None
+
+    def save_all_links(self):
+        """
+        Called by the graph before it changes all of its links at once (e.g. renumbering), so the
+        snapshot no longer depends on the graph's links at all.
+        """
+        graph = self.graph
+        for links, saved in ((graph.forward_links, self.saved_forward_links),
+                             (graph.reverse_links, self.saved_reverse_links)):
+            for seg_num, link_nums in links.items():
+                if seg_num not in saved:
+                    saved[seg_num] = list(link_nums)
+        self.forward_links = {k: v for k, v in self.saved_forward_links.items() if v is not None}
+        self.reverse_links = {k: v for k, v in self.saved_reverse_links.items() if v is not None}
+        self.release()
+
+    def release(self):
+        if self in self.graph.snapshots:
+            self.graph.snapshots.remove(self)
+
+    def get_path_sequence(self, path_segments):
+        # The graph's own methods only use segments, forward_links and overlap, so they work on the
+        # snapshot too.
+        return type(self.graph).get_path_sequence(self, path_segments)
+
+    def get_path_bytes(self, path_segments):
+        return type(self.graph).get_path_bytes(self, path_segments)
+
+
+class SnapshotLinks(Mapping):
+    """
+    A read-only view of one of the graph's link dicts, where saved link lists (None meaning the
+    key wasn't there) take priority over the graph's current ones.
+    """
+
+    def __init__(self, links, saved):
+        self.links = links
+        self.saved = saved
+
+    def __getitem__(self, seg_num):
+        if seg_num in self.saved:
+            link_nums = self.saved[seg_num]
+            if link_nums is None:
+                raise KeyError(seg_num)
+            return link_nums
+        return self.links[seg_num]
+
+    def __contains__(self, seg_num):
+        if seg_num in self.saved:
+            return self.saved[seg_num] is not None
+        return seg_num in self.links
+
+    def __iter__(self):
+        for seg_num in self.links:
+            if seg_num not in self.saved:
+                yield seg_num
+        for seg_num, link_nums in self.saved.items():
+            if link_nums is not None:
+                yield seg_num
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class SnapshotSegments(Mapping):
+    """
+    The graph's segments at the time of the snapshot: segment number -> SnapshotSegment.
+    """
+
+    def __init__(self, segments):
+        self.states = {num: [seg.depth, bytes(seg.forward_bytes), seg.reverse_bytes_cache]
+                       for num, seg in segments.items()}
+
+    def __getitem__(self, seg_num):
+        return SnapshotSegment(seg_num, self.states[seg_num])
+
+    def __contains__(self, seg_num):
+        return seg_num in self.states
+
+    def __iter__(self):
+        return iter(self.states)
+
+    def __len__(self):
+        return len(self.states)
+
+
+class SnapshotSegment(object):
+    """
+    A read-only segment in a snapshot, with the parts of the Segment interface that are needed.
+    """
+    __slots__ = ['number', 'state']
+
+    def __init__(self, number, state):
+        self.number = number
+
+        # [depth, forward bytes, reverse bytes or None], shared with the snapshot
+        self.state = state
+
+    @property
+    def depth(self):
+        return self.state[0]
+
+    @property
+    def forward_bytes(self):
+        return self.state[1]
+
+    def get_reverse_bytes(self):
+        if self.state[2] is None:
+            self.state[2] = reverse_complement(self.state[1])
+        return self.state[2]
+
+    @property
+    def forward_sequence(self):
+        return self.state[1].decode()
+
+    @property
+    def reverse_sequence(self):
+        return self.get_reverse_bytes().decode()
+
+    def get_length(self):
+        return len(self.state[1])
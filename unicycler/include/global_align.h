@@ -21,9 +21,9 @@ using namespace seqan;
 
 // Functions that are called by the Python script must have C linkage, not C++ linkage.
 extern "C" {
-    char * fullyGlobalAlignment(char * s1, char * s2,
-                                int matchScore, int mismatchScore, int gapOpenScore, int gapExtensionScore,
-                                bool useBanding=false, int bandSize=1000);
+    AlignmentResult * fullyGlobalAlignment(char * s1, char * s2,
+                                           int matchScore, int mismatchScore, int gapOpenScore, int gapExtensionScore,
+                                           bool useBanding=false, int bandSize=1000);
 }
 
 
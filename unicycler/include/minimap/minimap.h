@@ -5,6 +5,7 @@
 #include <stdio.h>
 #include <sys/types.h>
 #include <string>
+#include <unordered_map>
 #include "bseq.h"
 
 #define MM_IDX_DEF_B    14
@@ -89,7 +90,10 @@ mm_tbuf_t *mm_tbuf_init(void);
 void mm_tbuf_destroy(mm_tbuf_t *b);
 const mm_reg1_t *mm_map(const mm_idx_t *mi, int l_seq, const char *seq, int *n_regs, mm_tbuf_t *b, const mm_mapopt_t *opt, const char *name);
 
-int mm_map_file(const mm_idx_t *idx, const char *fn, const mm_mapopt_t *opt, int n_threads, int tbatch_size);
+// RRW: query_renames optionally maps query indices (their 0-based order in the file) to new names,
+// which are used in place of the file's names.
+int mm_map_file(const mm_idx_t *idx, const char *fn, const mm_mapopt_t *opt, int n_threads, int tbatch_size,
+                const std::unordered_map<int, std::string> *query_renames = 0);
 
 // private functions (may be moved to a "mmpriv.h" in future)
 double cputime(void);
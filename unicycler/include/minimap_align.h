@@ -20,7 +20,8 @@
 extern "C" {
 
     char * minimapAlignReads(char * referenceFasta, char * readsFastq, int n_threads,
-                             int sensitivityLevel, int preset);
+                             int sensitivityLevel, int preset, int renameCount,
+                             int * renameIndices, char * * renameNames);
 
     char * minimapAlignReadsWithSettings(char * referenceFasta, char * readsFastq, int n_threads,
                                          bool allVsAll, int kmerSize, int minimiserSize,
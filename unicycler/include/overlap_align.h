@@ -19,9 +19,9 @@ using namespace seqan;
 
 // Functions that are called by the Python script must have C linkage, not C++ linkage.
 extern "C" {
-    char * overlapAlignment(char * s1, char * s2,
-                            int matchScore, int mismatchScore, int gapOpenScore, int gapExtensionScore,
-                            int guessOverlap);
+    void overlapAlignment(char * s1, char * s2,
+                          int matchScore, int mismatchScore, int gapOpenScore, int gapExtensionScore,
+                          int guessOverlap, int * overlap1, int * overlap2);
 }
 
 #endif // OVERLAP_ALIGN_H
@@ -14,6 +14,8 @@
 
 
 #include <string>
+#include <vector>
+#include <stdint.h>
 #include <seqan/basic.h>
 #include <seqan/align.h>
 
@@ -22,6 +24,34 @@ using namespace seqan;
 enum CigarType {MATCH, INSERTION, DELETION, CLIP, NOTHING};
 
 
+// Alignments are passed back to Python in these structs (via ctypes), so their numbers don't need
+// to be formatted into a string and parsed again. The CIGAR is an array of packed parts, as in the
+// BAM format: each part's length is shifted left four bits and its BAM operation code (0 = M,
+// 1 = I, 2 = D, 4 = S) is in the lower four bits. The reference name and CIGAR are on the heap, so
+// these must be cleaned up with freeAlignmentResult/freeAlignmentResults.
+struct AlignmentResult {
+    char * refName;
+    int revComp;
+    int readStartPos;
+    int readEndPos;
+    int refStartPos;
+    int refEndPos;
+    int rawScore;
+    double scaledScore;
+    int milliseconds;
+    int cigarLength;
+    uint32_t * cigar;
+};
+
+// This holds any number of alignments (e.g. all of a read's alignments) along with the console
+// output made while finding them.
+struct AlignmentResults {
+    int count;
+    AlignmentResult * alignments;
+    char * output;
+};
+
+
 class ScoredAlignment {
 public:
     ScoredAlignment(Align<Dna5String, ArrayGaps> & alignment, 
@@ -30,7 +60,7 @@ public:
                     int refOffset, long long startTime, int bandSize,
                     bool startImmediately, bool goToEndSeq1, bool goToEndSeq2,
                     Score<int, Simple> & scoringScheme);
-    std::string getFullString();
+    void fillResult(AlignmentResult * result);
     std::string getShortDisplayString();
     bool isRevComp();
     int getReadAlignmentLength() {return m_readEndPos - m_readStartPos;}
@@ -44,7 +74,7 @@ public:
     int m_readEndPos;
     int m_refStartPos;
     int m_refEndPos;
-    std::string m_cigar;
+    std::vector<uint32_t> m_cigar;
     int m_rawScore;
     double m_scaledScore;
     int m_milliseconds;
@@ -52,7 +82,7 @@ public:
 
 private:
     CigarType getCigarType(char b1, char b2, bool alignmentStarted);
-    std::string getCigarPart(CigarType type, int length);
+    void addCigarPart(CigarType type, int length);
     int getCigarScore(CigarType type, int length, Score<int, Simple> & scoringScheme,
                       std::string & readAlignment, std::string & refAlignment,
                       int alignmentPos);
@@ -60,4 +90,14 @@ private:
 
 long long getTime();
 
+AlignmentResult * newAlignmentResult(ScoredAlignment * alignment);
+AlignmentResults * newAlignmentResults(std::vector<ScoredAlignment *> & alignments,
+                                       std::string & output);
+
+// Functions that are called by the Python script must have C linkage, not C++ linkage.
+extern "C" {
+    void freeAlignmentResult(AlignmentResult * result);
+    void freeAlignmentResults(AlignmentResults * results);
+}
+
 #endif // ALIGNMENT_H
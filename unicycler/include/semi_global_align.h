@@ -53,11 +53,11 @@ typedef std::vector<Point> PointVector;
 // Functions that are called by the Python script must have C linkage, not C++ linkage.
 extern "C" {
 
-    char * semiGlobalAlignment(char * readNameC, char * readSeqC, int verbosity,
-                               char * minimapAlignmentsStr, SeqMap * refSeqs,
-                               int matchScore, int mismatchScore, int gapOpenScore,
-                               int gapExtensionScore, double lowScoreThreshold, bool returnBad,
-                               int sensitivityLevel);
+    AlignmentResults * semiGlobalAlignment(char * readNameC, char * readSeqC, int verbosity,
+                                           char * minimapAlignmentsStr, SeqMap * refSeqs,
+                                           int matchScore, int mismatchScore, int gapOpenScore,
+                                           int gapExtensionScore, double lowScoreThreshold,
+                                           bool returnBad, int sensitivityLevel);
 }
 
 std::vector<ScoredAlignment *> alignReadToReferenceRange(SeqMap * refSeqs, std::string refName,
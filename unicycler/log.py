@@ -52,6 +52,11 @@ class Log(object):
         else:
             self.log_file = None
 
+        # When this is a list (see start_capture), log calls are stored here instead of being
+        # printed/written, so they can be replayed later (e.g. when the logging happened in a
+        # worker process).
+        self.captured = None
+
     def __del__(self):
         if self.log_file and not self.log_file.closed:
             self.log_file.close()
@@ -62,6 +67,10 @@ logger = Log()
 
 
 def log(text, verbosity=1, stderr=False, end='\n', print_to_screen=True, write_to_log_file=True):
+    if logger.captured is not None:
+        logger.captured.append((text, verbosity, stderr, end, print_to_screen, write_to_log_file))
+        return
+
     text_no_formatting = remove_formatting(text)
 
     # The text is printed to the screen with ANSI formatting, if supported. If there are only 8
@@ -82,6 +91,23 @@ def log(text, verbosity=1, stderr=False, end='\n', print_to_screen=True, write_t
         logger.log_file.write('\n')
 
 
+def start_capture():
+    logger.captured = []
+
+
+def stop_capture():
+    """
+    Stops capturing log calls and returns the captured calls, ready to be given to replay.
+    """
+    captured, logger.captured = logger.captured, None
+    return captured
+
+
+def replay(captured):
+    for log_args in captured:
+        log(*log_args)
+
+
 def log_section_header(message, verbosity=1, single_newline=False):
     """
     Logs a section header. Also underlines the header using a row of dashes to the log file
@@ -120,6 +146,17 @@ def log_progress_line(completed, total, base_pairs=None, end_newline=False):
         log(progress_str, print_to_screen=False)
 
 
+def log_file_progress_line(completed, percent, base_pairs=None):
+    """
+    Like log_progress_line, but for when the total count isn't known ahead of time (e.g. when
+    streaming through a file). The percentage is given directly, usually based on file position.
+    """
+    progress_str = int_to_str(completed) + ' (' + '%.1f' % percent + '%)'
+    if base_pairs is not None:
+        progress_str += ' - ' + int_to_str(base_pairs) + ' bp'
+    log('\r' + progress_str, end='', write_to_log_file=False)
+
+
 def log_explanation(text, verbosity=1, print_to_screen=True, write_to_log_file=True,
                     extra_empty_lines_after=1, indent_size=4):
     """
@@ -21,12 +21,12 @@ import sys
 import itertools
 import collections
 from .misc import green, red, line_iterator, print_table, int_to_str, float_to_str, \
-    reverse_complement, gfa_path, racon_version
+    gfa_path, racon_version
 from .minimap_alignment import align_long_reads_to_assembly_graph, range_overlap_size, \
     load_minimap_alignments
 from .string_graph import StringGraph, StringGraphSegment, \
     merge_string_graph_segments_into_unitig_graph
-from .read_ref import load_references, load_long_reads
+from .read_ref import load_references, load_long_reads, get_read_renames
 from .unicycler_align import semi_global_align_long_reads
 from . import log
 from . import settings
@@ -217,7 +217,8 @@ def make_miniasm_string_graph(graph, read_dict, long_read_filename, scoring_sche
 def get_miniasm_assembly_reads(graph, read_dict, long_read_filename, miniasm_dir, threads):
     if graph is not None:  # hybrid assembly
         minimap_alignments = align_long_reads_to_assembly_graph(graph, long_read_filename,
-                                                                miniasm_dir, threads)
+                                                                miniasm_dir, threads,
+                                                                get_read_renames(read_dict))
         miniasm_assembly_reads = []
         for read_name, alignments in minimap_alignments.items():
             if any(a.overlaps_reference() for a in alignments):
@@ -261,14 +262,12 @@ def save_assembly_reads_to_file(read_filename, read_names, read_dict, graph, seg
         # Now save the actual long reads.
         for read_name in read_names:
             read = read_dict[read_name]
-            seq = read.sequence
-            if len(seq) < 100:
+            if read.get_length() < 100:
                 continue
-            quals = read.qualities
             fastq.write('@' + read_name + '\n')
-            fastq.write(seq)
+            fastq.write(read.sequence)
             fastq.write('\n+\n')
-            fastq.write(quals)
+            fastq.write(read.qualities)
             fastq.write('\n')
         log.log('  ' + int_to_str(len(read_names)) + ' long reads')
         log.log('')
@@ -411,7 +410,6 @@ def polish_unitigs_with_racon(unitig_graph, miniasm_dir, read_dict, graph, racon
         for unitig_name, unitig_seq in best_unitig_sequences.items():
             segment = unitig_graph.segments[unitig_name]
             segment.forward_sequence = unitig_seq
-            segment.reverse_sequence = reverse_complement(unitig_seq)
             if unitig_name in unitig_depths:
                 segment.depth = unitig_depths[unitig_name]
         unitig_graph.normalise_read_depths()
@@ -138,7 +138,8 @@ def alignments_overlap(a, other, allowed_overlap):
     return any(range_overlap(adjusted_start, a.read_end, x.read_start, x.read_end) for x in other)
 
 
-def align_long_reads_to_assembly_graph(graph, long_read_filename, working_dir, threads):
+def align_long_reads_to_assembly_graph(graph, long_read_filename, working_dir, threads,
+                                       read_renames=None):
     """
     Aligns all long reads to all graph segments and returns a dictionary of alignments (key =
     read name, value = list of MinimapAlignment objects).
@@ -147,7 +148,7 @@ def align_long_reads_to_assembly_graph(graph, long_read_filename, working_dir, t
     log.log('Aligning long reads to graph using minimap', 1)
     graph.save_to_fasta(segments_fasta, verbosity=2)
     minimap_alignments_str = minimap_align_reads(segments_fasta, long_read_filename, threads, 3,
-                                                 'default')
+                                                 'default', read_renames)
     minimap_alignments = \
         load_minimap_alignments(minimap_alignments_str, filter_overlaps=True,
                                 allowed_overlap=settings.ALLOWED_MINIMAP_OVERLAP,
@@ -27,6 +27,7 @@ import datetime
 import multiprocessing
 from . import settings
 from . import log
+from . import seqops
 
 
 REV_COMP_DICT = {'A': 'T', 'T': 'A', 'G': 'C', 'C': 'G',
@@ -152,9 +153,10 @@ def is_header_spades_format(contig_name):
 
 def reverse_complement(seq):
     """
-    Given a DNA sequences, this function returns the reverse complement sequence.
+    Given a DNA sequences, this function returns the reverse complement sequence. New code should
+    use seqops.reverse_complement directly.
     """
-    return ''.join([complement_base(x) for x in seq][::-1])
+    return seqops.reverse_complement(seq)
 
 
 def complement_base(base):
@@ -987,6 +989,13 @@ def gfa_path(out_dir, file_num, name):
     return os.path.join(out_dir, str(file_num).zfill(3) + '_' + name + '.gfa')
 
 
+def checkpoint_path(gfa_filename):
+    """
+    Returns the filename of the binary graph checkpoint which goes with a GFA file.
+    """
+    return gfa_filename[:-4] + '.checkpoint'
+
+
 def get_first_character_of_file(filename):
     open_func = get_open_function(filename)
     with open_func(filename, 'r') as f:
@@ -16,7 +16,8 @@ not, see <http://www.gnu.org/licenses/>.
 
 import sys
 from collections import defaultdict
-from .misc import weighted_average, reverse_complement, get_num_agreement
+from .misc import weighted_average, get_num_agreement
+from .seqops import reverse_complement
 from . import settings
 
 try:
@@ -73,9 +74,8 @@ def get_best_paths_for_seq(graph, start_seg, end_seg, target_length, sequence, s
             if not alignment_result:
                 continue
 
-            seqan_parts = alignment_result.split(',', 9)
-            raw_score = int(seqan_parts[6])
-            scaled_score = float(seqan_parts[7])
+            raw_score = alignment_result.raw_score
+            scaled_score = alignment_result.scaled_score
 
         # If there isn't a consensus sequence (i.e. the start and end overlap), then each
         # path is only scored on how well its length agrees with the target length.
@@ -321,7 +321,7 @@ def cull_paths(graph, paths, sequence, scoring_scheme, expected_scaled_score, cu
     path_align_start = len(common_path_seq)
     if common_path_seq:
         alignment_result = path_alignment(common_path_seq, sequence, scoring_scheme, True, 1000)
-        seq_align_start = int(alignment_result.split(',', 6)[5])
+        seq_align_start = alignment_result.ref_end_pos
     else:
         seq_align_start = 0
 
@@ -334,7 +334,7 @@ def cull_paths(graph, paths, sequence, scoring_scheme, expected_scaled_score, cu
         alignment_result = path_alignment(path_seq_after_common_path, seq_after_common_path,
                                           scoring_scheme, True, 500)
         if alignment_result:
-            scaled_score = float(alignment_result.split(',', 8)[7])
+            scaled_score = alignment_result.scaled_score
             scored_paths.append((path, scaled_score))
 
     scored_paths = sorted(scored_paths, key=lambda x: x[1], reverse=True)
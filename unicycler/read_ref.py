@@ -15,15 +15,26 @@ not, see <http://www.gnu.org/licenses/>.
 
 import random
 import gzip
+import heapq
+import io
+import json
+import mmap
 import os
 import math
+import re
+from array import array
 from .misc import quit_with_error, get_nice_header, get_compression_type, get_sequence_file_type,\
-    strip_read_extensions, print_table, float_to_str, range_is_contained, range_overlap_size, \
+    int_to_str, print_table, float_to_str, range_is_contained, range_overlap_size, \
     simplify_ranges, add_line_breaks_to_sequence
+from .seqops import pack_two_bit, unpack_two_bit
 from . import settings
 from . import log
 
 
+class BadReadFile(Exception):
+    pass
+
+
 def load_references(fasta_filename, contamination=False, section_header='Loading references',
                     show_progress=True):
     """
@@ -90,11 +101,20 @@ def load_references(fasta_filename, contamination=False, section_header='Loading
     return references
 
 
-def load_long_reads(filename, silent=False, section_header='Loading reads', output_dir=None):
+def load_long_reads(filename, silent=False, section_header='Loading reads', output_dir=None,
+                    read_store_filenames=None):
     """
     This function loads in long reads from a FASTQ file and returns a dictionary where key = read
     name and value = Read object. It also returns a list of read names, in the order they are in
     the file.
+
+    The file is read in a single streaming pass. Since the read count isn't known in advance,
+    progress is reported using the fraction of the (possibly compressed) file consumed so far.
+
+    If an output directory is given, the read data is kept in a memory-mapped file there (with an
+    index alongside it) instead of in memory. If a matching index from an earlier run is found,
+    the reads are not parsed again. The data and index filenames can be given as a pair, otherwise
+    the standard long read store filenames are used.
     """
     # Read files can be either FASTA or FASTQ and optionally gzipped.
     try:
@@ -102,140 +122,155 @@ def load_long_reads(filename, silent=False, section_header='Loading reads', outp
     except ValueError:
         file_type = ''
         quit_with_error(filename + ' is not in either FASTA or FASTQ format')
-    if get_compression_type(filename) == 'gz':
-        open_func = gzip.open
-    else:  # plain text
-        open_func = open
 
     if not silent:
         log.log_section_header(section_header)
 
+    if output_dir is not None:
+        if read_store_filenames is None:
+            read_store_filenames = (settings.LONG_READ_STORE_DATA_FILENAME,
+                                    settings.LONG_READ_STORE_INDEX_FILENAME)
+        data_filename = os.path.join(output_dir, read_store_filenames[0])
+        index_filename = os.path.join(output_dir, read_store_filenames[1])
+        read_store, read_names = load_read_store_from_index(index_filename, data_filename,
+                                                            filename)
+    else:
+        data_filename, index_filename, read_store = None, None, None
+
+    if read_store is not None:
+        if not silent:
+            log.log('Using previously indexed reads:\n  ' + data_filename)
+        read_dict = {name: Read.from_read_store(name, read_store, i)
+                     for i, name in enumerate(read_names)}
+        total_bases = sum(read_store.lengths)
+    else:
+        read_store = ReadStore(data_filename)
+        try:
+            read_dict, read_names, total_bases = parse_long_reads(filename, file_type, read_store,
+                                                                  silent)
+        except BadReadFile as e:
+            quit_with_error(filename + ': ' + str(e))
+        read_store.finish_loading()
+        if index_filename is not None:
+            read_store.save_index(index_filename, filename, read_names)
+
+    if not read_dict:
+        quit_with_error('There are no read sequences in ' + filename)
+    if not silent:
+        log.log_progress_line(len(read_dict), len(read_dict), total_bases, end_newline=True)
+
+    # Reads with duplicate names were given unique names. Rather than saving a duplicate-free
+    # copy of the read file, the new names are applied when the file is passed to minimap.
+    if read_store.renames and not silent:
+        log.log('\nDuplicate read names found: ' + int_to_str(len(read_store.renames)) +
+                ' reads renamed')
+
+    return read_dict, read_names, filename
+
+
+def parse_long_reads(filename, file_type, read_store, silent):
+    """
+    Parses all reads from the file into the given ReadStore. Returns the read dictionary, the
+    list of read names and the total bases.
+    """
     read_dict = {}
     read_names = []
     total_bases = 0
     last_progress = 0.0
     step = settings.LOADING_READS_PROGRESS_STEP
-    duplicate_read_names_found = False
-
-    if file_type == 'FASTQ':
-        with open_func(filename, 'rt') as fastq:
-            num_reads = sum(1 for _ in fastq) // 4
-    else:  # file_type == 'FASTA'
-        with open_func(filename, 'rt') as fasta:
-            num_reads = sum(1 for line in fasta if line.startswith('>'))
-    if not num_reads:
-        quit_with_error('There are no read sequences in ' + filename)
-    if not silent:
-        log.log_progress_line(0, num_reads)
-
-    if file_type == 'FASTQ':
-        with open_func(filename, 'rt') as fastq:
-            for line in fastq:
-                stripped_line = line.strip()
-                if len(stripped_line) == 0:
-                    continue
-                if not stripped_line.startswith('@'):
-                    continue
-                original_name = stripped_line[1:].split()[0]
-                sequence = next(fastq).strip()
-                _ = next(fastq)
-                qualities = next(fastq).strip()
-
-                # Don't allow duplicate read names, so add a trailing number when they occur.
-                name = original_name
-                duplicate_name_number = 1
-                while name in read_dict:
-                    duplicate_read_names_found = True
-                    duplicate_name_number += 1
-                    name = original_name + '_' + str(duplicate_name_number)
-
-                read_dict[name] = Read(name, sequence, qualities)
-                read_names.append(name)
-                total_bases += len(sequence)
-                progress = 100.0 * len(read_dict) / num_reads
-                progress_rounded_down = math.floor(progress / step) * step
-                if progress == 100.0 or progress_rounded_down > last_progress:
-                    if not silent:
-                        log.log_progress_line(len(read_dict), num_reads, total_bases)
-                    last_progress = progress_rounded_down
-
-    else:  # file_type == 'FASTA'
-        with open_func(filename, 'rt') as fasta:
-            name = ''
-            sequence = ''
-            last_progress = 0.0
-            for line in fasta:
-                line = line.strip()
-                if not line:
-                    continue
-                if line.startswith('>'):  # Header line = start of new contig
-                    if name:
-                        read_dict[name] = Read(name, sequence, None)
-                        read_names.append(name)
-                        total_bases += len(sequence)
-                        progress = 100.0 * len(read_dict) / num_reads
-                        progress_rounded_down = math.floor(progress / step) * step
-                        if progress == 100.0 or progress_rounded_down > last_progress:
-                            if not silent:
-                                log.log_progress_line(len(read_dict), num_reads, total_bases)
-                            last_progress = progress_rounded_down
-                        sequence = ''
-
-                    # Don't allow duplicate read names, so add a trailing number when they occur.
-                    original_name = get_nice_header(line[1:])
-                    name = original_name
-                    duplicate_name_number = 1
-                    while name in read_dict:
-                        duplicate_read_names_found = True
-                        duplicate_name_number += 1
-                        name = original_name + '_' + str(duplicate_name_number)
-
-                else:
-                    sequence += line
-            if name:
-                read_dict[name] = Read(name, sequence, None)
-                read_names.append(name)
-                total_bases += len(sequence)
-                if not silent:
-                    log.log_progress_line(len(read_dict), num_reads, total_bases)
+    total_file_bytes = max(os.path.getsize(filename), 1)
 
     if not silent:
-        log.log_progress_line(len(read_dict), len(read_dict), total_bases, end_newline=True)
+        log.log_file_progress_line(0, 0.0)
 
-    # If there were duplicate read names, then we save the reads back out to file with their fixed
-    # names.
-    if duplicate_read_names_found:
-        no_dup_filename = strip_read_extensions(filename) + '_no_duplicates'
+    with open(filename, 'rb') as raw_file, open_sequence_stream(filename, raw_file) as seq_file:
         if file_type == 'FASTQ':
-            no_dup_filename += '.fastq.gz'
+            records = iterate_fastq_records(seq_file)
         else:  # file_type == 'FASTA'
-            no_dup_filename += '.fasta.gz'
+            records = iterate_fasta_records(seq_file)
+        for original_name, sequence, qualities in records:
+
+            # Don't allow duplicate read names, so add a trailing number when they occur.
+            name = original_name
+            duplicate_name_number = 1
+            while name in read_dict:
+                duplicate_name_number += 1
+                name = original_name + '_' + str(duplicate_name_number)
+
+            read_dict[name] = Read(name, sequence, qualities, read_store)
+            if name != original_name:
+                read_store.renames[read_dict[name].index] = name
+            read_names.append(name)
+            total_bases += len(sequence)
+            progress = min(100.0 * raw_file.tell() / total_file_bytes, 100.0)
+            progress_rounded_down = math.floor(progress / step) * step
+            if progress_rounded_down > last_progress:
+                if not silent:
+                    log.log_file_progress_line(len(read_dict), progress, total_bases)
+                last_progress = progress_rounded_down
 
-        # If an output directory was provided, we put the no duplicate read file there.
-        if output_dir is not None:
-            no_dup_filename = os.path.join(output_dir, no_dup_filename)
+    return read_dict, read_names, total_bases
 
-        # If an output directory wasn't provided, we put the no duplicate read file in the same
-        # directory as the normal read file.
-        else:
-            no_dup_filename = os.path.join(os.path.dirname(os.path.abspath(filename)),
-                                           no_dup_filename)
 
-        if not silent:
-            log.log('\nDuplicate read names found. Saving duplicate-free file:')
-            log.log(no_dup_filename)
-        with gzip.open(no_dup_filename, 'wb') as f:
-            for read_name in read_names:
-                read = read_dict[read_name]
-                if file_type == 'FASTQ':
-                    f.write(read.get_fastq().encode())
-                else:  # file_type == 'FASTA'
-                    f.write(read.get_fasta().encode())
+def open_sequence_stream(filename, raw_file):
+    """
+    Wraps an already-open binary file in a text stream, decompressing if necessary. Keeping hold
+    of the raw file lets the caller use its position to measure progress through the file.
+    """
+    if get_compression_type(filename) == 'gz':
+        return io.TextIOWrapper(gzip.GzipFile(fileobj=raw_file, mode='rb'))
+    else:  # plain text
+        return io.TextIOWrapper(raw_file)
 
-    else:
-        no_dup_filename = filename
 
-    return read_dict, read_names, no_dup_filename
+def iterate_fastq_records(fastq):
+    """
+    Yields (name, sequence, qualities) tuples from an open FASTQ text stream. A record without a
+    name or which is cut short raises BadReadFile.
+    """
+    record_number = 0
+    for line in fastq:
+        stripped_line = line.strip()
+        if not stripped_line.startswith('@'):
+            continue
+        record_number += 1
+        name_parts = stripped_line[1:].split()
+        if not name_parts:
+            raise BadReadFile('record ' + str(record_number) + ' has no name')
+        name = name_parts[0]
+        sequence, _, qualities = next(fastq, None), next(fastq, None), next(fastq, None)
+        if qualities is None:
+            raise BadReadFile('record ' + str(record_number) + ' (' + name + ') is truncated')
+        yield name, sequence.strip(), qualities.strip()
+
+
+def iterate_fasta_records(fasta):
+    """
+    Yields (name, sequence, None) tuples from an open FASTA text stream. Each record's sequence
+    lines are gathered in a list and joined once at the end of the record.
+
+    Every header must give a name, as the reads are later matched up by their position in the file
+    (e.g. for renaming in minimap), so a skipped record would throw off the ones after it.
+    """
+    name = ''
+    sequence_parts = []
+    record_number = 0
+    for line in fasta:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('>'):  # Header line = start of new record
+            if name:
+                yield name, ''.join(sequence_parts), None
+            sequence_parts = []
+            record_number += 1
+            if not line[1:].strip():
+                raise BadReadFile('record ' + str(record_number) + ' has no name')
+            name = get_nice_header(line[1:])
+        elif name:
+            sequence_parts.append(line)
+    if name:
+        yield name, ''.join(sequence_parts), None
 
 
 class Reference(object):
@@ -263,32 +298,258 @@ class Reference(object):
         return len(self.sequence)
 
 
-class Read(object):
+class ReadStore(object):
     """
-    This class holds a long read, e.g. from PacBio or Oxford Nanopore.
+    This class holds the sequences and qualities for a whole set of reads in one contiguous
+    buffer, which uses far less memory than one pair of Python strings per read. Sequences are
+    packed at two bits per base. Any non-ACGT bases (e.g. N) are stored as runs on the side and
+    patched back in when a sequence is unpacked. Qualities are stored as-is.
+
+    If a data filename is given, the buffer is written to that file instead of being held in
+    memory. Once loading is finished, the file is memory-mapped so reads are paged in on demand
+    and memory use doesn't scale with the total read bases.
     """
 
-    def __init__(self, name, sequence, qualities):
-        self.name = name
-        self.sequence = sequence.upper()
-
+    def __init__(self, data_filename=None):
+        self.data_filename = data_filename
+        if data_filename is None:
+            self.data = bytearray()
+            self.data_file = None
+        else:
+            self.data = b''
+            self.data_file = open(data_filename, 'w+b')
+        self.data_size = 0
+        self.lengths = array('Q')
+        self.sequence_starts = array('Q')
+        self.quality_starts = array('q')  # -1 for reads without qualities
+        self.quality_lengths = array('Q')
+        self.non_acgt_runs = {}
+        self.renames = {}  # read index -> name, for reads renamed due to duplicate names
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def add(self, sequence, qualities):
+        """
+        Adds a read to the store and returns its index.
+        """
+        index = len(self.lengths)
+        sequence = sequence.upper().encode('ascii', 'replace')
+        non_acgt_runs = [(m.start(), m.group()) for m in NON_ACGT_RE.finditer(sequence)]
+        if non_acgt_runs:
+            self.non_acgt_runs[index] = non_acgt_runs
+        self.lengths.append(len(sequence))
+        self.sequence_starts.append(self.data_size)
+        self.write_data(pack_two_bit(sequence))
         if qualities:
-            self.qualities = qualities
+            self.quality_starts.append(self.data_size)
+            self.quality_lengths.append(len(qualities))
+            self.write_data(qualities.encode('ascii', 'replace'))
+        else:
+            self.quality_starts.append(-1)
+            self.quality_lengths.append(len(sequence))
+        return index
 
-        # If no qualities are given, then they are all set to '+', the Phred+33 score for 10% error.
+    def write_data(self, data):
+        if self.data_file is None:
+            self.data += data
         else:
-            self.qualities = '+' * len(self.sequence)
+            self.data_file.write(data)
+        self.data_size += len(data)
+
+    def finish_loading(self):
+        """
+        For a file-backed store, this closes the data file for writing and memory-maps it.
+        """
+        if self.data_file is None:
+            return
+        self.data_file.close()
+        self.data_file = None
+        self.map_data_file()
+
+    def map_data_file(self):
+        if self.data_size == 0:
+            self.data = b''
+            return
+        with open(self.data_filename, 'rb') as data_file:
+            self.data = mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def save_index(self, index_filename, source_filename, read_names):
+        """
+        Saves everything except the data buffer (read names, lengths, offsets, non-ACGT runs and
+        whether the read was renamed) so a later run on the same read file can use the data file
+        without parsing the reads. The header line records the source file's size, modification
+        time and absolute path to detect changes.
+        """
+        source_stat = os.stat(source_filename)
+        with open(index_filename, 'wt') as index_file:
+            index_file.write('\t'.join([str(source_stat.st_size), str(source_stat.st_mtime),
+                                        str(self.data_size), str(len(read_names)),
+                                        os.path.abspath(source_filename)]) + '\n')
+            for i, name in enumerate(read_names):
+                runs = [[pos, run.decode()] for pos, run in self.non_acgt_runs.get(i, [])]
+                index_file.write('\t'.join([name, str(self.lengths[i]),
+                                            str(self.sequence_starts[i]),
+                                            str(self.quality_starts[i]),
+                                            str(self.quality_lengths[i]),
+                                            str(int(i in self.renames)),
+                                            json.dumps(runs, separators=(',', ':'))]) + '\n')
+
+    def get_length(self, index):
+        return self.lengths[index]
+
+    def get_sequence(self, index, start=0, end=None):
+        """
+        Returns the read's sequence (or part of it) as a string.
+        """
+        length = self.lengths[index]
+        start, end, _ = slice(start, end).indices(length)
+        if end <= start:
+            return ''
+        byte_start = self.sequence_starts[index] + start // 4
+        byte_end = self.sequence_starts[index] + (end + 3) // 4
+        unpacked = unpack_two_bit(self.data[byte_start:byte_end])
+        offset = (start // 4) * 4
+        sequence = unpacked[start - offset:end - offset]
+        for run_start, run in self.non_acgt_runs.get(index, []):
+            run_end = run_start + len(run)
+            if run_end <= start or run_start >= end:
+                continue
+            patch_start, patch_end = max(run_start, start), min(run_end, end)
+            sequence[patch_start - start:patch_end - start] = \
+                run[patch_start - run_start:patch_end - run_start]
+        return sequence.decode()
+
+    def get_mean_qscore(self, index):
+        """
+        Returns the mean Phred score of the read's qualities (Phred+33 encoded). Reads without
+        qualities get a score of 10, matching the '+' they are given.
+        """
+        quality_start, quality_length = self.quality_starts[index], self.quality_lengths[index]
+        if quality_start < 0 or quality_length == 0:
+            return 10.0
+        quality_sum = sum(self.data[quality_start:quality_start + quality_length])
+        return quality_sum / quality_length - 33.0
+
+    def get_qualities(self, index, start=0, end=None):
+        """
+        Returns the read's qualities (or part of them) as a string. Reads that were loaded without
+        qualities get '+', the Phred+33 score for 10% error.
+        """
+        start, end, _ = slice(start, end).indices(self.quality_lengths[index])
+        if end <= start:
+            return ''
+        quality_start = self.quality_starts[index]
+        if quality_start < 0:
+            return '+' * (end - start)
+        return self.data[quality_start + start:quality_start + end].decode()
+
 
+def load_read_store_from_index(index_filename, data_filename, source_filename):
+    """
+    Returns a memory-mapped ReadStore and the read names using a previously saved index. If the
+    index is missing, incomplete or was made from a different source file (or a different version
+    of it), this function returns (None, None).
+    """
+    if not os.path.isfile(index_filename) or not os.path.isfile(data_filename):
+        return None, None
+    source_stat = os.stat(source_filename)
+    read_store = ReadStore()
+    read_names = []
+    try:
+        with open(index_filename, 'rt') as index_file:
+            source_size, source_mtime, data_size, read_count, source_path = \
+                next(index_file).rstrip('\n').split('\t', 4)
+            if int(source_size) != source_stat.st_size or \
+                    float(source_mtime) != source_stat.st_mtime or \
+                    source_path != os.path.abspath(source_filename) or \
+                    int(data_size) != os.path.getsize(data_filename):
+                return None, None
+            for i, line in enumerate(index_file):
+                name, length, sequence_start, quality_start, quality_length, renamed, runs = \
+                    line.rstrip('\n').split('\t')
+                read_names.append(name)
+                read_store.lengths.append(int(length))
+                read_store.sequence_starts.append(int(sequence_start))
+                read_store.quality_starts.append(int(quality_start))
+                read_store.quality_lengths.append(int(quality_length))
+                if renamed == '1':
+                    read_store.renames[i] = name
+                runs = json.loads(runs)
+                if runs:
+                    read_store.non_acgt_runs[i] = [(pos, run.encode()) for pos, run in runs]
+    except (ValueError, StopIteration):
+        return None, None
+    if len(read_names) != int(read_count):
+        return None, None
+    read_store.data_filename = data_filename
+    read_store.data_size = int(data_size)
+    read_store.map_data_file()
+    return read_store, read_names
+
+
+NON_ACGT_RE = re.compile(rb'[^ACGT]+')
+
+
+class Read(object):
+    """
+    This class holds a long read, e.g. from PacBio or Oxford Nanopore. The sequence and qualities
+    live in a ReadStore (shared with the other reads from the same file) and are unpacked to
+    strings on access.
+    """
+    __slots__ = ['name', 'read_store', 'index', 'alignments']
+
+    def __init__(self, name, sequence, qualities, read_store=None):
+        self.name = name
+        if read_store is None:
+            read_store = ReadStore()
+        self.read_store = read_store
+        self.index = read_store.add(sequence, qualities)
         self.alignments = []
 
+    @classmethod
+    def from_read_store(cls, name, read_store, index):
+        """
+        Makes a Read for a sequence which is already in a ReadStore.
+        """
+        read = cls.__new__(cls)
+        read.name = name
+        read.read_store = read_store
+        read.index = index
+        read.alignments = []
+        return read
+
     def __repr__(self):
-        return self.name + ' (' + str(len(self.sequence)) + ' bp)'
+        return self.name + ' (' + str(self.get_length()) + ' bp)'
+
+    @property
+    def sequence(self):
+        return self.read_store.get_sequence(self.index)
+
+    @property
+    def qualities(self):
+        return self.read_store.get_qualities(self.index)
+
+    def get_mean_accuracy(self):
+        """
+        Returns the probability of a base being correct, based on the read's mean Phred score.
+        """
+        return 1.0 - 10.0 ** (-self.read_store.get_mean_qscore(self.index) / 10.0)
+
+    def get_subsequence(self, start, end):
+        """
+        Returns part of the read's sequence, only unpacking the needed range.
+        """
+        return self.read_store.get_sequence(self.index, start, end)
+
+    def get_subqualities(self, start, end):
+        return self.read_store.get_qualities(self.index, start, end)
 
     def get_length(self):
         """
         Returns the sequence length.
         """
-        return len(self.sequence)
+        return self.read_store.get_length(self.index)
 
     def remove_conflicting_alignments(self, allowed_overlap):
         """
@@ -360,13 +621,13 @@ class Read(object):
         This function returns the fraction of the read which is covered by any of the read's
         alignments.
         """
-        if len(self.sequence) == 0:
+        if self.get_length() == 0:
             return 0.0
         read_ranges = [x.read_start_end_positive_strand()
                        for x in self.alignments]
         read_ranges = simplify_ranges(read_ranges)
         aligned_length = sum([x[1] - x[0] for x in read_ranges])
-        return aligned_length / len(self.sequence)
+        return aligned_length / self.get_length()
 
     def get_reference_bases_aligned(self):
         """
@@ -386,7 +647,7 @@ class Read(object):
         """
         Returns true if 50% or more of the alignments are to contaminant sequences.
         """
-        if len(self.sequence) == 0:
+        if self.get_length() == 0:
             return False
         if not self.alignments:
             return False
@@ -423,6 +684,75 @@ class Read(object):
                            header_format=None, col_separation=2, indent=2)
 
 
+def subsample_long_reads(read_dict, read_names, target_depth, genome_size, out_dir):
+    """
+    Chooses a subset of the long reads to reach the target depth (based on the given genome size)
+    and returns a new read dictionary, read name list and read filename for just those reads.
+    Reads are ranked by their expected number of correct bases (length times the accuracy implied
+    by their mean quality), so long and high-quality reads are preferred. The choice is made in a
+    single pass using a heap holding just enough reads for the target, so memory use is bounded by
+    the target depth, not the total read depth.
+
+    The subsampled reads are kept in their own memory-mapped read store in the output directory.
+    """
+    if genome_size <= 0:
+        log.log('\nSkipping long read subsampling: the estimated genome size is zero')
+        return read_dict, read_names, None
+
+    log.log_section_header('Subsampling long reads')
+    log.log_explanation('Unicycler now chooses a subset of the long reads (preferring longer and '
+                        'higher-quality reads) to reach the target depth. This reduces the time '
+                        'spent on long-read alignment and assembly, which do not benefit much '
+                        'from very high read depths.', verbosity=1)
+    total_bases = sum(read_dict[x].get_length() for x in read_names)
+    target_bases = int(round(target_depth * genome_size))
+    log.log('Estimated genome size:   ' + int_to_str(int(round(genome_size))) + ' bp')
+    log.log('Total long read depth:   ' + float_to_str(total_bases / genome_size, 1) + 'x')
+    log.log('Target long read depth:  ' + float_to_str(target_depth, 1) + 'x')
+    if total_bases <= target_bases:
+        log.log('\nLong read depth is below the target - all reads will be used')
+        return read_dict, read_names, None
+
+    heap = []
+    kept_bases = 0
+    for i, name in enumerate(read_names):
+        read = read_dict[name]
+        length = read.get_length()
+        heapq.heappush(heap, (length * read.get_mean_accuracy(), i, length))
+        kept_bases += length
+        while kept_bases - heap[0][2] >= target_bases:
+            kept_bases -= heapq.heappop(heap)[2]
+    kept_indices = sorted(x[1] for x in heap)
+
+    subsampled_filename = os.path.join(out_dir, settings.SUBSAMPLED_LONG_READS_FILENAME)
+    with open(subsampled_filename, 'wt') as fastq:
+        for i in kept_indices:
+            fastq.write(read_dict[read_names[i]].get_fastq())
+    avoided_bases = total_bases - kept_bases
+    log.log('')
+    log.log('Reads kept:              ' + int_to_str(len(kept_indices)) + ' / ' +
+            int_to_str(len(read_names)) + ' (' + int_to_str(kept_bases) + ' bp)')
+    log.log('Read bases not aligned:  ' + int_to_str(avoided_bases) + ' bp (' +
+            float_to_str(100.0 * avoided_bases / total_bases, 1) + '% of alignment work avoided)')
+    log.log('Saved subsampled reads:  ' + subsampled_filename)
+
+    subsampled_read_dict, subsampled_read_names, _ = \
+        load_long_reads(subsampled_filename, silent=True, output_dir=out_dir,
+                        read_store_filenames=(settings.SUBSAMPLED_LONG_READ_STORE_DATA_FILENAME,
+                                              settings.SUBSAMPLED_LONG_READ_STORE_INDEX_FILENAME))
+    return subsampled_read_dict, subsampled_read_names, subsampled_filename
+
+
+def get_read_renames(read_dict):
+    """
+    Returns a dictionary of the reads which were renamed on loading because of duplicate names
+    (key = index in the read file, value = new name), suitable for minimap_align_reads.
+    """
+    if not read_dict:
+        return {}
+    return next(iter(read_dict.values())).read_store.renames
+
+
 def get_read_nickname_dict(read_names):
     """
     Read names can be quite long, so for the sake of output brevity, this function tries to come
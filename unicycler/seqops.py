@@ -0,0 +1,170 @@
+"""
+Copyright 2017 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Unicycler
+
+This module contains fast sequence primitives: complements, two-bit packing, rolling k-mer hashes,
+GC counting and mismatch counting. They work on whole sequences with bytes methods (translate,
+count, int conversions) which run in C, rather than looping over bases in Python. Functions which
+take a sequence accept str, bytes or bytearray, and those which return a sequence give back the
+same type they were given.
+
+This file is part of Unicycler. Unicycler is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Unicycler is distributed in
+the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Unicycler. If
+not, see <http://www.gnu.org/licenses/>.
+"""
+
+COMPLEMENT_PAIRS = [b'AT', b'TA', b'GC', b'CG', b'RY', b'YR', b'SS', b'WW', b'KM', b'MK', b'BV',
+                    b'VB', b'DH', b'HD', b'NN', b'..', b'--', b'??']
+
+
+def make_complement_table():
+    """
+    Returns a 256-byte translation table which complements IUPAC bases (keeping their case) and
+    turns anything else into N.
+    """
+    table = bytearray(b'N' * 256)
+    for base, complement in COMPLEMENT_PAIRS:
+        table[base] = complement
+        table[bytes([base]).lower()[0]] = bytes([complement]).lower()[0]
+    return bytes(table)
+
+
+COMPLEMENT_TABLE = make_complement_table()
+
+# Two-bit codes: A=0, C=1, G=2, T=3. For packing, anything else is packed as A. For k-mer hashing,
+# anything else gets a 4, which breaks the k-mer.
+TWO_BIT_ENCODE = bytes(max(b'ACGT'.find(bytes([i])), 0) for i in range(256))
+TWO_BIT_DECODE = bytes.maketrans(b'\x00\x01\x02\x03', b'ACGT')
+KMER_CODES = bytes(b'ACGT'.find(bytes([i]).upper()) % 5 for i in range(256))
+
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # before Python 3.10
+    def popcount(value):
+        return bin(value).count('1')
+
+
+def to_bytes(seq):
+    if isinstance(seq, str):
+        return seq.encode('latin-1')
+    return seq
+
+
+def complement(seq):
+    """
+    Returns the complement (not reversed) of the sequence.
+    """
+    if isinstance(seq, str):
+        try:
+            return seq.encode('latin-1').translate(COMPLEMENT_TABLE).decode('latin-1')
+        except UnicodeEncodeError:
+            return ''.join(chr(COMPLEMENT_TABLE[ord(x)]) if ord(x) < 256 else 'N' for x in seq)
+    return seq.translate(COMPLEMENT_TABLE)
+
+
+def reverse_complement(seq):
+    """
+    Returns the reverse complement of the sequence. Unknown characters become N.
+    """
+    return complement(seq)[::-1]
+
+
+def pack_two_bit(sequence):
+    """
+    Packs a bytes sequence into two bits per base (A=0, C=1, G=2, T=3, anything else is packed as
+    A). Rather than loop over bases in Python, this works on whole-sequence integers: each of the
+    four interleaved strides becomes a big int that is shifted into place and combined.
+    """
+    if not sequence:
+        return b''
+    padding = -len(sequence) % 4
+    codes = (sequence + b'A' * padding).translate(TWO_BIT_ENCODE)
+    packed_len = len(codes) // 4
+    packed = 0
+    for i, shift in enumerate((6, 4, 2, 0)):
+        packed |= int.from_bytes(codes[i::4], 'big') << shift
+    return packed.to_bytes(packed_len, 'big')
+
+
+def unpack_two_bit(packed):
+    """
+    The reverse of pack_two_bit. Returns a bytearray with four bases per packed byte (so there may
+    be trailing padding bases for the caller to trim off).
+    """
+    packed_len = len(packed)
+    if not packed_len:
+        return bytearray()
+    packed_int = int.from_bytes(packed, 'big')
+    mask = int.from_bytes(b'\x03' * packed_len, 'big')
+    unpacked = bytearray(packed_len * 4)
+    for i, shift in enumerate((6, 4, 2, 0)):
+        unpacked[i::4] = ((packed_int >> shift) & mask).to_bytes(packed_len, 'big')
+    return unpacked.translate(TWO_BIT_DECODE)
+
+
+def get_kmer_hashes(seq, k, canonical=True):
+    """
+    Yields (position, hash) for each k-mer in the sequence, where the hash is the k-mer's two-bit
+    code as an integer (so equal k-mers have equal hashes and, for k <= 32, different k-mers have
+    different hashes). The hash is rolled along the sequence, so each step is constant time.
+    K-mers containing anything other than ACGT (either case) are skipped. If canonical is True, a
+    k-mer and its reverse complement get the same hash (the smaller of the two codes).
+    """
+    if k < 1:
+        raise ValueError('k must be positive')
+    codes = to_bytes(seq).translate(KMER_CODES)
+    mask = (1 << (2 * k)) - 1
+    rev_shift = 2 * (k - 1)
+    forward_code, reverse_code, run_length = 0, 0, 0
+    for i, code in enumerate(codes):
+        if code == 4:
+            run_length = 0
+            continue
+        forward_code = ((forward_code << 2) | code) & mask
+        reverse_code = (reverse_code >> 2) | ((3 - code) << rev_shift)
+        run_length += 1
+        if run_length >= k:
+            if canonical and reverse_code < forward_code:
+                yield i - k + 1, reverse_code
+            else:
+                yield i - k + 1, forward_code
+
+
+def gc_count(seq):
+    """
+    Returns the number of G and C bases (either case) in the sequence.
+    """
+    seq = to_bytes(seq)
+    return len(seq) - len(seq.translate(None, b'GCgc'))
+
+
+def gc_fraction(seq):
+    """
+    Returns the fraction of the sequence which is G or C (0.0 for an empty sequence).
+    """
+    if not seq:
+        return 0.0
+    return gc_count(seq) / len(seq)
+
+
+def count_mismatches(seq_1, seq_2):
+    """
+    Returns the number of positions at which two sequences of equal length differ. The sequences
+    are XORed as big ints and the bits of each byte are ORed down into its lowest bit, so the
+    mismatches are the set bits left after masking off the rest.
+    """
+    if len(seq_1) != len(seq_2):
+        raise ValueError('sequences must be the same length')
+    if seq_1 == seq_2:
+        return 0
+    diff = int.from_bytes(to_bytes(seq_1), 'big') ^ int.from_bytes(to_bytes(seq_2), 'big')
+    diff |= diff >> 4
+    diff |= diff >> 2
+    diff |= diff >> 1
+    lowest_bits = ((1 << (8 * len(seq_1))) - 1) // 255  # 0x0101...01
+    return popcount(diff & lowest_bits)
@@ -97,13 +97,13 @@ PROGRESSIVE_PATH_SEARCH_SCORE_FRACTION = 0.995
 #     depths from one segment to the next.
 #   * MIN_SINGLE_COPY_LENGTH is how short of a segment can be called single copy when adding
 #     additional single copy segments.
-#   * MAX_COPY_DEPTH_DISTRIBUTION_ARRANGEMENTS caps the number of possible ways to redistribute a
-#     segment's copy depths to its neighbours. If there are more possibilities than this,
-#     Unicycler won't bother trying.
+#   * MAX_COPY_DEPTH_DISTRIBUTION_STEPS caps the search for the best way to redistribute a
+#     segment's copy depths to its neighbours. If the search takes more steps than this, Unicycler
+#     doesn't redistribute that segment's copy depths.
 INITIAL_SINGLE_COPY_TOLERANCE = 0.1
 COPY_PROPAGATION_TOLERANCE = 0.5
 MIN_SINGLE_COPY_LENGTH = 1000
-MAX_COPY_DEPTH_DISTRIBUTION_ARRANGEMENTS = 10000
+MAX_COPY_DEPTH_DISTRIBUTION_STEPS = 10000
 COPY_DEPTH_PROPAGATION_TABLE_ROW_WIDTH = 35
 
 # When Unicycler is cleaning up the graph after bridging, it can delete graph paths and graph
@@ -118,6 +118,16 @@ CLEANING_USEDUPNESS_THRESHOLD = 0.5
 # but it will take much longer.
 MAX_READS_FOR_CONSENSUS = 25
 
+# When choosing the best SPAdes k-mer, each k-mer's graph gets this much CPU time (in seconds) to
+# be cleaned and scored, counted from when its own scoring starts. A graph which takes longer than
+# this is given up on as too complex. Graph cleaning scales about linearly with the graph size
+# (a 100,000 segment graph takes seconds), so only a pathological graph should hit this.
+SPADES_GRAPH_SCORING_TIME_BUDGET = 600
+
+# The graph scoring workers run alongside SPAdes with their niceness raised by this much, so SPAdes
+# gets the CPUs first. Their time budget is CPU time, so waiting for a CPU doesn't use it up.
+SPADES_GRAPH_SCORING_NICENESS = 10
+
 # The different bridging modes have different minimum bridge quality thresholds.
 CONSERVATIVE_MIN_BRIDGE_QUAL = 25.0
 NORMAL_MIN_BRIDGE_QUAL = 10.0
@@ -131,6 +141,21 @@ LOADING_REFERENCES_PROGRESS_STEP = 1.0
 LOADING_READS_PROGRESS_STEP = 1.0
 LOADING_ALIGNMENTS_PROGRESS_STEP = 1.0
 
+# When long reads are loaded in Unicycler's output directory, their packed sequences/qualities are
+# written to a memory-mapped data file, with an index which allows reuse on a rerun.
+LONG_READ_STORE_DATA_FILENAME = 'long_reads.bin'
+LONG_READ_STORE_INDEX_FILENAME = 'long_reads.idx'
+
+# When long reads are subsampled to a target depth, the chosen reads are saved to this file in
+# Unicycler's output directory, and their data is kept in a separate memory-mapped file and index.
+SUBSAMPLED_LONG_READS_FILENAME = 'long_reads_subsampled.fastq'
+SUBSAMPLED_LONG_READ_STORE_DATA_FILENAME = 'long_reads_subsampled.bin'
+SUBSAMPLED_LONG_READ_STORE_INDEX_FILENAME = 'long_reads_subsampled.idx'
+
+# Short read statistics (read count, length histogram and FASTQ validity) are cached in this file in
+# Unicycler's output directory, keyed by each read file's size and modification time.
+SHORT_READ_STATS_FILENAME = 'short_read_stats.json'
+
 # These settings control how willing Unicycler is to make bridges that don't have a graph path.
 # This depends on whether one or both of the segments being bridged ends in a dead end and
 # whether we have any expected linear sequences (i.e. whether real dead ends are expected).
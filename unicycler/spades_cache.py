@@ -0,0 +1,118 @@
+"""
+Copyright 2017 Ryan Wick (rrwick@gmail.com)
+https://github.com/rrwick/Unicycler
+
+This module contains a persistent, content-addressed cache of SPAdes k-mer rounds, so reruns on the
+same short reads can skip SPAdes rounds which have already been done.
+
+This file is part of Unicycler. Unicycler is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by the Free Software Foundation,
+either version 3 of the License, or (at your option) any later version. Unicycler is distributed in
+the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for more
+details. You should have received a copy of the GNU General Public License along with Unicycler. If
+not, see <http://www.gnu.org/licenses/>.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from . import log
+
+
+class SpadesCache(object):
+    """
+    Each cache entry is a directory (named with the entry's key) holding one SPAdes round's graph
+    and insert size estimates. The key is a hash of everything which determines the round's result:
+    the read contents, the round's k-mer list, the SPAdes version and any extra SPAdes options.
+    An entry's modification time is updated whenever it's used, so the least recently used entries
+    can be evicted when the cache grows past its maximum size.
+    """
+    GRAPH_FILENAME = 'assembly_graph_with_scaffolds.gfa'
+    INFO_FILENAME = 'info.json'
+
+    def __init__(self, cache_dir, max_size, read_digests, spades_version, spades_options):
+        self.cache_dir = cache_dir
+        self.max_size = max_size  # in bytes
+        self.read_digests = list(read_digests)
+        self.spades_version = spades_version
+        self.spades_options = spades_options if spades_options else ''
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    def get_key(self, kmers):
+        key_parts = {'reads': self.read_digests, 'kmers': list(kmers),
+                     'spades_version': self.spades_version,
+                     'spades_options': self.spades_options}
+        return hashlib.sha256(json.dumps(key_parts, sort_keys=True).encode()).hexdigest()
+
+    def load(self, kmers):
+        """
+        Returns the cached graph filename, insert size mean and insert size deviation for a SPAdes
+        round with the given k-mer list, or None if it isn't cached.
+        """
+        entry_dir = os.path.join(self.cache_dir, self.get_key(kmers))
+        graph_file = os.path.join(entry_dir, self.GRAPH_FILENAME)
+        try:
+            with open(os.path.join(entry_dir, self.INFO_FILENAME), 'rt') as info_file:
+                info = json.load(info_file)
+            if not os.path.isfile(graph_file):
+                return None
+            os.utime(entry_dir)
+        except (OSError, ValueError):
+            return None
+        return graph_file, info['insert_size_mean'], info['insert_size_deviation']
+
+    def store(self, kmers, graph_file, insert_size_mean, insert_size_deviation):
+        """
+        Adds a SPAdes round to the cache. The entry is built in a temporary directory and then
+        renamed into place, so other runs never see a partial entry.
+        """
+        entry_dir = os.path.join(self.cache_dir, self.get_key(kmers))
+        if os.path.isdir(entry_dir):
+            return
+        temp_dir = None
+        try:
+            temp_dir = tempfile.mkdtemp(prefix='.tmp_', dir=self.cache_dir)
+            shutil.copy(graph_file, os.path.join(temp_dir, self.GRAPH_FILENAME))
+            with open(os.path.join(temp_dir, self.INFO_FILENAME), 'wt') as info_file:
+                json.dump({'kmers': list(kmers), 'insert_size_mean': insert_size_mean,
+                           'insert_size_deviation': insert_size_deviation}, info_file)
+            os.rename(temp_dir, entry_dir)
+        except OSError:
+            # The cache is only an optimisation, so failing to add to it isn't a problem.
+            if temp_dir is not None:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+            return
+        self.evict()
+
+    def evict(self):
+        """
+        Deletes the least recently used entries until the cache fits in its maximum size.
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, name)
+            if name.startswith('.') or not os.path.isdir(entry_dir):
+                continue
+            entries.append((os.path.getmtime(entry_dir), get_dir_size(entry_dir), entry_dir))
+        total_size = sum(x[1] for x in entries)
+        for _, size, entry_dir in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            log.log('Removing old SPAdes cache entry: ' + entry_dir, 2)
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total_size -= size
+
+
+def get_dir_size(dir_path):
+    total_size = 0
+    for name in os.listdir(dir_path):
+        try:
+            total_size += os.path.getsize(os.path.join(dir_path, name))
+        except OSError:
+            pass
+    return total_size
@@ -13,39 +13,70 @@ details. You should have received a copy of the GNU General Public License along
 not, see <http://www.gnu.org/licenses/>.
 """
 
+import functools
 import os
 import subprocess
 import gzip
+import hashlib
+import json
+import math
+import multiprocessing
 import shutil
+import signal
 import statistics
 
 from .misc import round_to_nearest_odd, get_compression_type, int_to_str, quit_with_error, \
-    bold, dim, print_table, get_left_arrow, float_to_str
+    bold, dim, print_table, get_left_arrow, float_to_str, spades_path_and_version
 from .assembly_graph import AssemblyGraph
+from .spades_cache import SpadesCache
 from . import log
+from . import settings
 
 
 class BadFastq(Exception):
     pass
 
 
+class GraphScoringTimeout(Exception):
+    pass
+
+
 def get_best_spades_graph(short1, short2, short_unpaired, out_dir, read_depth_filter, verbosity,
                           spades_path, threads, keep, kmer_count, min_k_frac, max_k_frac, kmers,
                           expected_linear_seqs, largest_component, spades_graph_prefix,
-                          spades_options):
+                          spades_options, kmer_search='sweep', kmer_search_patience=2,
+                          spades_cache_dir=None, spades_cache_size=10.0):
     """
     This function tries a SPAdes assembly at different k-mers and returns the best one.
+
+    With the 'sweep' k-mer search, every k-mer in the range is assembled. With the 'adaptive'
+    search, the SPAdes restart chain stops once the graph score has declined for
+    kmer_search_patience rounds past the best k-mer, and then a couple of extra k-mers are tried
+    around the best one.
+
+    If spades_cache_dir is given, SPAdes rounds are reused from (and saved to) a persistent cache in
+    that directory, which is kept under spades_cache_size gigabytes.
     """
     spades_dir = os.path.join(out_dir, 'spades_assembly')
     if not os.path.exists(spades_dir):
         os.makedirs(spades_dir)
 
     threads = min(threads, 32)  # SPAdes can possibly crash if given too many threads.
-    check_fastqs(short1, short2, short_unpaired)
+    read_stats = get_short_read_stats([short1, short2, short_unpaired], out_dir, threads,
+                                      compute_digests=bool(spades_cache_dir))
+    check_fastqs(short1, short2, short_unpaired, read_stats)
     reads = (short1, short2, short_unpaired)
 
-    kmer_range = get_kmer_range(kmers, short1, short2, short_unpaired, spades_dir, kmer_count,
-                                min_k_frac, max_k_frac, spades_path)
+    kmer_range = get_kmer_range(kmers, read_stats, spades_dir, kmer_count, min_k_frac, max_k_frac,
+                                spades_path)
+
+    if spades_cache_dir:
+        _, spades_version, _ = spades_path_and_version(spades_path)
+        read_digests = [read_stats[x].digest if x is not None else None for x in reads]
+        spades_cache = SpadesCache(spades_cache_dir, int(spades_cache_size * 1e9), read_digests,
+                                   spades_version, spades_options)
+    else:
+        spades_cache = None
 
     log.log_section_header('SPAdes assemblies')
     log.log_explanation('Unicycler now uses SPAdes to assemble the short reads. It scores the '
@@ -60,67 +91,109 @@ def get_best_spades_graph(short1, short2, short_unpaired, out_dir, read_depth_fi
     else:
         spades_results_table = [['K-mer', 'Contigs', 'Dead ends', 'Score']]
 
-    graph_files, insert_size_mean, insert_size_deviation = \
-        run_spades_all_kmers(reads, spades_dir, kmer_range, threads, spades_path,
-                             spades_graph_prefix, spades_options)
-
-    existing_graph_files = [x for x in graph_files if x is not None]
-    if not existing_graph_files:
-        quit_with_error('SPAdes failed to produce assemblies. '
-                        'See spades_assembly/spades.log for more info.')
-    median_segment_count = statistics.median(count_segments_in_gfa(x)
-                                             for x in existing_graph_files)
+    # Each k-mer graph is loaded, cleaned and scored in a worker process as soon as SPAdes finishes
+    # it, so this work overlaps with the SPAdes runs for the larger k-mers. SPAdes gets all of the
+    # threads and the scoring workers run at a lower priority, so they only use CPU time which
+    # SPAdes leaves idle and don't slow it down when there's nothing to score.
+    scoring_pool = multiprocessing.Pool(min(max(1, threads // 4), len(kmer_range)),
+                                        initializer=lower_process_priority)
+    pending_scores, finished_scores, refinement_kmers = {}, {}, []
 
-    best_score, best_kmer, best_graph_filename = 0.0, 0, ''
-    for graph_file, kmer in zip(graph_files, kmer_range):
-        table_line = [int_to_str(kmer)]
-
-        if graph_file is None:
-            table_line += [''] * (7 if verbosity > 1 else 2)
-            table_line.append('failed')
-            spades_results_table.append(table_line)
-            continue
-
-        assembly_graph = AssemblyGraph(graph_file, kmer, insert_size_mean=insert_size_mean,
-                                       insert_size_deviation=insert_size_deviation)
-
-        # If this graph has way too many segments, then we will just skip it because very complex
-        # graphs take forever to clean up.
-        # TO DO: I can remove this awkward hack if I make the graph cleaning more efficient.
-        if len(assembly_graph.segments) > 4 * median_segment_count:
-            table_line += [''] * (6 if verbosity > 1 else 2)
-            table_line.append('too complex')
-            spades_results_table.append(table_line)
-            continue
-
-        log.log('\nCleaning k{} graph'.format(kmer), 2)
-        assembly_graph.clean(read_depth_filter, largest_component)
+    def score_when_ready(graph_file, kmer):
         clean_graph_filename = os.path.join(spades_dir, ('k%03d' % kmer) + '_assembly_graph.gfa')
-        assembly_graph.save_to_gfa(clean_graph_filename, verbosity=2)
+        pending_scores[kmer] = scoring_pool.apply_async(
+            score_spades_graph, (graph_file, kmer, read_depth_filter, largest_component,
+                                 expected_linear_seqs, clean_graph_filename, verbosity,
+                                 settings.SPADES_GRAPH_SCORING_TIME_BUDGET))
+        if kmer_search != 'adaptive' or refinement_kmers:
+            return False
+
+        # To keep the scoring overlapped with SPAdes, this never waits on a score. The decision to
+        # stop only uses the earlier rounds which have already been scored, so if scoring lags
+        # behind SPAdes, the stop just comes a round or two later.
+        scored_kmers = []
+        for k in pending_scores:
+            if k not in finished_scores and not pending_scores[k].ready():
+                break
+            scored_kmers.append(k)
+        scores = [get_score(k) for k in scored_kmers]
+        if scores_have_declined(scores, kmer_search_patience):
+            best_kmer_so_far = scored_kmers[scores.index(max(scores))]
+            log.log('Graph scores have declined for {} rounds past the best k-mer ({}), so '
+                    'Unicycler will not try larger k-mers'.format(kmer_search_patience,
+                                                                 best_kmer_so_far))
+            log.log('')
+            return True
+        return False
+
+    def get_scoring_result(kmer):
+        """
+        Waits for a k-mer's graph to be scored. The time budget is enforced in the worker, so a
+        graph which used up its budget was given up on as too complex (the result is None).
+        """
+        if kmer not in finished_scores:
+            finished_scores[kmer] = pending_scores[kmer].get()
+        return finished_scores[kmer]
+
+    def get_score(kmer):
+        result = get_scoring_result(kmer)
+        return 0.0 if result is None else result[0]
+
+    def choose_refinement_kmers(kmers_done):
+        if kmer_search != 'adaptive':
+            return []
+        scores = [get_score(k) for k in kmers_done]
+        refinement_kmers.extend(get_refinement_kmers(kmers_done, scores))
+        if refinement_kmers:
+            log.log('Refining around the best k-mer ({}) with: {}'.format(
+                kmers_done[scores.index(max(scores))],
+                ', '.join(str(x) for x in sorted(refinement_kmers))))
+            log.log('')
+        return refinement_kmers
 
-        segment_count = len(assembly_graph.segments)
-        dead_ends = assembly_graph.total_dead_end_count()
-
-        # If the user is expecting some linear sequences, then the dead end count can be adjusted
-        # down so expected dead ends don't penalise this k-mer.
-        adjusted_dead_ends = max(0, dead_ends - (2 * expected_linear_seqs))
-        if segment_count == 0:
-            score = 0.0
-        else:
-            score = 1.0 / (segment_count * (adjusted_dead_ends + 2))
-
-        # Prepare the table line for this k-mer graph.
-        table_line += [int_to_str(segment_count)]
-        if verbosity > 1:
-            n50, shortest, _, median, _, longest = assembly_graph.get_contig_stats()
-            table_line += [int_to_str(assembly_graph.get_total_link_count()),
-                           int_to_str(assembly_graph.get_total_length()),
-                           int_to_str(n50), int_to_str(longest)]
-        table_line += [int_to_str(dead_ends), '{:.2e}'.format(score)]
-        spades_results_table.append(table_line)
+    try:
+        kmer_range, graph_files, insert_size_mean, insert_size_deviation = \
+            run_spades_all_kmers(reads, spades_dir, kmer_range, threads, spades_path,
+                                 spades_graph_prefix, spades_options, read_stats,
+                                 graph_callback=score_when_ready,
+                                 refinement_callback=choose_refinement_kmers,
+                                 spades_cache=spades_cache)
+
+        existing_graph_files = [x for x in graph_files if x is not None]
+        if not existing_graph_files:
+            quit_with_error('SPAdes failed to produce assemblies. '
+                            'See spades_assembly/spades.log for more info.')
+
+        best_score, best_kmer, best_graph_filename = 0.0, 0, ''
+        for graph_file, kmer in zip(graph_files, kmer_range):
+            table_line = [int_to_str(kmer)]
+
+            if graph_file is None:
+                table_line += [''] * (7 if verbosity > 1 else 2)
+                table_line.append('failed')
+                spades_results_table.append(table_line)
+                continue
+
+            # If this graph couldn't be cleaned within the time budget, then we skip it.
+            scoring_result = get_scoring_result(kmer)
+            if scoring_result is None:
+                table_line += [''] * (6 if verbosity > 1 else 2)
+                table_line.append('too complex')
+                spades_results_table.append(table_line)
+                continue
+
+            log.log('\nCleaning k{} graph'.format(kmer), 2)
+            score, table_values, captured_log = scoring_result
+            log.replay(captured_log)
+            table_line += table_values
+            spades_results_table.append(table_line)
 
-        if score > best_score:
-            best_kmer, best_score, best_graph_filename = kmer, score, graph_file
+            if score > best_score:
+                best_kmer, best_score, best_graph_filename = kmer, score, graph_file
+    finally:
+        # If something went wrong, any graphs still being scored are abandoned.
+        scoring_pool.terminate()
+        scoring_pool.join()
 
     log.log('', 2)
 
@@ -162,7 +235,8 @@ def get_best_spades_graph(short1, short2, short_unpaired, out_dir, read_depth_fi
 
 
 def run_spades_all_kmers(read_files, spades_dir, kmers, threads, spades_path, spades_graph_prefix,
-                         spades_options):
+                         spades_options, read_stats, graph_callback=None,
+                         refinement_callback=None, spades_cache=None):
     """
     SPAdes is run with all k-mers up to the top one. For example:
       * round 1: 25
@@ -172,28 +246,69 @@ def run_spades_all_kmers(read_files, spades_dir, kmers, threads, spades_path, sp
 
     This is because it only saves the necessary graph information for the final k-mer. The first
     round is a normal SPAdes run, and subsequent rounds use the --restart-from option.
+
+    If graph_callback is given, it is called with each round's graph file and k-mer as soon as the
+    round finishes (while later rounds are still to come). If it returns True, the restart chain
+    stops there and the remaining k-mers are skipped.
+
+    If refinement_callback is given, it is called with the k-mers done so far and returns extra
+    k-mers to assemble. Each of these is a single round restarted from the next smaller k-mer, e.g.
+    adding 51 to the example above restarts from k43 with 25,43,51.
+
+    If spades_cache is given, rounds found in the cache aren't run, and new rounds are added to it.
+    A round following a cached round has no SPAdes checkpoint to restart from, so it is assembled
+    from scratch with the whole k-mer list.
+
+    Returns the k-mers assembled (in increasing order), their graph files and the insert size.
     """
     short1, short2, unpaired = read_files[0], read_files[1], read_files[2]
     using_paired_reads = short1 is not None and short2 is not None and \
         os.path.isfile(short1) and os.path.isfile(short2)
     using_unpaired_reads = unpaired is not None and os.path.isfile(unpaired)
 
-    graph_files, insert_size_means, insert_size_deviations = [], [], []
-    for i in range(len(kmers)):
-        biggest_kmer = kmers[i]
-        command = build_spades_command(spades_path, spades_dir, threads, kmers, i, short1, short2,
-                                       unpaired, using_paired_reads, using_unpaired_reads,
-                                       spades_options)
-        log.log(' '.join(command))
-        graph_file, insert_size_mean, insert_size_deviation = \
-            run_spades_one_kmer(command, spades_dir, biggest_kmer)
+    graph_files, insert_size_means, insert_size_deviations = {}, [], []
+    checkpointed_kmers = set()  # k-mers with a SPAdes checkpoint in spades_dir from this run
+
+    def run_round(round_kmers):
+        biggest_kmer = round_kmers[-1]
+        cached = spades_cache.load(round_kmers) if spades_cache is not None else None
+        if cached is not None:
+            graph_file, insert_size_mean, insert_size_deviation = cached
+            log.log('Using cached SPAdes graph for k{}: {}'.format(biggest_kmer, graph_file))
+        else:
+            fresh_start = len(round_kmers) > 1 and round_kmers[-2] not in checkpointed_kmers
+            command = build_spades_command(spades_path, spades_dir, threads, round_kmers,
+                                           len(round_kmers) - 1, short1, short2, unpaired,
+                                           using_paired_reads, using_unpaired_reads,
+                                           spades_options, fresh_start=fresh_start)
+            log.log(' '.join(command))
+            graph_file, insert_size_mean, insert_size_deviation = \
+                run_spades_one_kmer(command, spades_dir, biggest_kmer)
+            checkpointed_kmers.update(round_kmers if fresh_start else [biggest_kmer])
+            if spades_cache is not None:
+                spades_cache.store(round_kmers, graph_file, insert_size_mean,
+                                   insert_size_deviation)
 
         copy_path = spades_graph_prefix + '_k' + '{:03d}'.format(biggest_kmer) + '.gfa'
         shutil.copy(graph_file, copy_path)
-        graph_files.append(copy_path)
+        graph_files[biggest_kmer] = copy_path
+        stop = graph_callback is not None and graph_callback(copy_path, biggest_kmer)
         insert_size_means.append(insert_size_mean)
         insert_size_deviations.append(insert_size_deviation)
         log.log('')
+        return stop
+
+    for i in range(len(kmers)):
+        if run_round(kmers[:i+1]):
+            break
+
+    if refinement_callback is not None:
+        kmers_done = sorted(graph_files)
+
+        # Refinement rounds are done from largest to smallest, so each restart's checkpoint is
+        # untouched by the refinement rounds before it.
+        for kmer in sorted(refinement_callback(kmers_done), reverse=True):
+            run_round([x for x in kmers_done if x < kmer] + [kmer])
 
     insert_size_means = [x for x in insert_size_means if x is not None]
     insert_size_deviations = [x for x in insert_size_deviations if x is not None]
@@ -204,25 +319,133 @@ def run_spades_all_kmers(read_files, spades_dir, kmers, threads, spades_path, sp
     else:
         # If we couldn't get the insert size from the SPAdes output (e.g. it was an
         # unpaired-reads-only assembly), we'll use the read length instead.
-        read_lengths = get_read_lengths(short1) + get_read_lengths(short2) + \
-                       get_read_lengths(unpaired)
-        insert_size_mean = statistics.mean(read_lengths)
-        insert_size_deviation = max(statistics.stdev(read_lengths), 1.0)
+        length_histogram = combine_length_histograms(read_stats)
+        insert_size_mean, read_length_stdev = get_histogram_mean_and_stdev(length_histogram)
+        insert_size_deviation = max(read_length_stdev, 1.0)
 
     log.log('', 2)
     log.log('Insert size mean: ' + float_to_str(insert_size_mean, 1) + ' bp', 2)
     log.log('Insert size stdev: ' + float_to_str(insert_size_deviation, 1) + ' bp', 2)
     log.log('', 2)
 
-    return graph_files, insert_size_mean, insert_size_deviation
+    kmers_done = sorted(graph_files)
+    return kmers_done, [graph_files[x] for x in kmers_done], insert_size_mean, \
+        insert_size_deviation
+
+
+def scores_have_declined(scores, patience):
+    """
+    Returns whether the best of the given graph scores (in k-mer order) is followed by at least
+    patience lower-scoring rounds.
+    """
+    if not scores or max(scores) == 0.0:
+        return False
+    best_index = scores.index(max(scores))
+    return len(scores) - 1 - best_index >= patience
+
+
+def get_refinement_kmers(kmers, scores):
+    """
+    Returns k-mers half way between the best-scoring k-mer and its neighbours, if there is room
+    for an odd k-mer between them.
+    """
+    if not scores or max(scores) == 0.0:
+        return []
+    best_index = scores.index(max(scores))
+    neighbours = []
+    if best_index > 0:
+        neighbours.append(kmers[best_index - 1])
+    if best_index < len(kmers) - 1:
+        neighbours.append(kmers[best_index + 1])
+    refinement_kmers = []
+    for neighbour in neighbours:
+        low, high = sorted([neighbour, kmers[best_index]])
+        middle = round_to_nearest_odd((low + high) / 2)
+        if low < middle < high:
+            refinement_kmers.append(middle)
+    return refinement_kmers
+
+
+def score_spades_graph(graph_file, kmer, read_depth_filter, largest_component, expected_linear_seqs,
+                       clean_graph_filename, verbosity, time_budget=None):
+    """
+    Loads, cleans and scores one SPAdes k-mer graph, saving the cleaned graph. This runs in a
+    worker process, so its log output is captured and returned for the main process to replay.
+    Returns the score, the values for this k-mer's row of the results table and the captured log.
+
+    If time_budget is given, this job gets that many seconds of CPU time, counted from when it
+    starts. If it uses them up, the graph is given up on as too complex and None is returned.
+    """
+    log.start_capture()
+    result = None
+    if time_budget is not None:
+        previous_handler = signal.signal(signal.SIGPROF, raise_graph_scoring_timeout)
+    try:
+        if time_budget is not None:
+            signal.setitimer(signal.ITIMER_PROF, time_budget)
+        assembly_graph = AssemblyGraph(graph_file, kmer)
+        assembly_graph.clean(read_depth_filter, largest_component)
+        assembly_graph.save_to_gfa(clean_graph_filename, verbosity=2)
+
+        segment_count = len(assembly_graph.segments)
+        dead_ends = assembly_graph.total_dead_end_count()
+
+        # If the user is expecting some linear sequences, then the dead end count can be adjusted
+        # down so expected dead ends don't penalise this k-mer.
+        adjusted_dead_ends = max(0, dead_ends - (2 * expected_linear_seqs))
+        if segment_count == 0:
+            score = 0.0
+        else:
+            score = 1.0 / (segment_count * (adjusted_dead_ends + 2))
+
+        table_values = [int_to_str(segment_count)]
+        if verbosity > 1:
+            n50, shortest, _, median, _, longest = assembly_graph.get_contig_stats()
+            table_values += [int_to_str(assembly_graph.get_total_link_count()),
+                             int_to_str(assembly_graph.get_total_length()),
+                             int_to_str(n50), int_to_str(longest)]
+        table_values += [int_to_str(dead_ends), '{:.2e}'.format(score)]
+        result = score, table_values
+        if time_budget is not None:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+    except GraphScoringTimeout:
+        pass
+    finally:
+        # The timer only fires once, but it can fire just after the job finishes and before it is
+        # disarmed. A timeout that late is ignored, so it can't escape this function.
+        if time_budget is not None:
+            try:
+                signal.setitimer(signal.ITIMER_PROF, 0)
+                signal.signal(signal.SIGPROF, previous_handler)
+            except GraphScoringTimeout:
+                signal.signal(signal.SIGPROF, previous_handler)
+        captured_log = log.stop_capture()
+    if result is None:
+        return None
+    return result + (captured_log,)
+
+
+def raise_graph_scoring_timeout(signum, frame):
+    raise GraphScoringTimeout()
+
+
+def lower_process_priority():
+    os.nice(settings.SPADES_GRAPH_SCORING_NICENESS)
 
 
 def build_spades_command(spades_path, spades_dir, threads, kmers, i, short1, short2, unpaired,
-                         using_paired_reads, using_unpaired_reads, spades_options):
+                         using_paired_reads, using_unpaired_reads, spades_options,
+                         fresh_start=False):
+    """
+    Builds the SPAdes command for the round which ends with kmers[i]. Rounds after the first restart
+    from the previous k-mer's checkpoint, unless fresh_start is set (e.g. when the previous round
+    came from the SPAdes cache, so there's no checkpoint), in which case all of the k-mers up to
+    kmers[i] are assembled from scratch.
+    """
     kmer_string = ','.join([str(x) for x in kmers[:i+1]])
 
     command = [spades_path, '-o', spades_dir, '-k', kmer_string, '--threads', str(threads)]
-    if i == 0:  # first k-mer
+    if i == 0 or fresh_start:  # first k-mer
         command += ['--isolate']
         if using_paired_reads:
             command += ['-1', short1, '-2', short2]
@@ -279,25 +502,17 @@ def run_spades_one_kmer(command, spades_dir, biggest_kmer):
     return graph_file, insert_size_mean, insert_size_deviation
 
 
-def check_fastqs(short1, short2, short_unpaired):
+def check_fastqs(short1, short2, short_unpaired, read_stats):
     using_paired_reads = bool(short1) and bool(short2)
     using_unpaired_reads = bool(short_unpaired)
     if using_paired_reads:
-        count_1, count_2 = 0, 0
-        try:
-            count_1 = get_read_count(short1)
-        except BadFastq:
-            quit_with_error('this read file is not a properly formatted FASTQ: ' + short1)
-        try:
-            count_2 = get_read_count(short2)
-        except BadFastq:
-            quit_with_error('this read file is not a properly formatted FASTQ: ' + short2)
-        if count_1 != count_2:
+        for filename in (short1, short2):
+            if not read_stats[filename].valid:
+                quit_with_error('this read file is not a properly formatted FASTQ: ' + filename)
+        if read_stats[short1].count != read_stats[short2].count:
             quit_with_error('the paired read input files have an unequal number of reads')
     if using_unpaired_reads:
-        try:
-            get_read_count(short_unpaired)
-        except BadFastq:
+        if not read_stats[short_unpaired].valid:
             quit_with_error('this read file is not properly formatted as FASTQ: ' + short_unpaired)
 
 
@@ -320,8 +535,8 @@ def get_max_spades_kmer(spades_path):
         return 127
 
 
-def get_kmer_range(given_kmers, reads_1_filename, reads_2_filename, unpaired_reads_filename,
-                   spades_dir, kmer_count, min_kmer_frac, max_kmer_frac, spades_path):
+def get_kmer_range(given_kmers, read_stats, spades_dir, kmer_count, min_kmer_frac, max_kmer_frac,
+                   spades_path):
     """
     Uses the read lengths to determine the k-mer range to be used in the SPAdes assembly.
     """
@@ -357,10 +572,9 @@ def get_kmer_range(given_kmers, reads_1_filename, reads_2_filename, unpaired_rea
 
     # If the code got here, then the k-mer range doesn't already exist and we'll create one by
     # examining the read lengths.
-    read_lengths = get_read_lengths(reads_1_filename) + get_read_lengths(reads_2_filename) + \
-        get_read_lengths(unpaired_reads_filename)
-    read_lengths = sorted(read_lengths)
-    median_read_length = read_lengths[len(read_lengths) // 2 - 1]
+    length_histogram = combine_length_histograms(read_stats)
+    read_count = sum(length_histogram.values())
+    median_read_length = get_histogram_value_at_index(length_histogram, read_count // 2 - 1)
     max_kmer = round_to_nearest_odd(max_kmer_frac * median_read_length)
     if max_kmer > max_spades_kmer:
         max_kmer = max_spades_kmer
@@ -392,24 +606,170 @@ def get_kmer_range(given_kmers, reads_1_filename, reads_2_filename, unpaired_rea
     return kmer_range
 
 
-def get_read_lengths(reads_filename):
+class ShortReadStats(object):
     """
-    Returns a list of the read lengths for the given read file.
+    The results of a single streaming pass over a short read FASTQ: the read count, a histogram of
+    read lengths (length -> count), whether the file looked like a proper FASTQ and a digest of its
+    (decompressed) contents (only computed when needed, otherwise None).
+    """
+    def __init__(self, count=0, length_histogram=None, valid=True, digest=None):
+        self.count = count
+        self.length_histogram = length_histogram if length_histogram is not None else {}
+        self.valid = valid
+        self.digest = digest
+
+    def to_dict(self):
+        return {'count': self.count, 'valid': self.valid, 'digest': self.digest,
+                'lengths': [[length, count]
+                            for length, count in sorted(self.length_histogram.items())]}
+
+    @classmethod
+    def from_dict(cls, stats_dict):
+        return cls(stats_dict['count'], {length: count for length, count in stats_dict['lengths']},
+                   stats_dict['valid'], stats_dict.get('digest'))
+
+
+def get_short_read_stats(read_filenames, out_dir, threads, compute_digests=False):
+    """
+    Returns a dictionary of filename -> ShortReadStats for the given read files (None values are
+    skipped). Files which aren't in the cache (or have changed since they were cached) are read in
+    parallel, one process per file, and the cache in the output directory is updated.
+
+    The content digests are only computed if compute_digests is set (they are needed for the SPAdes
+    cache), in which case cached stats without a digest are no good.
+    """
+    read_filenames = [x for x in read_filenames if x is not None]
+    cache_filename = os.path.join(out_dir, settings.SHORT_READ_STATS_FILENAME)
+    cache = load_short_read_stats_cache(cache_filename)
+
+    read_stats, to_scan = {}, []
+    for filename in read_filenames:
+        cached = cache.get(os.path.abspath(filename))
+        if cached is not None and cached['file'] == get_file_signature(filename) and \
+                (cached.get('digest') is not None or not compute_digests):
+            read_stats[filename] = ShortReadStats.from_dict(cached)
+        elif filename not in to_scan:
+            to_scan.append(filename)
+
+    scan = functools.partial(scan_short_read_file, compute_digest=compute_digests)
+    if len(to_scan) > 1 and threads > 1:
+        with multiprocessing.Pool(min(threads, len(to_scan))) as pool:
+            scanned = pool.map(scan, to_scan)
+    else:
+        scanned = [scan(x) for x in to_scan]
+
+    for filename, stats in zip(to_scan, scanned):
+        read_stats[filename] = stats
+        stats_dict = stats.to_dict()
+        stats_dict['file'] = get_file_signature(filename)
+        cache[os.path.abspath(filename)] = stats_dict
+    if to_scan:
+        save_short_read_stats_cache(cache_filename, cache)
+    return read_stats
+
+
+def get_file_signature(filename):
+    file_stat = os.stat(filename)
+    return [file_stat.st_size, file_stat.st_mtime_ns]
+
+
+def load_short_read_stats_cache(cache_filename):
+    try:
+        with open(cache_filename, 'rt') as cache_file:
+            cache = json.load(cache_file)
+        if isinstance(cache, dict):
+            return cache
+    except (OSError, ValueError):
+        pass
+    return {}
+
+
+def save_short_read_stats_cache(cache_filename, cache):
+    try:
+        with open(cache_filename, 'wt') as cache_file:
+            json.dump(cache, cache_file)
+    except OSError:
+        pass  # The cache is only an optimisation, so failing to write it isn't a problem.
+
+
+def scan_short_read_file(reads_filename, compute_digest=False):
+    """
+    Reads through a FASTQ file once, getting its read count, read length histogram and (if
+    compute_digest is set) content digest. If any header line doesn't start with '@', the file is
+    flagged as invalid and scanning stops.
     """
-    if reads_filename is None:
-        return []
     if get_compression_type(reads_filename) == 'gz':
         open_func = gzip.open
     else:  # plain text
         open_func = open
+    read_count, length_histogram = 0, {}
+    digest = hashlib.sha256() if compute_digest else None
     with open_func(reads_filename, 'rb') as reads:
-        read_lengths = []
-        i = 0
-        for line in reads:
-            if i % 4 == 1:
-                read_lengths.append(len(line.strip()))
-            i += 1
-    return read_lengths
+        for header in reads:
+            if not header.startswith(b'@'):
+                return ShortReadStats(read_count, length_histogram, False)
+            read_count += 1
+            seq = next(reads, None)
+            if seq is None:
+                if digest is not None:
+                    digest.update(header)
+                break
+            length = len(seq.strip())
+            length_histogram[length] = length_histogram.get(length, 0) + 1
+            plus_line, qual = next(reads, b''), next(reads, b'')
+            if digest is not None:
+                digest.update(header + seq + plus_line + qual)
+    return ShortReadStats(read_count, length_histogram, True,
+                          digest.hexdigest() if digest is not None else None)
+
+
+def combine_length_histograms(read_stats):
+    combined = {}
+    for stats in read_stats.values():
+        for length, count in stats.length_histogram.items():
+            combined[length] = combined.get(length, 0) + count
+    return combined
+
+
+def get_histogram_value_at_index(length_histogram, index):
+    """
+    Returns the value which would be at the given index if the histogram was expanded into a
+    sorted list (negative indices count from the end, like a list).
+    """
+    total = sum(length_histogram.values())
+    if index < 0:
+        index += total
+    if index < 0 or index >= total:
+        raise IndexError('histogram index out of range')
+    for length in sorted(length_histogram):
+        index -= length_histogram[length]
+        if index < 0:
+            return length
+
+
+def get_histogram_mean_and_stdev(length_histogram):
+    """
+    Returns the mean and sample standard deviation of the values in the histogram.
+    """
+    total = sum(length_histogram.values())
+    if total == 0:
+        raise statistics.StatisticsError('mean requires at least one data point')
+    mean = sum(length * count for length, count in length_histogram.items()) / total
+    if total < 2:
+        return mean, 0.0
+    variance = sum(count * (length - mean) ** 2 for length, count in length_histogram.items())
+    return mean, math.sqrt(variance / (total - 1))
+
+
+def get_read_lengths(reads_filename):
+    """
+    Returns a list of the read lengths for the given read file.
+    """
+    if reads_filename is None:
+        return []
+    length_histogram = scan_short_read_file(reads_filename).length_histogram
+    return [length for length in sorted(length_histogram)
+            for _ in range(length_histogram[length])]
 
 
 def get_read_count(reads_filename):
@@ -418,28 +778,7 @@ def get_read_count(reads_filename):
     """
     if reads_filename is None:
         return 0
-    if get_compression_type(reads_filename) == 'gz':
-        open_func = gzip.open
-    else:  # plain text
-        open_func = open
-    with open_func(reads_filename, 'rb') as reads:
-        read_count = 0
-        i = 0
-        for line in reads:
-            if i % 4 == 0:
-                try:
-                    assert line.startswith(b'@')
-                except AssertionError:
-                    raise BadFastq
-                read_count += 1
-            i += 1
-    return read_count
-
-
-def count_segments_in_gfa(fastg_file):
-    seq_count = 0
-    with open(fastg_file, 'rt') as fastg:
-        for line in fastg:
-            if line.startswith('S\t'):
-                seq_count += 1
-    return seq_count
+    stats = scan_short_read_file(reads_filename)
+    if not stats.valid:
+        raise BadFastq
+    return stats.count
@@ -16,9 +16,9 @@
 
 
 
-char * fullyGlobalAlignment(char * s1, char * s2,
-                            int matchScore, int mismatchScore, int gapOpenScore, int gapExtensionScore,
-                            bool useBanding, int bandSize) {
+AlignmentResult * fullyGlobalAlignment(char * s1, char * s2,
+                                       int matchScore, int mismatchScore, int gapOpenScore, int gapExtensionScore,
+                                       bool useBanding, int bandSize) {
 
     // Change the sequences to C++ strings.
     std::string sequence1(s1);
@@ -29,12 +29,12 @@ char * fullyGlobalAlignment(char * s1, char * s2,
                                                        useBanding, bandSize);
 
     if (alignment != 0) {
-        std::string returnString = alignment->getFullString();
+        AlignmentResult * result = newAlignmentResult(alignment);
         delete alignment;
-        return cppStringToCString(returnString);
+        return result;
     }
     else
-        return cppStringToCString("");
+        return 0;
 }
 
 // This function runs a global alignment between two sequences.
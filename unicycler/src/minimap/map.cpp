@@ -297,6 +297,7 @@ typedef struct {
 	const mm_mapopt_t *opt;
 	bseq_file_t *fp;
 	const mm_idx_t *mi;
+	const std::unordered_map<int, std::string> *query_renames;
 } pipeline_t;
 
 typedef struct {
@@ -332,8 +333,18 @@ static void *worker_pipeline(void *shared, int step, void *in)
 		s->seq = bseq_read(p->fp, p->batch_size, &s->n_seq);
 		if (s->seq) {
 			s->p = p;
-			for (i = 0; i < s->n_seq; ++i)
+			for (i = 0; i < s->n_seq; ++i) {
 				s->seq[i].rid = p->n_processed++;
+
+				// RRW: rename queries on the fly (used for reads with duplicate names).
+				if (p->query_renames) {
+					auto rename = p->query_renames->find(s->seq[i].rid);
+					if (rename != p->query_renames->end()) {
+						free(s->seq[i].name);
+						s->seq[i].name = strdup(rename->second.c_str());
+					}
+				}
+			}
 			s->buf = (mm_tbuf_t**)calloc(p->n_threads, sizeof(mm_tbuf_t*));
 			for (i = 0; i < p->n_threads; ++i)
 				s->buf[i] = mm_tbuf_init();
@@ -390,13 +401,15 @@ static void *worker_pipeline(void *shared, int step, void *in)
     return 0;
 }
 
-int mm_map_file(const mm_idx_t *idx, const char *fn, const mm_mapopt_t *opt, int n_threads, int tbatch_size)
+int mm_map_file(const mm_idx_t *idx, const char *fn, const mm_mapopt_t *opt, int n_threads, int tbatch_size,
+                const std::unordered_map<int, std::string> *query_renames)
 {
 	pipeline_t pl;
 	memset(&pl, 0, sizeof(pipeline_t));
 	pl.fp = bseq_open(fn);
 	if (pl.fp == 0) return -1;
 	pl.opt = opt, pl.mi = idx;
+	pl.query_renames = query_renames;
 	pl.n_threads = n_threads, pl.batch_size = tbatch_size;
 	kt_pipeline(n_threads == 1? 1 : 2, worker_pipeline, &pl, 3);
 	bseq_close(pl.fp);
@@ -26,7 +26,8 @@ KSEQ_INIT(gzFile, gzread)
 
 
 char * minimapAlignReads(char * referenceFasta, char * readsFastq, int n_threads,
-                         int sensitivityLevel, int preset) {
+                         int sensitivityLevel, int preset, int renameCount,
+                         int * renameIndices, char * * renameNames) {
     // The k-mer size depends on the sensitivity level.
     int k = LEVEL_0_MINIMAP_KMER_SIZE;
     if (sensitivityLevel == 1)
@@ -61,6 +62,12 @@ char * minimapAlignReads(char * referenceFasta, char * readsFastq, int n_threads
         w = 5;
     }
 
+    // Reads can be renamed (by their index in the file) as they are loaded. This is how reads with
+    // duplicate names get the unique names they were given in Python.
+    std::unordered_map<int, std::string> queryRenames;
+    for (int i = 0; i < renameCount; ++i)
+        queryRenames[renameIndices[i]] = renameNames[i];
+
     // Redirect minimap's output to a stringstream, instead of outputting it to stdout.
     // http://stackoverflow.com/questions/5419356/redirect-stdout-stderr-to-a-string
     std::stringstream outputBuffer;
@@ -74,7 +81,8 @@ char * minimapAlignReads(char * referenceFasta, char * readsFastq, int n_threads
 		if (mi == 0)
 		    break;
 		mm_idx_set_max_occ(mi, f);
-		mm_map_file(mi, readsFastq, &opt, n_threads, tbatch_size);
+		mm_map_file(mi, readsFastq, &opt, n_threads, tbatch_size,
+		            queryRenames.empty() ? 0 : &queryRenames);
 		mm_idx_destroy(mi);
 	}
 	bseq_close(fp);
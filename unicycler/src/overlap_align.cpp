@@ -14,9 +14,12 @@
 #include <seqan/align.h>
 
 
-char * overlapAlignment(char * s1, char * s2,
-                        int matchScore, int mismatchScore, int gapOpenScore, int gapExtensionScore,
-                        int guessOverlap) {
+void overlapAlignment(char * s1, char * s2,
+                      int matchScore, int mismatchScore, int gapOpenScore, int gapExtensionScore,
+                      int guessOverlap, int * overlap1, int * overlap2) {
+    *overlap1 = -1;
+    *overlap2 = -1;
+
     std::string sequence1(s1);
     std::string sequence2(s2);
 
@@ -43,7 +46,7 @@ char * overlapAlignment(char * s1, char * s2,
         globalAlignment(alignment, scoringScheme, alignConfig);
     }
     catch (...) {
-        return cppStringToCString("-1,-1");
+        return;
     }
 
     std::ostringstream stream1;
@@ -55,7 +58,7 @@ char * overlapAlignment(char * s1, char * s2,
 
     int alignmentLength = std::max(seq1Alignment.size(), seq2Alignment.size());
     if (alignmentLength == 0)
-        return cppStringToCString("-1,-1");
+        return;
 
     int seq1Pos = 0, seq2Pos = 0;
     int seq1PosAtSeq2Start = -1, seq2PosAtSeq1End = -1;
@@ -75,7 +78,6 @@ char * overlapAlignment(char * s1, char * s2,
             ++seq2Pos;
     }
 
-    int overlap1 = seq1Pos - seq1PosAtSeq2Start;
-    int overlap2 = seq2PosAtSeq1End;
-    return cppStringToCString(std::to_string(overlap1) + "," + std::to_string(overlap2));
+    *overlap1 = seq1Pos - seq1PosAtSeq2Start;
+    *overlap2 = seq2PosAtSeq1End;
 }
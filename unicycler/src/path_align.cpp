@@ -15,9 +15,9 @@
 #include "semi_global_align.h"
 
 
-char * pathAlignment(char * s1, char * s2,
-                     int matchScore, int mismatchScore, int gapOpenScore, int gapExtensionScore,
-                     bool useBanding, int bandSize) {
+AlignmentResult * pathAlignment(char * s1, char * s2,
+                                int matchScore, int mismatchScore, int gapOpenScore, int gapExtensionScore,
+                                bool useBanding, int bandSize) {
 
     // Change the sequences to C++ strings.
     std::string sequence1(s1);
@@ -28,12 +28,12 @@ char * pathAlignment(char * s1, char * s2,
                                                 useBanding, bandSize);
 
     if (alignment != 0) {
-        std::string returnString = alignment->getFullString();
+        AlignmentResult * result = newAlignmentResult(alignment);
         delete alignment;
-        return cppStringToCString(returnString);
+        return result;
     }
     else
-        return cppStringToCString("");
+        return 0;
 }
 
 // This function runs a mostly-global alignment between two sequences. The only free gaps are those
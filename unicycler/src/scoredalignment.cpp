@@ -12,6 +12,8 @@
 #include "scoredalignment.h"
 
 #include <iostream>
+#include <algorithm>
+#include "string_functions.h"
 
 ScoredAlignment::ScoredAlignment(Align<Dna5String, ArrayGaps> & alignment, 
                                  std::string & readName, std::string & refName,
@@ -106,15 +108,13 @@ ScoredAlignment::ScoredAlignment(Align<Dna5String, ArrayGaps> & alignment,
     cigarTypes.push_back(currentCigarType);
     cigarLengths.push_back(currentCigarLength);
 
-    // Build the CIGAR string and tally up the score.
-    m_cigar = "";
+    // Build the CIGAR and tally up the score.
     int alignmentPos = 0;
     for (size_t i = 0; i < cigarTypes.size(); ++i) {
         CigarType type = cigarTypes[i];
         int length = cigarLengths[i];
 
-        std::string cigarPart = getCigarPart(type, length);
-        m_cigar += cigarPart;
+        addCigarPart(type, length);
         int score = getCigarScore(type, length, scoringScheme, readAlignment, refAlignment, alignmentPos);
         m_rawScore += score;
         alignmentPos += length;
@@ -136,23 +136,19 @@ ScoredAlignment::ScoredAlignment(Align<Dna5String, ArrayGaps> & alignment,
 }
 
 
-std::string ScoredAlignment::getFullString() {
-    std::string revCompStr;
-    if (isRevComp())
-        revCompStr = '-';
-    else
-        revCompStr = '+';
-
-    return m_refName + "," + 
-           revCompStr + "," + 
-           std::to_string(m_readStartPos) + "," + 
-           std::to_string(m_readEndPos) + "," + 
-           std::to_string(m_refStartPos) + "," + 
-           std::to_string(m_refEndPos) + "," + 
-           std::to_string(m_rawScore) + "," +
-           std::to_string(m_scaledScore) + "," +
-           std::to_string(m_milliseconds) + "," +
-           m_cigar;
+void ScoredAlignment::fillResult(AlignmentResult * result) {
+    result->refName = cppStringToCString(m_refName);
+    result->revComp = isRevComp();
+    result->readStartPos = m_readStartPos;
+    result->readEndPos = m_readEndPos;
+    result->refStartPos = m_refStartPos;
+    result->refEndPos = m_refEndPos;
+    result->rawScore = m_rawScore;
+    result->scaledScore = m_scaledScore;
+    result->milliseconds = m_milliseconds;
+    result->cigarLength = int(m_cigar.size());
+    result->cigar = (uint32_t*)malloc(sizeof(uint32_t) * (m_cigar.size() + 1));
+    std::copy(m_cigar.begin(), m_cigar.end(), result->cigar);
 }
 
 
@@ -184,19 +180,20 @@ CigarType ScoredAlignment::getCigarType(char b1, char b2, bool alignmentStarted)
         return MATCH;
 }
 
-std::string ScoredAlignment::getCigarPart(CigarType type, int length) {
-    std::string cigarPart = std::to_string(length);
+// Adds a part to the CIGAR, packed in the same way as BAM CIGARs.
+void ScoredAlignment::addCigarPart(CigarType type, int length) {
+    uint32_t op;
     if (type == DELETION)
-        cigarPart.append("D");
+        op = 2;
     else if (type == INSERTION)
-        cigarPart.append("I");
+        op = 1;
     else if (type == CLIP)
-        cigarPart.append("S");
+        op = 4;
     else if (type == MATCH)
-        cigarPart.append("M");
+        op = 0;
     else //type == NOTHING
-        return "";
-    return cigarPart;
+        return;
+    m_cigar.push_back((uint32_t(length) << 4) | op);
 }
 
 
@@ -231,4 +228,46 @@ bool ScoredAlignment::isRevComp() {
 
 long long getTime() {
     return std::chrono::duration_cast<std::chrono::milliseconds>(std::chrono::system_clock::now().time_since_epoch()).count();
-}
\ No newline at end of file
+}
+
+
+AlignmentResult * newAlignmentResult(ScoredAlignment * alignment) {
+    AlignmentResult * result = (AlignmentResult*)malloc(sizeof(AlignmentResult));
+    alignment->fillResult(result);
+    return result;
+}
+
+
+AlignmentResults * newAlignmentResults(std::vector<ScoredAlignment *> & alignments,
+                                       std::string & output) {
+    AlignmentResults * results = (AlignmentResults*)malloc(sizeof(AlignmentResults));
+    results->count = 0;
+    results->alignments = (AlignmentResult*)malloc(sizeof(AlignmentResult) *
+                                                   (alignments.size() + 1));
+    for (auto const & alignment : alignments) {
+        if (alignment != 0)
+            alignment->fillResult(&results->alignments[results->count++]);
+    }
+    results->output = cppStringToCString(output);
+    return results;
+}
+
+
+void freeAlignmentResult(AlignmentResult * result) {
+    if (result == 0)
+        return;
+    free(result->refName);
+    free(result->cigar);
+    free(result);
+}
+
+
+void freeAlignmentResults(AlignmentResults * results) {
+    for (int i = 0; i < results->count; ++i) {
+        free(results->alignments[i].refName);
+        free(results->alignments[i].cigar);
+    }
+    free(results->alignments);
+    free(results->output);
+    free(results);
+}
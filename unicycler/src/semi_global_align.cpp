@@ -21,11 +21,11 @@
 #include "settings.h"
 
 
-char * semiGlobalAlignment(char * readNameC, char * readSeqC, int verbosity,
-                           char * minimapAlignmentsStr, SeqMap * refSeqs,
-                           int matchScore, int mismatchScore, int gapOpenScore,
-                           int gapExtensionScore, double /*lowScoreThreshold*/, bool /*returnBad*/,
-                           int sensitivityLevel) {
+AlignmentResults * semiGlobalAlignment(char * readNameC, char * readSeqC, int verbosity,
+                                       char * minimapAlignmentsStr, SeqMap * refSeqs,
+                                       int matchScore, int mismatchScore, int gapOpenScore,
+                                       int gapExtensionScore, double /*lowScoreThreshold*/,
+                                       bool /*returnBad*/, int sensitivityLevel) {
     int kSize = LEVEL_0_KMER_SIZE;
     if (sensitivityLevel == 1)
         kSize = LEVEL_1_KMER_SIZE;
@@ -35,7 +35,6 @@ char * semiGlobalAlignment(char * readNameC, char * readSeqC, int verbosity,
         kSize = LEVEL_3_KMER_SIZE;
 
     std::string output;
-    std::string returnString;
     std::vector<ScoredAlignment *> returnedAlignments;
 
     // Change the read name and sequence to C++ strings.
@@ -141,15 +140,11 @@ char * semiGlobalAlignment(char * readNameC, char * readSeqC, int verbosity,
         }
     }
 
-    // The returned string is semicolon-delimited. The last part is the console output and the
-    // other parts are alignment description strings.
-    for (auto const & alignment : returnedAlignments) {
-        if (alignment != 0)
-            returnString += alignment->getFullString() + ";";
-    }
-    returnString += output;
-
-    return cppStringToCString(returnString);
+    // The alignments and the console output are returned together.
+    AlignmentResults * results = newAlignmentResults(returnedAlignments, output);
+    for (auto const & alignment : returnedAlignments)
+        delete alignment;
+    return results;
 }
 
 
@@ -16,9 +16,9 @@
 
 
 
-char * semiGlobalAlignmentExhaustive(char * s1, char * s2,
-                                     int matchScore, int mismatchScore,
-                                     int gapOpenScore, int gapExtensionScore) {
+AlignmentResult * semiGlobalAlignmentExhaustive(char * s1, char * s2,
+                                                int matchScore, int mismatchScore,
+                                                int gapOpenScore, int gapExtensionScore) {
 
     // Change the sequences to C++ strings.
     std::string sequence1(s1);
@@ -28,12 +28,12 @@ char * semiGlobalAlignmentExhaustive(char * s1, char * s2,
                                                                 matchScore, mismatchScore,
                                                                 gapOpenScore, gapExtensionScore);
     if (alignment != 0) {
-        std::string returnString = alignment->getFullString();
+        AlignmentResult * result = newAlignmentResult(alignment);
         delete alignment;
-        return cppStringToCString(returnString);
+        return result;
     }
     else
-        return cppStringToCString("");
+        return 0;
 }
 
 
@@ -15,11 +15,12 @@ not, see <http://www.gnu.org/licenses/>.
 """
 
 import sys
-import re
 from collections import deque, defaultdict
-from .misc import reverse_complement, add_line_breaks_to_sequence, get_right_arrow, bold, \
-    load_fasta, load_fasta_with_full_header, get_first_character_of_file
+from .misc import add_line_breaks_to_sequence, get_right_arrow, bold, load_fasta, \
+    load_fasta_with_full_header, get_first_character_of_file
+from .seqops import reverse_complement
 from .assembly_graph import build_reverse_links
+from .alignment import CIGAR_INSERTION
 from . import settings
 from . import log
 
@@ -327,30 +328,23 @@ class StringGraph(object):
                                                                  polished_seq_end, scoring_scheme)
 
                 missing_start_seq = ''
-                try:
-                    cigar_parts = re.findall(r'\d+\w', start_alignment.split(',')[9])
-                    first_cigar = cigar_parts[0]
-                    if first_cigar[-1] == 'I':
-                        missing_start_count = int(first_cigar[:-1])
+                if start_alignment and start_alignment.cigar:
+                    first_cigar = start_alignment.cigar[0]
+                    if first_cigar & 15 == CIGAR_INSERTION:
+                        missing_start_count = first_cigar >> 4
                         missing_start_seq = unpolished_seq_start[:missing_start_count]
-                except (ValueError, IndexError):
-                    pass
 
                 missing_end_seq = ''
-                try:
-                    cigar_parts = re.findall(r'\d+\w', end_alignment.split(',')[9])
-                    last_cigar = cigar_parts[-1]
-                    if last_cigar[-1] == 'I':
-                        missing_end_count = int(last_cigar[:-1])
+                if end_alignment and end_alignment.cigar:
+                    last_cigar = end_alignment.cigar[-1]
+                    if last_cigar & 15 == CIGAR_INSERTION:
+                        missing_end_count = last_cigar >> 4
                         missing_end_seq = unpolished_seq_end[-missing_end_count:]
-                except (ValueError, IndexError):
-                    pass
 
                 if missing_start_seq or missing_end_seq:
                     polished_seq = missing_start_seq + polished_seq + missing_end_seq
 
                 segment.forward_sequence = polished_seq
-                segment.reverse_sequence = reverse_complement(polished_seq)
             except IndexError:
                 pass
 
@@ -366,7 +360,6 @@ class StringGraph(object):
                 shift = int(len(seq) * shift_fraction)
                 seq = seq[shift:] + seq[:shift]
                 segment.forward_sequence = seq
-                segment.reverse_sequence = reverse_complement(seq)
 
     def get_total_segment_length(self):
         return sum(s.get_length() for s in self.segments.values())
@@ -412,7 +405,6 @@ class StringGraphSegment(object):
     def __init__(self, full_name, sequence, qual=None):
         self.full_name = full_name
         self.forward_sequence = sequence
-        self.reverse_sequence = reverse_complement(sequence)
         self.depth = 1.0
 
         # Miniasm trims reads and puts the start/end positions in the name...
@@ -445,6 +437,10 @@ class StringGraphSegment(object):
             seq_string = self.forward_sequence
         return self.full_name + ' (' + seq_string + '), mean score = ' + str(self.qual)
 
+    @property
+    def reverse_sequence(self):
+        return reverse_complement(self.forward_sequence)
+
     def get_length(self):
         return len(self.forward_sequence)
 
@@ -467,14 +463,10 @@ class StringGraphSegment(object):
         """
         unrotated_seq = self.forward_sequence
         rotated_seq = unrotated_seq[start_pos:] + unrotated_seq[:start_pos]
-        rev_comp_rotated_seq = reverse_complement(rotated_seq)
-
         if flip:
-            self.forward_sequence = rev_comp_rotated_seq
-            self.reverse_sequence = rotated_seq
+            self.forward_sequence = reverse_complement(rotated_seq)
         else:
             self.forward_sequence = rotated_seq
-            self.reverse_sequence = rev_comp_rotated_seq
 
 
 class StringGraphLink(object):
@@ -25,6 +25,8 @@ import multiprocessing
 from .alignment import AlignmentScoringScheme
 from .assembly_graph import AssemblyGraph
 from .assembly_graph_copy_depth import determine_copy_depth
+from .graph_checkpoint import BadCheckpoint, load_checkpoint_metadata
+from .graph_simplifier import GraphSimplifier
 from .bridge_long_read_simple import create_simple_long_read_bridges
 from .miniasm_assembly import make_miniasm_string_graph
 from .bridge_miniasm import create_miniasm_bridges
@@ -34,12 +36,12 @@ from .bridge_loop_unroll import create_loop_unrolling_bridges
 from .misc import int_to_str, float_to_str, quit_with_error, get_percentile, bold, \
     check_input_files, MyHelpFormatter, print_table, get_ascii_art, \
     get_default_thread_count, spades_path_and_version, makeblastdb_path_and_version, \
-    tblastn_path_and_version, racon_path_and_version, gfa_path, red
+    tblastn_path_and_version, racon_path_and_version, gfa_path, checkpoint_path, red
 from .spades_func import get_best_spades_graph
 from .blast_func import find_start_gene, CannotFindStart
 from .unicycler_align import fix_up_arguments, semi_global_align_long_reads, load_references, \
     load_sam_alignments, print_alignment_summary_table
-from .read_ref import get_read_nickname_dict, load_long_reads
+from .read_ref import get_read_nickname_dict, load_long_reads, subsample_long_reads
 from . import log
 from . import settings
 from .version import __version__
@@ -68,7 +70,13 @@ def main():
         # Produce a SPAdes assembly graph with a k-mer that balances contig length and connectivity.
         spades_graph_prefix = gfa_path(args.out, next(counter), 'spades_graph')[:-4]
         best_spades_graph = gfa_path(args.out, next(counter), 'depth_filter')
-        if os.path.isfile(best_spades_graph):
+        best_spades_checkpoint = checkpoint_path(best_spades_graph)
+        graph = load_spades_graph_checkpoint(best_spades_checkpoint, best_spades_graph)
+        from_checkpoint = graph is not None
+        if from_checkpoint:
+            log.log('\nSPAdes graph checkpoint already exists. Will use this graph (with its '
+                    'multiplicity) instead of running SPAdes:\n  ' + best_spades_checkpoint)
+        elif os.path.isfile(best_spades_graph):
             log.log('\nSPAdes graph already exists. Will use this graph instead of running '
                     'SPAdes:\n  ' + best_spades_graph)
             graph = AssemblyGraph(best_spades_graph, None)
@@ -78,11 +86,17 @@ def main():
                                           args.spades_path, args.threads, args.keep,
                                           args.kmer_count, args.min_kmer_frac, args.max_kmer_frac,
                                           args.kmers, args.linear_seqs, args.largest_component,
-                                          spades_graph_prefix, args.spades_options)
-        determine_copy_depth(graph)
+                                          spades_graph_prefix, args.spades_options,
+                                          args.kmer_search, args.kmer_search_patience,
+                                          args.spades_cache, args.spades_cache_size)
+        if not from_checkpoint:
+            determine_copy_depth(graph)
         if args.keep > 0 and not os.path.isfile(best_spades_graph):
             graph.save_to_gfa(best_spades_graph, save_copy_depth_info=True, newline=True,
                               include_insert_size=True)
+        if args.keep > 0 and not from_checkpoint:
+            graph.save_checkpoint(best_spades_checkpoint,
+                                  metadata={'stage': 'depth_filter', 'version': __version__})
 
         clean_up_spades_graph(graph)
         if args.keep > 0:
@@ -110,6 +124,16 @@ def main():
 
     if long_reads_available:
         read_dict, read_names, long_read_filename = load_long_reads(args.long, output_dir=args.out)
+        if args.long_read_target_depth > 0.0:
+            if graph is None:
+                log.log('\nSkipping long read subsampling: --long_read_target_depth requires '
+                        'short reads to estimate the genome size')
+            else:
+                read_dict, read_names, subsampled_filename = \
+                    subsample_long_reads(read_dict, read_names, args.long_read_target_depth,
+                                         graph.get_estimated_sequence_len(), args.out)
+                if subsampled_filename is not None:
+                    long_read_filename = subsampled_filename
         read_nicknames = get_read_nickname_dict(read_names)
     else:
         read_dict, read_names, long_read_filename, read_nicknames = {}, [], '', {}
@@ -186,6 +210,18 @@ def main():
     graph.save_to_gfa(final_assembly_gfa)
     graph.save_to_fasta(final_assembly_fasta, min_length=args.min_fasta_length)
 
+    # The long read data/index files allow a rerun to skip read parsing, so they are kept along
+    # with the SAM alignments.
+    if long_reads_available and args.keep < 2:
+        for read_store_file in [settings.LONG_READ_STORE_DATA_FILENAME,
+                                settings.LONG_READ_STORE_INDEX_FILENAME,
+                                settings.SUBSAMPLED_LONG_READS_FILENAME,
+                                settings.SUBSAMPLED_LONG_READ_STORE_DATA_FILENAME,
+                                settings.SUBSAMPLED_LONG_READ_STORE_INDEX_FILENAME]:
+            read_store_file = os.path.join(args.out, read_store_file)
+            if os.path.isfile(read_store_file):
+                os.remove(read_store_file)
+
     log.log('')
 
 
@@ -292,6 +328,15 @@ def get_arguments():
     spades_group.add_argument('--kmer_count', type=int, default=8,
                               help='Number of k-mer steps to use in SPAdes assembly'
                                    if show_all_args else argparse.SUPPRESS)
+    spades_group.add_argument('--kmer_search', choices=['sweep', 'adaptive'], default='sweep',
+                              help='K-mer search strategy: sweep = assemble with every k-mer in '
+                                   'the range, adaptive = stop once graph scores decline past the '
+                                   'best k-mer and then refine around it'
+                                   if show_all_args else argparse.SUPPRESS)
+    spades_group.add_argument('--kmer_search_patience', type=int, default=2,
+                              help='For the adaptive k-mer search, stop after this many rounds '
+                                   'past the best-scoring k-mer'
+                                   if show_all_args else argparse.SUPPRESS)
     spades_group.add_argument('--depth_filter', type=float, default=0.25,
                               help='Filter out contigs lower than this fraction of the chromosomal '
                                    'depth, if doing so does not result in graph dead ends'
@@ -304,6 +349,14 @@ def get_arguments():
                               help='Additional options to be given to SPAdes (example: '
                                    '"--phred-offset 33", default: no additional options)'
                                    if show_all_args else argparse.SUPPRESS)
+    spades_group.add_argument('--spades_cache', type=str, default=None,
+                              help='Directory for a persistent cache of SPAdes assemblies, reused '
+                                   'by later runs on the same reads (default: no cache)'
+                                   if show_all_args else argparse.SUPPRESS)
+    spades_group.add_argument('--spades_cache_size', type=float, default=10.0,
+                              help='Maximum size of the SPAdes cache in gigabytes - least recently '
+                                   'used assemblies are removed to stay under this size'
+                                   if show_all_args else argparse.SUPPRESS)
 
     miniasm_group = parser.add_argument_group('miniasm+Racon assembly',
                                               'These options control the use of miniasm and Racon '
@@ -335,6 +388,16 @@ def get_arguments():
                             help='Skip long-read-alignment-based bridging (default: use long-read '
                                  'alignments to produce bridges)'
                                  if show_all_args else argparse.SUPPRESS)
+    long_group.add_argument('--long_read_target_depth', type=float, default=0.0,
+                            help='Subsample the long reads (preferring long and high-quality '
+                                 'reads) down to this depth before alignment and miniasm '
+                                 'assembly, using the genome size estimated from the short-read '
+                                 'graph (default: 0, use all reads)'
+                            if show_all_args else argparse.SUPPRESS)
+    long_group.add_argument('--align_in_processes', action='store_true',
+                            help='Align long reads in worker processes instead of threads, which '
+                                 'makes better use of many cores (default: align in threads)'
+                            if show_all_args else argparse.SUPPRESS)
     long_group.add_argument('--contamination', required=False,
                             help='FASTA file of known contamination in long reads'
                             if show_all_args else argparse.SUPPRESS)
@@ -422,6 +485,15 @@ def get_arguments():
     if args.kmer_count < 1:
         quit_with_error('--kmer_count must be at least 1')
 
+    if args.kmer_search_patience < 1:
+        quit_with_error('--kmer_search_patience must be at least 1')
+
+    if args.spades_cache_size <= 0.0:
+        quit_with_error('--spades_cache_size must be greater than zero')
+
+    if args.long_read_target_depth < 0.0:
+        quit_with_error('--long_read_target_depth cannot be negative')
+
     if args.kmers is not None:
         args.kmers = args.kmers.split(',')
         try:
@@ -842,7 +914,8 @@ def align_long_reads_to_assembly_graph(graph, anchor_segments, args, full_comman
                                      low_score_threshold, False, min_alignment_length,
                                      alignments_in_progress, full_command, allowed_overlap,
                                      0, args.contamination, args.verbosity,
-                                     single_copy_segment_names=anchor_segment_names)
+                                     single_copy_segment_names=anchor_segment_names,
+                                     use_processes=args.align_in_processes)
         shutil.move(alignments_in_progress, alignments_sam)
 
         if args.keep < 2:
@@ -879,21 +952,47 @@ def align_long_reads_to_assembly_graph(graph, anchor_segments, args, full_comman
     return read_names, min_scaled_score, min_alignment_length
 
 
+def load_spades_graph_checkpoint(checkpoint_filename, gfa_filename):
+    """
+    Returns the graph from a SPAdes graph checkpoint made by an earlier run, or None if there isn't
+    a usable one. If the GFA file is newer than the checkpoint (e.g. the user has edited it), the
+    GFA file is used instead.
+    """
+    if not os.path.isfile(checkpoint_filename):
+        return None
+    if os.path.isfile(gfa_filename) and \
+            os.path.getmtime(gfa_filename) > os.path.getmtime(checkpoint_filename):
+        return None
+    try:
+        if load_checkpoint_metadata(checkpoint_filename).get('stage') != 'depth_filter':
+            return None
+        return AssemblyGraph.load_checkpoint(checkpoint_filename)
+    except (BadCheckpoint, OSError) as e:
+        log.log('\nCannot use ' + checkpoint_filename + ': ' + str(e))
+        return None
+
+
 def clean_up_spades_graph(graph):
     log.log_section_header('Cleaning graph')
     log.log_explanation('Unicycler now performs various cleaning procedures on the graph to '
                         'remove overlaps and simplify the graph structure. The end result is a '
                         'graph ready for bridging.', verbosity=1)
     graph.remove_all_overlaps()
+
+    # The cleaning passes are repeated until the graph stops changing. The simplifier gives the
+    # same result as the graph's own methods, but each pass only looks at the parts of the graph
+    # which have changed.
+    simplifier = GraphSimplifier(graph)
     while True:
-        graph.repair_multi_way_junctions()
-        graph.remove_unnecessary_links()
-        graph.expand_repeats()
-        if not graph.remove_zero_length_segs():
+        simplifier.repair_multi_way_junctions()
+        simplifier.remove_unnecessary_links()
+        simplifier.expand_repeats()
+        if not simplifier.remove_zero_length_segs():
             break
     while True:
-        if not graph.merge_small_segments(5):
+        if not simplifier.merge_small_segments(5):
             break
+    simplifier.detach()
     graph.normalise_read_depths()
     graph.renumber_segments()
     graph.sort_link_order()
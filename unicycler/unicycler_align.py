@@ -36,11 +36,12 @@ import sys
 import os
 import time
 import math
+import multiprocessing
 from multiprocessing.dummy import Pool as ThreadPool
 import threading
 from .misc import int_to_str, float_to_str, quit_with_error, weighted_average_list, \
     get_sequence_file_type, dim, magenta, colour
-from .read_ref import load_references
+from .read_ref import load_references, get_read_renames
 from .alignment import Alignment
 from . import settings
 from .minimap_alignment import load_minimap_alignments
@@ -65,6 +66,10 @@ SAM_WRITE_LOCK = threading.Lock()
 # 4 = tons of stuff is printed, including all k-mer positions in each Seqan alignment
 VERBOSITY = 0
 
+# The reads and alignment settings for worker processes (see align_reads_in_processes). Workers
+# inherit this when they are forked, so it is set just before the pool is made.
+WORKER_ALIGNMENT_ARGS = None
+
 
 def fix_up_arguments(args):
     # If the user just said 'lambda' for the contamination, then we use the lambda phage FASTA
@@ -90,13 +95,15 @@ def semi_global_align_long_reads(references, ref_fasta, read_dict, read_names, r
                                  min_align_length, sam_filename, full_command, allowed_overlap,
                                  sensitivity_level, contamination_fasta, verbosity=None,
                                  stdout_header='Aligning reads', display_low_score=True,
-                                 single_copy_segment_names=None):
+                                 single_copy_segment_names=None, use_processes=False):
     """
     This function does the primary work of this module: aligning long reads to references in an
     end-gap-free, semi-global manner. It returns a dictionary of Read objects which contain their
     alignments.
     The low score threshold is taken as a list so the function can alter it and the caller can
     get the altered value.
+    If use_processes is True (and processes can be forked), reads are aligned in worker processes
+    instead of threads.
     """
     if sensitivity_level is None:
         sensitivity_level = 0
@@ -143,7 +150,8 @@ def semi_global_align_long_reads(references, ref_fasta, read_dict, read_names, r
 
     if verbosity > 0:
         log.log_section_header('Aligning reads with minimap', verbosity=2)
-    minimap_alignments_str = minimap_align_reads(ref_fasta, reads_fastq, threads, 0, 'default')
+    minimap_alignments_str = minimap_align_reads(ref_fasta, reads_fastq, threads, 0, 'default',
+                                                 get_read_renames(read_dict))
     minimap_alignments = load_minimap_alignments(minimap_alignments_str)
     if verbosity > 0:
         log.log('', 3)
@@ -199,24 +207,33 @@ def semi_global_align_long_reads(references, ref_fasta, read_dict, read_names, r
                 fraction = str(completed_count) + '/' + str(num_alignments) + ': '
                 log.log(fraction + output + '\n', 2, end='')
 
-    # If multi-threaded, use a thread pool.
+    # If multi-threaded, use a thread pool (or a process pool, if requested).
     else:
-        pool = ThreadPool(threads)
-        arg_list = []
-        for read in reads_to_align:
-            arg_list.append((read, reference_dict, scoring_scheme, ref_seqs_ptr,
-                             low_score_threshold, keep_bad, min_align_length,
-                             sam_filename, allowed_overlap, minimap_alignments[read.name],
-                             sensitivity_level, single_copy_segment_names))
-
-        # If the verbosity is 1, then the order doesn't matter, so use imap_unordered to deliver
-        # the results evenly. If the verbosity is higher, deliver the results in order with imap.
-        if VERBOSITY > 1:
-            imap_function = pool.imap
+        if use_processes and 'fork' in multiprocessing.get_all_start_methods():
+            outputs = align_reads_in_processes(read_dict, read_names, minimap_alignments,
+                                               threads, reference_dict, scoring_scheme,
+                                               ref_seqs_ptr, low_score_threshold, keep_bad,
+                                               min_align_length, sam_filename, allowed_overlap,
+                                               sensitivity_level, single_copy_segment_names)
         else:
-            imap_function = pool.imap_unordered
+            pool = ThreadPool(threads)
+            arg_list = []
+            for read in reads_to_align:
+                arg_list.append((read, reference_dict, scoring_scheme, ref_seqs_ptr,
+                                 low_score_threshold, keep_bad, min_align_length,
+                                 sam_filename, allowed_overlap, minimap_alignments[read.name],
+                                 sensitivity_level, single_copy_segment_names))
+
+            # If the verbosity is 1, then the order doesn't matter, so use imap_unordered to
+            # deliver the results evenly. If the verbosity is higher, deliver the results in order
+            # with imap.
+            if VERBOSITY > 1:
+                imap_function = pool.imap
+            else:
+                imap_function = pool.imap_unordered
+            outputs = imap_function(seqan_alignment_one_arg, arg_list)
 
-        for output in imap_function(seqan_alignment_one_arg, arg_list):
+        for output in outputs:
             completed_count += 1
             if VERBOSITY == 1:
                 log.log_progress_line(completed_count, num_alignments)
@@ -353,6 +370,71 @@ def load_sam_alignments(sam_filename, read_dict, reference_dict, scoring_scheme)
     return sam_alignments
 
 
+def align_reads_in_processes(read_dict, read_names, minimap_alignments, processes,
+                             reference_dict, scoring_scheme, ref_seqs_ptr, low_score_threshold,
+                             keep_bad, min_align_length, sam_filename, allowed_overlap,
+                             sensitivity_level, single_copy_segment_names):
+    """
+    Aligns reads in a pool of forked worker processes, yielding each read's output as it is
+    finished. Threads spend much of their time waiting for the GIL (everything but the C++
+    alignment holds it), but processes don't share one.
+
+    The workers inherit the reads, references and C++ ReferenceSeqs object from this process, so
+    nothing big is sent to them. Each read's alignments come back as compact records and are
+    turned into Alignment objects here. The workers don't write to the SAM file - they send back
+    the lines and they are written here.
+    """
+    global WORKER_ALIGNMENT_ARGS
+    WORKER_ALIGNMENT_ARGS = (read_dict, minimap_alignments, reference_dict, scoring_scheme,
+                             ref_seqs_ptr, low_score_threshold, keep_bad, min_align_length,
+                             sam_filename is not None, allowed_overlap, sensitivity_level,
+                             single_copy_segment_names)
+
+    # Reads are sent to the workers in small chunks to save on communication, but not so big that
+    # some workers are left idle at the end.
+    chunk_size = min(16, max(1, len(read_names) // (processes * 10)))
+
+    sam_file = open(sam_filename, 'a') if sam_filename else None
+    try:
+        with multiprocessing.get_context('fork').Pool(processes) as pool:
+
+            # As for the thread pool, results are delivered in order for higher verbosities.
+            if VERBOSITY > 1:
+                imap_function = pool.imap
+            else:
+                imap_function = pool.imap_unordered
+
+            for read_name, output, records, sam_lines in \
+                    imap_function(seqan_alignment_in_worker, read_names, chunk_size):
+                read = read_dict[read_name]
+                read.alignments = [Alignment.from_record(x, read, reference_dict)
+                                   for x in records]
+                if sam_file is not None:
+                    sam_file.write(sam_lines)
+                yield output
+    finally:
+        WORKER_ALIGNMENT_ARGS = None
+        if sam_file is not None:
+            sam_file.close()
+
+
+def seqan_alignment_in_worker(read_name):
+    """
+    Aligns one read in a worker process (see align_reads_in_processes). Returns the read's name,
+    the output, its alignments as records and its SAM lines.
+    """
+    read_dict, minimap_alignments, reference_dict, scoring_scheme, ref_seqs_ptr, \
+        low_score_threshold, keep_bad, min_align_length, make_sam_lines, allowed_overlap, \
+        sensitivity_level, single_copy_segment_names = WORKER_ALIGNMENT_ARGS
+    read = read_dict[read_name]
+    output = seqan_alignment(read, reference_dict, scoring_scheme, ref_seqs_ptr,
+                             low_score_threshold, keep_bad, min_align_length, None,
+                             allowed_overlap, minimap_alignments[read_name], sensitivity_level,
+                             single_copy_segment_names)
+    sam_lines = get_sam_lines(read) if make_sam_lines else ''
+    return read_name, output, [x.get_record() for x in read.alignments], sam_lines
+
+
 def seqan_alignment_one_arg(all_args):
     """
     This is just a one-argument version of seqan_alignment to make it easier to use that function
@@ -382,28 +464,28 @@ def seqan_alignment(read, reference_dict, scoring_scheme, ref_seqs_ptr, low_scor
             output += '  too short to align\n'
     else:
         minimap_alignments_str = ';'.join([x.get_concise_string() for x in minimap_alignments])
-        alignment_strings = []
+        seqan_results = []
 
         # Try at each sensitivity up to the current level. E.g. if sensitivity level is 2,
         # we try the Seqan alignment at levels 0, 1 and 2. This produces many redundant
         # alignments but we'll filter them out later.
         for sensitivity in range(0, sensitivity_level+1):
-            results = semi_global_alignment(read.name, read.sequence, VERBOSITY,
-                                            minimap_alignments_str, ref_seqs_ptr,
-                                            scoring_scheme.match, scoring_scheme.mismatch,
-                                            scoring_scheme.gap_open, scoring_scheme.gap_extend,
-                                            low_score_threshold, keep_bad, sensitivity).split(';')
+            results, results_output = \
+                semi_global_alignment(read.name, read.sequence, VERBOSITY, minimap_alignments_str,
+                                      ref_seqs_ptr, scoring_scheme.match, scoring_scheme.mismatch,
+                                      scoring_scheme.gap_open, scoring_scheme.gap_extend,
+                                      low_score_threshold, keep_bad, sensitivity)
 
-            alignment_strings += results[:-1]
-            output += results[-1]
+            seqan_results += results
+            output += results_output
 
-            for alignment_string in alignment_strings:
-                alignment = Alignment(seqan_output=alignment_string, read=read,
+            for seqan_result in seqan_results:
+                alignment = Alignment(seqan_result=seqan_result, read=read,
                                       reference_dict=reference_dict, scoring_scheme=scoring_scheme)
                 read.alignments.append(alignment)
 
         if VERBOSITY > 2:
-            if not alignment_strings:
+            if not seqan_results:
                 output += '  None\n'
             else:
                 output += 'All Seqan alignments (time to align = ' + \
@@ -427,9 +509,7 @@ def seqan_alignment(read, reference_dict, scoring_scheme, ref_seqs_ptr, low_scor
         if sam_filename and read.alignments:
             SAM_WRITE_LOCK.acquire()
             sam_file = open(sam_filename, 'a')
-            for alignment in read.alignments:
-                if not alignment.ref.name.startswith('CONTAMINATION_'):
-                    sam_file.write(alignment.get_sam_line())
+            sam_file.write(get_sam_lines(read))
             sam_file.close()
             SAM_WRITE_LOCK.release()
 
@@ -449,6 +529,14 @@ def seqan_alignment(read, reference_dict, scoring_scheme, ref_seqs_ptr, low_scor
     return output_title + formatted_output
 
 
+def get_sam_lines(read):
+    """
+    Returns the SAM lines for a read's alignments (excluding those to contamination).
+    """
+    return ''.join(x.get_sam_line() for x in read.alignments
+                   if not x.ref.name.startswith('CONTAMINATION_'))
+
+
 def group_reads_by_fraction_aligned(read_dict):
     """
     Groups reads into three lists: